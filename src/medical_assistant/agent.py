@@ -1,32 +1,177 @@
+import asyncio
+import contextvars
+import os
+import httpx
 import requests
-import json
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_community.agent_toolkits.load_tools import load_tools
-from langgraph.prebuilt import create_react_agent
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
 
-from src.medical_assistant.config import PERSIST_DIR, EMBEDDING_MODEL_NAME, LLM_MODEL_NAME, system_prompt
+from src.medical_assistant.config import (
+    LLM_MODEL_NAME, system_prompt, AGENT_MAX_TOOL_SEARCHES, AGENT_MAX_REFUSED_SEARCHES,
+    LOCAL_CONTEXT_TIMEOUT, SEARCH_CONTEXT_TIMEOUT, RETRIEVAL_MAX_WORKERS,
+    SEARCH_CACHE_PATH, SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES
+)
+from src.medical_assistant.context import (
+    ContextRecord, LOCAL_SOURCE_TITLE, assemble_context, format_local_records,
+    format_search_records, parse_serper_results
+)
+from src.medical_assistant import telemetry
+from src.medical_assistant.embedding_cache import QueryEmbeddingCache, get_query_embedding_cache
+from src.medical_assistant.history import estimate_tokens
+from src.medical_assistant.http_client import AsyncSerperClient, get_serper_client
+from src.medical_assistant.registry import get_vectorstore
+from src.medical_assistant.search_cache import SearchCache
+from src.medical_assistant.search_session import current_search_session, search_session
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+    from langchain_core.tools import Tool
+
+# LangChain, LangGraph and Gemini are imported inside the functions that use
+# them so that importing this module (and the GUI) stays fast.
+
+NO_LOCAL_CONTEXT = "There was no Local Context"
+NO_SEARCH_CONTEXT = "There was no Search Context due to an error."
+NO_SEARCH_RESULTS = "There was no Search Context"
+ALREADY_SEARCHED = (
+    "The results for '{query}' are already in this conversation. "
+    "Answer from them instead of searching again."
+)
+SEARCH_LIMIT_REACHED = (
+    "No more web searches are available for this question. "
+    "Answer from the context you already have."
+)
+STEPS_EXHAUSTED = (
+    "The assistant kept asking for web searches instead of answering. "
+    "Please try rephrasing the question."
+)
+# The run that gives an agent out of steps a last chance: one model step, in which tool calls are refused.
+FINAL_STEP_RECURSION_LIMIT = 2
+
+
+class AgentStepsExhausted(Exception):
+    """
+    Raised when the agent still asks for a search on the final step it is
+    given after running out of steps, so there is no answer to return or cache.
+    """
+
+# Shared by all queries so concurrent retrieval does not spawn threads per request.
+_retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_MAX_WORKERS, thread_name_prefix="retrieval")
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """
+    Returns the process-wide Serper result cache, opening it on first use.
+    """
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache(SEARCH_CACHE_PATH, SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES)
+        return _search_cache
+
+
+def create_search_tool() -> "Tool":
+    """
+    Builds the agent's `google-serper` tool on top of serper_search so that the
+    tool and the query's prefetch share the same result cache.
+    When the agent runs on asyncio, the tool's search is awaited, so cancelling
+    the query aborts it.
+    """
+    from langchain_core.tools import Tool
+
+    return Tool(
+        name="google-serper",
+        description=(
+            "A Google Search API. Useful for finding first-aid guidance and the URLs of "
+            "its sources. Input should be a search query."
+        ),
+        func=search_tool_results,
+        coroutine=search_tool_results_async,
+    )
+
+
+def search_tool_results(query: str) -> str:
+    """
+    Runs a cached Serper search for the agent's tool and returns compact
+    title/URL/snippet records instead of the raw JSON payload.
+    Within a query's search session, a near-duplicate of a search already in
+    the conversation (including the prefetch) is not repeated, and searches
+    beyond AGENT_MAX_TOOL_SEARCHES are refused.
+    """
+    with telemetry.span("agent.tool_search") as span:
+        session, refusal = _start_tool_search(query, span)
+        if refusal:
+            return refusal
+        raw = serper_search(query, os.environ.get("SERPER_API_KEY", ""))
+        return _tool_search_records(query, raw, session, span)
+
+
+async def search_tool_results_async(query: str) -> str:
+    """
+    asyncio variant of search_tool_results. The search goes through the
+    search session's AsyncSerperClient when it has one, so cancelling the query
+    aborts the request in flight; otherwise serper_search runs in a thread.
+    """
+    with telemetry.span("agent.tool_search") as span:
+        session, refusal = _start_tool_search(query, span)
+        if refusal:
+            return refusal
+        api_key = os.environ.get("SERPER_API_KEY", "")
+        client = session.serper_client if session else None
+        if client is not None:
+            raw = await serper_search_async(query, api_key, client)
+        else:
+            raw = await asyncio.to_thread(serper_search, query, api_key)
+        return _tool_search_records(query, raw, session, span)
+
+
+def _start_tool_search(query: str, span) -> tuple:
+    """Returns the query's search session and, for a search that must not go out, the tool's reply."""
+    span.count("tool_calls")
+    session = current_search_session()
+    action, earlier_query = session.start_tool_search(query) if session else ("search", None)
+    telemetry.increment("agent_searches", result=action)
+    span.set(action=action)
+    if action == "deduplicated":
+        return session, ALREADY_SEARCHED.format(query=earlier_query)
+    if action == "capped":
+        return session, SEARCH_LIMIT_REACHED
+    return session, None
+
+
+def _tool_search_records(query: str, raw: str, session, span) -> str:
+    if session and raw != NO_SEARCH_CONTEXT:
+        session.add(query)
+    _, search_records = assemble_context([], parse_serper_results(raw))
+    span.set(results=len(search_records))
+    return format_search_records(search_records) or (raw if raw == NO_SEARCH_CONTEXT else NO_SEARCH_RESULTS)
 
 
 def create_medical_agent(api_key: str):
     """
     Initializes and returns the medical agent and vector store.
+    The embedding model and vector store come from the process-wide registry,
+    so re-initializing the agent does not reload them.
     """
     try:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        from langgraph.prebuilt import create_react_agent
+
         llm = ChatGoogleGenerativeAI(
             model=LLM_MODEL_NAME,
             google_api_key=api_key,
             temperature=0.5,
         )
 
-        embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
-
-        vectorstore = Chroma(
-            persist_directory=PERSIST_DIR, embedding_function=embedding_model
-        )
+        vectorstore = get_vectorstore()
 
-        tools = load_tools(["google-serper"])
+        tools = [create_search_tool()]
 
         agent_executor = agent = create_react_agent(model=llm,tools=tools,prompt=system_prompt)
 
@@ -37,32 +182,480 @@ def create_medical_agent(api_key: str):
         return None, None
 
 
-def augment_prompt_with_rag(query: str, vectorstore: Chroma) -> str:
+def message_text(content) -> str:
+    """Returns the text of a message's content, which may be a string or a list of parts."""
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part if isinstance(part, str) else part.get("text", "")
+        for part in content
+        if isinstance(part, (str, dict))
+    )
+
+
+def streamed_answer_text(chunk, metadata: dict):
+    """
+    Interprets one item of the agent's stream_mode="messages" stream.
+    Returns None for a tool result, after which the agent starts its answer
+    over, otherwise the answer text the chunk adds ("" for chunks that are not
+    from the agent node).
     """
-    Performs RAG by searching the vector store and augmenting the prompt.
+    from langchain_core.messages import ToolMessage
+
+    if isinstance(chunk, ToolMessage):
+        return None
+    if metadata.get("langgraph_node") != "agent":
+        return ""
+    return message_text(chunk.content)
+
+
+def retrieve_local_records(query: str, vectorstore: "Chroma",
+                           embedding_cache: QueryEmbeddingCache = None, k: int = 5) -> list:
     """
-    results = vectorstore.similarity_search(query, k=5)
-    context = "\n----------------\n".join([doc.page_content for doc in results])
+    Searches the vector store and returns the hits as context records.
+    The query vector comes from the query embedding cache, so repeated or
+    retried questions skip the embedding model.
+    """
+    embedding_cache = embedding_cache or get_query_embedding_cache()
+    with telemetry.span("retrieval.embed_query"):
+        query_vector = embedding_cache.embed_query(query, vectorstore.embeddings)
+    with telemetry.span("retrieval.chroma_search", k=k) as span:
+        results = vectorstore.similarity_search_by_vector(query_vector, k=k)
+        span.set(results=len(results))
+    records = []
+    for doc in results:
+        metadata = doc.metadata if isinstance(doc.metadata, dict) else {}
+        records.append(ContextRecord(title=local_source_title(metadata), url="", text=doc.page_content))
+    return records
+
+
+def local_source_title(metadata: dict) -> str:
+    """Cites a knowledge-base hit by its source file and, for uploaded documents, its pages."""
+    title = metadata.get("source", LOCAL_SOURCE_TITLE)
+    if "page" in metadata:
+        pages = f"{metadata['page']}-{metadata['page_end']}" if "page_end" in metadata else metadata["page"]
+        title += f", p. {pages}"
+    return title
+
+
+def augment_prompt_with_rag(query: str, vectorstore: "Chroma",
+                            embedding_cache: QueryEmbeddingCache = None, k: int = 5) -> str:
+    """
+    Performs RAG by searching the vector store for the k closest documents and augmenting the prompt.
+    """
+    with telemetry.span("retrieval.local", k=k):
+        results = retrieve_local_records(query, vectorstore, embedding_cache, k=k)
+    context = "\n----------------\n".join([record.text for record in results])
     if not context:
-        return "There was no Local Context"
+        return NO_LOCAL_CONTEXT
     return context
 
 
 def serper_search(query: str, api_key: str):
     """
     Performs a search using the Serper API.
+    Successful results are served from and stored in the persistent search cache.
+    """
+    with telemetry.span("search.serper") as span:
+        cache = get_search_cache()
+        cached = cache.get(query)
+        telemetry.record_cache_lookup("search", cached is not None)
+        span.set(cached=cached is not None)
+        if cached is not None:
+            return cached
+
+        try:
+            result = get_serper_client().search(query, api_key)
+            cache.put(query, result)
+            return result
+        except requests.exceptions.RequestException as e:
+            print(f"Error during Serper search: {e}")
+            span.fail(str(e))
+            return NO_SEARCH_CONTEXT
+
+
+async def serper_search_async(query: str, api_key: str, client: AsyncSerperClient):
+    """
+    asyncio variant of serper_search sharing the same result cache.
     """
-    url = "https://google.serper.dev/search"
-    payload = json.dumps({"q": query})
-    headers = {
-        'X-API-KEY': api_key,
-        'Content-Type': 'application/json'
-    }
+    with telemetry.span("search.serper") as span:
+        cache = get_search_cache()
+        cached = cache.get(query)
+        telemetry.record_cache_lookup("search", cached is not None)
+        span.set(cached=cached is not None)
+        if cached is not None:
+            return cached
+
+        try:
+            result = await client.search(query, api_key)
+            cache.put(query, result)
+            return result
+        except httpx.HTTPError as e:
+            print(f"Error during Serper search: {e}")
+            span.fail(str(e))
+            return NO_SEARCH_CONTEXT
+
+
+def _result_within(future, deadline: float, default: str, source: str) -> str:
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        print(f"{source} did not finish in time; continuing without it.")
+    except Exception as e:
+        print(f"Error during {source}: {e}")
+    return default
+
+
+def _timed_call(function, *args) -> tuple:
+    """Returns function(*args) together with the seconds it took."""
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def _timed_result_within(future, deadline: float, default, source: str, timings: dict, name: str):
+    """
+    _result_within for a future running _timed_call. The duration is recorded
+    in timings only when the result arrives in time: a source given up on may
+    still finish later, after the caller has moved on with timings.
+    """
+    result, seconds = _result_within(future, deadline, (default, None), source)
+    if timings is not None and seconds is not None:
+        timings[name] = seconds
+    return result
+
+
+def gather_context(query: str, vectorstore: "Chroma", serper_api_key: str,
+                   local_timeout: float = LOCAL_CONTEXT_TIMEOUT,
+                   search_timeout: float = SEARCH_CONTEXT_TIMEOUT,
+                   search=None, timings: dict = None) -> tuple[str, str]:
+    """
+    Fetches the local RAG context and the Serper search context concurrently.
+    Each source has its own timeout measured from the moment both were started,
+    so the wait is bounded by the slowest source rather than their sum. A source
+    that fails or times out degrades to its "no context" message.
+    The raw Serper payload is reduced to title/URL/snippet records and merged
+    with the local hits under the context token budget.
+    search(query, api_key) replaces serper_search when given (e.g. an offline stub),
+    and the seconds each source took are recorded in timings when given.
+    """
+    started = time.monotonic()
+    # Each source runs in a copy of the caller's context so its spans join the caller's trace.
+    local_future = _retrieval_executor.submit(
+        contextvars.copy_context().run, _timed_call, retrieve_local_records, query, vectorstore
+    )
+    search_future = _retrieval_executor.submit(
+        contextvars.copy_context().run, _timed_call, search or serper_search, query, serper_api_key
+    )
+
+    local_records = _timed_result_within(local_future, started + local_timeout, [], "local retrieval",
+                                         timings, "local_retrieval")
+    raw_search = _timed_result_within(search_future, started + search_timeout, NO_SEARCH_CONTEXT, "Serper search",
+                                      timings, "search")
+    _remember_prefetch(query, raw_search)
+    return compact_context(local_records, raw_search)
+
+
+async def _awaited_within(task: asyncio.Future, deadline: float, default, source: str):
     try:
-        response = requests.post(url, headers=headers, data=payload)
-        response.raise_for_status() 
+        return await asyncio.wait_for(task, timeout=max(0.0, deadline - asyncio.get_running_loop().time()))
+    except asyncio.TimeoutError:
+        print(f"{source} did not finish in time; continuing without it.")
+    except Exception as e:
+        print(f"Error during {source}: {e}")
+    return default
+
+
+async def gather_context_async(query: str, vectorstore: "Chroma", serper_api_key: str,
+                               client: AsyncSerperClient,
+                               local_timeout: float = LOCAL_CONTEXT_TIMEOUT,
+                               search_timeout: float = SEARCH_CONTEXT_TIMEOUT) -> tuple[str, str]:
+    """
+    asyncio variant of gather_context. The local search runs in a worker thread
+    and the Serper request on the event loop, so concurrent queries overlap
+    their I/O instead of each holding a thread while waiting.
+    """
+    started = asyncio.get_running_loop().time()
+    local_task = asyncio.ensure_future(asyncio.to_thread(retrieve_local_records, query, vectorstore))
+    search_task = asyncio.ensure_future(serper_search_async(query, serper_api_key, client))
+
+    local_records = await _awaited_within(local_task, started + local_timeout, [], "local retrieval")
+    raw_search = await _awaited_within(search_task, started + search_timeout, NO_SEARCH_CONTEXT, "Serper search")
+    _remember_prefetch(query, raw_search)
+    return compact_context(local_records, raw_search)
+
+
+def _remember_prefetch(query: str, raw_search: str):
+    """Lets the agent's tool skip searches that repeat the prefetch, once it succeeded."""
+    session = current_search_session()
+    if session is not None and raw_search != NO_SEARCH_CONTEXT:
+        session.add(query)
+
+
+def agent_config(max_tool_searches: int = AGENT_MAX_TOOL_SEARCHES,
+                 max_refused_searches: int = AGENT_MAX_REFUSED_SEARCHES) -> dict:
+    """
+    Run config for the agent. The recursion limit is a backstop for the search
+    cap: each tool round is two graph steps (model, tool), whether the search
+    went out or was deduplicated or refused, plus a final model step. It is
+    kept even so that an agent still asking for searches on its last step ends
+    with LangGraph's "need more steps" reply instead of a GraphRecursionError;
+    AgentRun then gives it one more step to answer.
+    """
+    return {"recursion_limit": 2 * (max_tool_searches + max_refused_searches + 1)}
+
+
+def compact_context(local_records: list, raw_search: str) -> tuple[str, str]:
+    """
+    Builds the local and search context sections from local records and a raw Serper payload.
+    """
+    local_selected, search_selected = assemble_context(local_records, parse_serper_results(raw_search))
+    local_context = format_local_records(local_selected) or NO_LOCAL_CONTEXT
+    if search_selected:
+        search_context = format_search_records(search_selected)
+    elif raw_search == NO_SEARCH_CONTEXT:
+        search_context = NO_SEARCH_CONTEXT
+    else:
+        search_context = NO_SEARCH_RESULTS
+    return local_context, search_context
+
+
+def build_augmented_prompt(query: str, local_context: str, serper_context: str) -> str:
+    """
+    Wraps the user's query with the retrieved local and search context.
+    """
+    return (
+        f"Please answer the user's query based on your instructions. "
+        f"Here is some context retrieved from a local knowledge base that might be relevant:\n"
+        f"--- Local Context ---\n{local_context}\n--- End Local Context ---\n\n"
+        f"Here is some context retrieved from a search that might be relevant:\n"
+        f"--- Search Context ---\n{serper_context}\n--- End Search Context ---\n\n"
+        f"<User Query>User Query: **\"{query}\"**</User Query>"
+    )
+
+
+@dataclass
+class QueryResult:
+    """The answer to one query, the context it was given and how long each stage took (seconds)."""
+    query: str
+    answer: str = ""
+    cached: bool = False
+    local_context: str = ""
+    search_context: str = ""
+    timings: dict = field(default_factory=dict)
+
+
+def record_token_usage(span, generated: list, messages: list, answer: str):
+    """
+    Counts the agent's input and output tokens on span: the sum of the usage
+    metadata on the messages (or streamed chunks) it generated when the model
+    reports any, otherwise an estimate from the prompt and answer text.
+    """
+    usages = [usage for usage in (getattr(message, "usage_metadata", None) for message in generated) if usage]
+    if usages:
+        span.count("input_tokens", sum(usage.get("input_tokens", 0) for usage in usages))
+        span.count("output_tokens", sum(usage.get("output_tokens", 0) for usage in usages))
+        return
+    span.count("input_tokens", sum(estimate_tokens(message_text(message.content)) for message in messages))
+    span.count("output_tokens", estimate_tokens(answer) if answer else 0)
+    span.set(estimated_tokens=True)
+
+
+def uses_answer_cache(answer_cache, chat_history) -> bool:
+    """
+    Whether a query is looked up in and stored to the answer cache: only the
+    first question of a conversation is, since a follow-up's answer depends on
+    the conversation, which the cache is not keyed on.
+    """
+    return answer_cache is not None and not chat_history
+
+
+def lookup_cached_answer(answer_cache, query: str, vectorstore: "Chroma",
+                         embedding_cache: QueryEmbeddingCache = None) -> tuple:
+    """
+    Looks query up in the answer cache. Returns (query_vector, cached), where
+    cached is (cached_query, answer) or None; query_vector is None when the
+    cache could not be used, so the answer is not stored either.
+    """
+    query_vector = cached = None
+    with telemetry.span("answer_cache.lookup") as span:
+        try:
+            query_vector = (embedding_cache or get_query_embedding_cache()).embed_query(
+                query, vectorstore.embeddings
+            )
+            cached = answer_cache.lookup(query_vector)
+        except Exception as e:
+            print(f"Answer cache unavailable: {e}")
+            span.fail(str(e))
+            query_vector = cached = None
+        telemetry.record_cache_lookup("answer", cached is not None)
+    return query_vector, cached
+
+
+def serve_cached_answer(query_span, cached: tuple) -> str:
+    """Returns the answer of a cache hit from lookup_cached_answer and marks query_span as cached."""
+    cached_query, answer = cached
+    print(f"Serving cached answer for similar question: '{cached_query}'")
+    query_span.set(cached=True)
+    return answer
+
+
+def store_answer(answer_cache, query: str, query_vector, answer: str):
+    """Stores the agent's answer when the query was looked up in the answer cache."""
+    if query_vector is not None and answer:
+        answer_cache.store(query, query_vector, answer)
+
+
+def _model_call_recorder():
+    """
+    Returns a callback handler that keeps the input and output of the agent's
+    latest model call. When the agent still asks for searches on its last
+    step, LangGraph replaces that request with a canned reply in the agent's
+    state, and does not stream the reply, so this is where the leftover tool
+    calls can be seen.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class ModelCallRecorder(BaseCallbackHandler):
+        run_inline = True  # so that calls made on an event loop are recorded in order
+
+        def __init__(self):
+            self.inputs = []
+            self.output = None
+
+        def on_chat_model_start(self, serialized, messages, **kwargs):
+            self.inputs, self.output = messages[0], None
+
+        def on_llm_end(self, response, **kwargs):
+            self.output = getattr(response.generations[0][0], "message", None)
+
+    return ModelCallRecorder()
+
+
+class AgentRun:
+    """
+    Collects the agent's answer to messages, streamed or not, and records its
+    tool calls and token usage on the llm span. Run the agent on each
+    (input, config) of runs() and feed its output to add_chunk or add_response.
+    """
+
+    def __init__(self, span, messages: list):
+        self.span = span
+        self.messages = messages
+        self.answer = ""
+        self.generated = []
+        self.final_step = False
+        self._run_messages = messages
+
+    def runs(self):
+        """
+        Yields the agent's input and config. If the agent ran out of steps while
+        still asking for searches, yields one more run in which those searches
+        are refused with SEARCH_LIMIT_REACHED and the agent gets a single step
+        to answer; raises AgentStepsExhausted if it asks to search again.
+        """
+        from langchain_core.messages import ToolMessage
+
+        recorder = _model_call_recorder()
+        yield {"messages": self.messages}, {**agent_config(), "callbacks": [recorder]}
+        leftover = recorder.output
+        if not getattr(leftover, "tool_calls", None):
+            return
+
+        print("Agent ran out of steps while searching; asking it to answer without searching.")
+        self.span.set(steps_exhausted=True)
+        self.final_step = True
+        self.answer = ""
+        self._run_messages = [
+            *(message for message in recorder.inputs if message.type != "system"),
+            leftover,
+            *(ToolMessage(content=SEARCH_LIMIT_REACHED, tool_call_id=call["id"], name=call["name"])
+              for call in leftover.tool_calls),
+        ]
+        yield ({"messages": self._run_messages},
+               {"recursion_limit": FINAL_STEP_RECURSION_LIMIT, "callbacks": [recorder]})
+        if getattr(recorder.output, "tool_calls", None):
+            raise AgentStepsExhausted(STEPS_EXHAUSTED)
+
+    def add_chunk(self, chunk, metadata: dict):
+        """
+        Adds one item of the agent's stream_mode="messages" stream. Returns the
+        text it adds to the answer, or None for a tool result, after which the
+        agent starts its answer over.
+        """
+        self.generated.append(chunk)
+        text = streamed_answer_text(chunk, metadata)
+        if text is None:
+            self.span.count("tool_calls")
+            self.answer = ""
+        else:
+            self.answer += text
+        return text
+
+    def add_response(self, response: dict):
+        """Takes the answer and the generated messages from the agent's final state."""
+        self.answer = message_text(response["messages"][-1].content)
+        generated = response["messages"][len(self._run_messages):]
+        self.generated.extend(generated)
+        tool_calls = sum(1 for message in generated if getattr(message, "type", None) == "tool")
+        if tool_calls:
+            self.span.count("tool_calls", tool_calls)
+
+    def finish(self, query_span, searches):
+        """Records the token usage, and the searches of the query's search session on query_span."""
+        record_token_usage(self.span, self.generated, self.messages, self.answer)
+        query_span.set(tool_searches=searches.tool_searches, deduplicated_searches=searches.deduplicated)
+
+
+def answer_query(agent_executor, vectorstore: "Chroma", serper_api_key: str, query: str,
+                 chat_history: list = (), answer_cache=None, embedding_cache: QueryEmbeddingCache = None,
+                 on_text=None, search=None) -> QueryResult:
+    """
+    Runs the full pipeline for one query: semantic answer cache lookup (see
+    uses_answer_cache), concurrent local and web retrieval, then the agent.
+    When on_text is set, the agent's answer is streamed and on_text(answer_so_far)
+    is called as it grows; text streamed before a tool call is discarded, since
+    the agent starts a new answer once the tool result comes back.
+    search replaces serper_search, as in gather_context.
+    """
+    from langchain_core.messages import HumanMessage
+
+    with telemetry.span("query", streamed=bool(on_text)) as query_span, search_session() as searches:
+        result = QueryResult(query=query)
+        started = time.perf_counter()
+        query_vector = None
+        if uses_answer_cache(answer_cache, chat_history):
+            query_vector, cached = lookup_cached_answer(answer_cache, query, vectorstore, embedding_cache)
+            result.timings["answer_cache"] = time.perf_counter() - started
+            if cached is not None:
+                result.answer = serve_cached_answer(query_span, cached)
+                result.cached = True
+                result.timings["total"] = time.perf_counter() - started
+                return result
+
+        stage_started = time.perf_counter()
+        with telemetry.span("retrieval"):
+            result.local_context, result.search_context = gather_context(
+                query, vectorstore, serper_api_key, search=search, timings=result.timings
+            )
+        result.timings["retrieval"] = time.perf_counter() - stage_started
+
+        stage_started = time.perf_counter()
+        augmented_prompt = build_augmented_prompt(query, result.local_context, result.search_context)
+        messages = [*chat_history, HumanMessage(content=augmented_prompt)]
+        with telemetry.span("llm") as span:
+            run = AgentRun(span, messages)
+            for agent_input, config in run.runs():
+                if on_text:
+                    for chunk, metadata in agent_executor.stream(agent_input, config, stream_mode="messages"):
+                        if run.add_chunk(chunk, metadata):
+                            on_text(run.answer)
+                else:
+                    run.add_response(agent_executor.invoke(agent_input, config))
+            run.finish(query_span, searches)
+        result.answer = run.answer
+        result.timings["llm"] = time.perf_counter() - stage_started
 
-        return response.text
-    except requests.exceptions.RequestException as e:
-        print(f"Error during Serper search: {e}")
-        return "There was no Search Context due to an error."
\ No newline at end of file
+        store_answer(answer_cache, query, query_vector, result.answer)
+        result.timings["total"] = time.perf_counter() - started
+        return result
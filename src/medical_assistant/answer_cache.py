@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from src.medical_assistant.config import (
+    ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES, KB_VERSION_FILE, PERSIST_DIR
+)
+from src.medical_assistant.indexing import read_kb_version
+
+
+class SemanticAnswerCache:
+    """
+    Caches final agent answers keyed by the query embedding.
+    A lookup returns the answer of the most similar cached query when its cosine
+    similarity reaches the threshold. Entries expire after ttl_seconds and are
+    dropped as soon as the knowledge-base version marker changes.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int, kb_version_path: str):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.kb_version_path = kb_version_path
+        self.hits = 0
+        self.misses = 0
+        self._queries = []
+        self._answers = []
+        self._created = []
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._kb_version = read_kb_version(kb_version_path)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, keep: np.ndarray):
+        self._queries = [q for q, k in zip(self._queries, keep) if k]
+        self._answers = [a for a, k in zip(self._answers, keep) if k]
+        self._created = [c for c, k in zip(self._created, keep) if k]
+        self._vectors = self._vectors[keep]
+
+    def _refresh(self):
+        kb_version = read_kb_version(self.kb_version_path)
+        if kb_version != self._kb_version:
+            self._kb_version = kb_version
+            self._drop(np.zeros(len(self._answers), dtype=bool))
+            return
+        if self._created:
+            self._drop(time.time() - np.asarray(self._created) <= self.ttl_seconds)
+
+    def lookup(self, query_vector):
+        """
+        Returns (cached_query, answer) for the closest cached query above the
+        threshold, or None.
+        """
+        vector = self._unit(query_vector)
+        with self._lock:
+            self._refresh()
+            if self._answers and vector.shape[0] == self._vectors.shape[1] and vector.any():
+                similarities = self._vectors @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    return self._queries[best], self._answers[best]
+            self.misses += 1
+            return None
+
+    def store(self, query: str, query_vector, answer: str):
+        vector = self._unit(query_vector)
+        if not vector.any():
+            return
+        with self._lock:
+            self._refresh()
+            if self._answers and vector.shape[0] != self._vectors.shape[1]:
+                self._drop(np.zeros(len(self._answers), dtype=bool))
+            if not self._answers:
+                self._vectors = np.empty((0, vector.shape[0]), dtype=np.float32)
+            self._queries.append(query)
+            self._answers.append(answer)
+            self._created.append(time.time())
+            self._vectors = np.vstack([self._vectors, vector])
+            if len(self._answers) > self.max_entries:
+                keep = np.ones(len(self._answers), dtype=bool)
+                keep[:len(self._answers) - self.max_entries] = False
+                self._drop(keep)
+
+    def invalidate(self):
+        with self._lock:
+            self._drop(np.zeros(len(self._answers), dtype=bool))
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._answers)
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": size,
+        }
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """
+    Returns the process-wide semantic answer cache.
+    """
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = SemanticAnswerCache(
+                ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES,
+                os.path.join(PERSIST_DIR, KB_VERSION_FILE)
+            )
+        return _answer_cache
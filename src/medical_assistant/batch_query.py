@@ -0,0 +1,185 @@
+"""
+Runs a file of questions through the assistant and writes one JSON line per
+question with the answer, the retrieved context and per-stage timings.
+
+    python -m src.medical_assistant.batch_query questions.txt -o results.jsonl --workers 4 --rate 2
+
+Input is either plain text (one question per line, blank lines and lines
+starting with "#" are skipped) or JSONL with a "query" field and an optional "id".
+Results are written in input order. --stub-llm and --stub-search replace Gemini
+and Serper with deterministic offline stand-ins; the local knowledge base is
+always searched. The semantic answer cache is bypassed unless --use-answer-cache
+is given, so every question is answered afresh.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from src.medical_assistant import agent, registry
+from src.medical_assistant.answer_cache import get_answer_cache
+from src.medical_assistant.http_client import LatencyStats
+
+
+def read_queries(path: str) -> list:
+    """Returns [(id, query)] from a text or JSONL file. Lines of a text file are numbered from 1."""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                queries.append((record.get("id", line_number), record["query"]))
+            else:
+                queries.append((line_number, line))
+    return queries
+
+
+class RateLimiter:
+    """
+    Spaces out calls to acquire() so that at most rate_per_second of them
+    return per second, across all threads. A rate of 0 or less disables the limit.
+    """
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class StubAgent:
+    """
+    Offline stand-in for the LangGraph agent. Answers in the assistant's template
+    with the first local context line, so runs are deterministic and free.
+    """
+
+    def invoke(self, state: dict, config: dict = None) -> dict:
+        from langchain_core.messages import AIMessage
+
+        prompt = state["messages"][-1].content
+        query = prompt.rsplit("User Query: **\"", 1)[-1].split("\"**", 1)[0]
+        local = prompt.split("--- Local Context ---\n", 1)[-1].split("\n", 1)[0]
+        return {"messages": [AIMessage(content=(
+            f"**Triage**: Stub answer.\n\n"
+            f"**Condition**: {query}\n\n"
+            f"**First-Aid Steps**:\n- Step 1: {local}"
+        ))]}
+
+
+def stub_search(query: str, api_key: str) -> str:
+    """Offline stand-in for serper_search that returns no results."""
+    return json.dumps({"organic": []})
+
+
+def run_batch(queries: list, output, agent_executor, vectorstore, serper_api_key: str, workers: int,
+              rate_per_second: float, answer_cache=None, search=None) -> dict:
+    """
+    Answers queries with up to `workers` in flight, starting at most
+    rate_per_second per second, and writes one JSON line per query to output
+    in input order. Returns a summary of the run.
+    """
+    limiter = RateLimiter(rate_per_second)
+    latencies = LatencyStats(window=max(1, len(queries)))
+
+    def run_one(item):
+        query_id, query = item
+        limiter.acquire()
+        started = time.perf_counter()
+        record = {"id": query_id, "query": query}
+        try:
+            result = agent.answer_query(agent_executor, vectorstore, serper_api_key, query,
+                                        answer_cache=answer_cache, search=search)
+            record.update(answer=result.answer, cached=result.cached, local_context=result.local_context,
+                          search_context=result.search_context, error=None,
+                          timings_ms={stage: round(seconds * 1000, 1) for stage, seconds in result.timings.items()})
+        except Exception as e:
+            record.update(answer=None, error=str(e))
+        latencies.record(time.perf_counter() - started, ok=record["error"] is None)
+        return record
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch-query") as pool:
+        for done, record in enumerate(pool.map(run_one, queries), start=1):
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            status = "error: " + record["error"] if record["error"] else "ok"
+            print(f"[{done}/{len(queries)}] {record['query'][:60]} ({status})", file=sys.stderr)
+    elapsed = time.perf_counter() - started
+
+    latency = latencies.snapshot()
+    return {
+        "queries": len(queries),
+        "errors": latency["errors"],
+        "seconds": elapsed,
+        "queries_per_sec": len(queries) / elapsed if elapsed else 0.0,
+        "p50_ms": latency["p50"] * 1000,
+        "p95_ms": latency["p95"] * 1000,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queries", help="text file with one question per line, or JSONL with a 'query' field")
+    parser.add_argument("-o", "--output", default="-", help="JSONL file to write (default: stdout)")
+    parser.add_argument("--workers", type=int, default=4, help="questions answered at once (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="maximum questions started per second, 0 for no limit (default: %(default)s)")
+    parser.add_argument("--stub-llm", action="store_true", help="answer with an offline stub instead of Gemini")
+    parser.add_argument("--stub-search", action="store_true", help="replace the Serper search done before each question with an offline stub "
+                             "(searches the real agent makes through its tool are unaffected)")
+    parser.add_argument("--use-answer-cache", action="store_true", help="reuse cached answers to similar questions")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    google_api_key = os.environ.get("GOOGLE_API_KEY")
+    serper_api_key = os.environ.get("SERPER_API_KEY", "")
+    if not args.stub_llm and not google_api_key:
+        print("GOOGLE_API_KEY must be set in the environment or in .env (or use --stub-llm).", file=sys.stderr)
+        return 1
+    if not args.stub_search and not serper_api_key:
+        print("SERPER_API_KEY must be set in the environment or in .env (or use --stub-search).", file=sys.stderr)
+        return 1
+
+    queries = read_queries(args.queries)
+    if args.stub_llm:
+        agent_executor, vectorstore = StubAgent(), registry.get_vectorstore()
+    else:
+        agent_executor, vectorstore = agent.create_medical_agent(google_api_key)
+        if agent_executor is None:
+            print("Failed to initialize the agent.", file=sys.stderr)
+            return 1
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        summary = run_batch(queries, output, agent_executor, vectorstore, serper_api_key, args.workers, args.rate,
+                            answer_cache=get_answer_cache() if args.use_answer_cache else None,
+                            search=stub_search if args.stub_search else None)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"{summary['queries']} questions in {summary['seconds']:.1f}s "
+          f"({summary['queries_per_sec']:.2f}/s), p50 {summary['p50_ms']:.0f} ms, "
+          f"p95 {summary['p95_ms']:.0f} ms, {summary['errors']} error(s)", file=sys.stderr)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
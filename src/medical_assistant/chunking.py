@@ -0,0 +1,161 @@
+import functools
+import os
+import re
+from dataclasses import dataclass, field
+
+from src.medical_assistant.config import (
+    CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS, EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR
+)
+from src.medical_assistant.history import estimate_tokens
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class TokenCounter:
+    """
+    Counts and splits text in the embedding model's tokens. Without a
+    tokenizer it falls back to the four-characters-per-token estimate.
+    """
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer
+
+    def count(self, text: str) -> int:
+        if self.tokenizer is None:
+            return estimate_tokens(text)
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def split(self, text: str, max_tokens: int) -> list:
+        """Cuts text into consecutive pieces of at most max_tokens tokens each."""
+        if self.tokenizer is None:
+            step = max_tokens * 4
+            return [text[i:i + step] for i in range(0, len(text), step)]
+        offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+        pieces = []
+        for i in range(0, len(offsets), max_tokens):
+            end = offsets[i + max_tokens][0] if i + max_tokens < len(offsets) else len(text)
+            pieces.append(text[offsets[i][0]:end].rstrip())
+        return pieces
+
+    def tail(self, text: str, max_tokens: int) -> str:
+        """Returns the end of text, at most max_tokens tokens long and starting at a word boundary."""
+        if self.tokenizer is None:
+            start = max(0, len(text) - max_tokens * 4)
+        else:
+            offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+            if len(offsets) <= max_tokens:
+                return text
+            start = offsets[-max_tokens][0] if max_tokens > 0 else len(text)
+        if 0 < start < len(text) and not text[start - 1].isspace():
+            next_space = text.find(" ", start)
+            start = len(text) if next_space < 0 else next_space + 1
+        return text[start:]
+
+
+def _load_tokenizer(model_name: str, onnx_model_dir: str):
+    """
+    Loads the embedding model's fast tokenizer from the exported ONNX model or
+    the local Hugging Face cache, without touching the network. Returns None if
+    neither has it (e.g. before the embedding model was first downloaded).
+    """
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        return None
+
+    exported = os.path.join(onnx_model_dir, "tokenizer.json")
+    if os.path.isfile(exported):
+        return Tokenizer.from_file(exported)
+    try:
+        from huggingface_hub import hf_hub_download
+
+        return Tokenizer.from_file(hf_hub_download(model_name, "tokenizer.json", local_files_only=True))
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_token_counter() -> TokenCounter:
+    """Returns the token counter for the configured embedding model, loaded once per process."""
+    tokenizer = _load_tokenizer(EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR)
+    if tokenizer is None:
+        print(f"Tokenizer for '{EMBEDDING_MODEL_NAME}' not found locally; estimating chunk sizes.")
+    return TokenCounter(tokenizer)
+
+
+@dataclass
+class Chunk:
+    """A piece of a document sized for the embedding model, with the pages it came from."""
+    text: str
+    pages: list = field(default_factory=list)
+
+    def metadata(self, source: str, index: int) -> dict:
+        metadata = {"source": source, "chunk": index}
+        if self.pages:
+            metadata["page"] = self.pages[0]
+            if self.pages[-1] != self.pages[0]:
+                metadata["page_end"] = self.pages[-1]
+        return metadata
+
+
+def _units(text: str, page, counter: TokenCounter, max_tokens: int) -> list:
+    """Splits an element into (text, tokens, page) units of at most max_tokens, at sentence ends where possible."""
+    tokens = counter.count(text)
+    if tokens <= max_tokens:
+        return [(text, tokens, page)]
+    units = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence_tokens = counter.count(sentence)
+        if sentence_tokens <= max_tokens:
+            units.append((sentence, sentence_tokens, page))
+        else:
+            units.extend((piece, counter.count(piece), page) for piece in counter.split(sentence, max_tokens))
+    return units
+
+
+def chunk_elements(elements: list, counter: TokenCounter = None, chunk_tokens: int = CHUNK_TOKENS,
+                   overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list:
+    """
+    Turns a document's (text, page) elements into chunks of about chunk_tokens
+    tokens: small elements (headings, list items, short paragraphs) are merged
+    with their neighbours and large ones are split at sentence ends, or at token
+    boundaries for overlong sentences. Each chunk starts with up to
+    overlap_tokens tokens from the end of the previous one, so text cut at a
+    chunk boundary is still retrievable in context.
+    """
+    counter = counter or get_token_counter()
+    # Units leave room for the overlap, so every chunk can start with it.
+    max_unit_tokens = max(1, chunk_tokens - overlap_tokens)
+    chunks, current, current_tokens = [], [], 0
+
+    def emit():
+        chunks.append(Chunk(
+            text="\n".join(text for text, _, _ in current),
+            pages=sorted({page for _, _, page in current if page is not None}),
+        ))
+
+    for text, page in elements:
+        for unit in _units(text.strip(), page, counter, max_unit_tokens):
+            if current and current_tokens + unit[1] > chunk_tokens:
+                emit()
+                carried, carried_tokens = [], 0
+                for previous_text, previous_tokens, previous_page in reversed(current):
+                    room = overlap_tokens - carried_tokens
+                    if room <= 0:
+                        break
+                    if previous_tokens > room:
+                        tail = counter.tail(previous_text, room)
+                        if tail:
+                            carried.insert(0, (tail, counter.count(tail), previous_page))
+                            carried_tokens += carried[0][1]
+                        break
+                    carried.insert(0, (previous_text, previous_tokens, previous_page))
+                    carried_tokens += previous_tokens
+                if carried_tokens + unit[1] > chunk_tokens:
+                    carried, carried_tokens = [], 0
+                current, current_tokens = carried, carried_tokens
+            current.append(unit)
+            current_tokens += unit[1]
+    if current:
+        emit()
+    return chunks
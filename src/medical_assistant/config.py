@@ -1,7 +1,82 @@
+import os
+
 PERSIST_DIR = "medical_chroma_db"
 EMBEDDING_MODEL_NAME = "abhinand/MedEmbed-small-v0.1"
 LLM_MODEL_NAME = "gemini-2.0-flash" 
 DATA_PATH="Assignment Data Base.xlsx"
+DATA_SHEETS = None  # sheets of DATA_PATH to ingest, e.g. ("Burns", "Bleeding"); None reads every sheet
+DATA_TEXT_COLUMNS = ("Sentence",)  # columns whose cells are embedded, each cell as its own document
+DATA_METADATA_COLUMNS = None  # other columns stored as Chroma metadata with each document; None keeps them all
+
+# Embeddings
+EMBEDDING_BACKEND = "torch"  # "torch" (PyTorch fp32), "onnx" (ONNX Runtime fp32) or "onnx-int8" (dynamically quantized)
+ONNX_MODEL_DIR = os.path.join("onnx_models", "MedEmbed-small-v0.1")  # exported on first use of an ONNX backend
+EMBEDDING_BATCH_SIZE = 32  # texts per ONNX Runtime call
+
+# Retrieval (seconds, measured from when both sources start)
+LOCAL_CONTEXT_TIMEOUT = 15.0
+SEARCH_CONTEXT_TIMEOUT = 8.0
+CONTEXT_TOKEN_BUDGET = 1500  # local hits plus search snippets included in the prompt
+SNIPPET_DUPLICATE_THRESHOLD = 0.6  # word-trigram Jaccard similarity above which a snippet is dropped
+RETRIEVAL_MAX_WORKERS = 16  # threads shared by all queries for local retrieval and web search
+
+# Agent
+STREAM_RESPONSES = True  # stream answer tokens into the chat window as they are generated
+QUERY_MAX_CONCURRENT = 2  # questions the desktop app answers at once
+QUERY_MAX_PENDING = 3  # questions per conversation waiting or being answered; further ones are refused
+QUERY_TIMEOUT_S = 90.0  # a question not answered within this many seconds is stopped
+TRANSCRIPT_LAYOUT_CACHE_SIZE = 200  # chat bubbles whose rendered layout is kept; others are laid out again when shown
+HISTORY_TOKEN_BUDGET = 2000  # recent turns kept verbatim in the prompt
+HISTORY_SUMMARY_TOKEN_BUDGET = 400  # older turns are compacted into a summary of at most this size
+AGENT_MAX_TOOL_SEARCHES = 2  # web searches the agent may make through its tool per query, on top of the prefetch
+AGENT_MAX_REFUSED_SEARCHES = 2  # deduplicated or over-the-cap tool searches the agent's step budget leaves room for
+SEARCH_DEDUP_SIMILARITY = 0.75  # word Jaccard similarity at which a tool search counts as repeating an earlier one
+
+# Headless server (python -m src.medical_assistant.server)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8080
+SERVER_MAX_CONCURRENT_QUERIES = 8  # queries processed at once; further requests wait their turn
+SERVER_MAX_SESSIONS = 1000  # least recently used chat sessions are dropped beyond this
+SERVER_SESSION_TTL = 60 * 60  # seconds an idle chat session is kept
+SERVER_INGEST_ROOT = "documents"  # POST /ingest only reads files inside this folder; relative paths are taken from it
+
+# Serper HTTP client
+SERPER_URL = "https://google.serper.dev/search"
+SERPER_CONNECT_TIMEOUT = 3.05  # seconds
+SERPER_READ_TIMEOUT = 10.0  # seconds
+SERPER_MAX_RETRIES = 3  # retries on connection errors and 429/5xx responses
+SERPER_BACKOFF_FACTOR = 0.5  # exponential backoff base, in seconds
+HTTP_POOL_SIZE = 10  # keep-alive connections per client
+
+# Caches
+CACHE_DIR = "medical_cache"
+SEARCH_CACHE_PATH = os.path.join(CACHE_DIR, "serper_cache.sqlite3")
+SEARCH_CACHE_TTL = 24 * 60 * 60  # seconds before a cached search result is refetched
+SEARCH_CACHE_MAX_ENTRIES = 5000  # least recently used results are evicted beyond this
+QUERY_EMBEDDING_CACHE_SIZE = 1024  # query vectors kept in memory (LRU)
+QUERY_EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "query_embeddings.json")  # None keeps it in memory only
+ANSWER_CACHE_THRESHOLD = 0.95  # minimum cosine similarity for a cached answer to be reused
+ANSWER_CACHE_TTL = 6 * 60 * 60  # seconds a cached answer stays valid
+ANSWER_CACHE_MAX_ENTRIES = 500  # oldest answers are evicted beyond this
+
+# Telemetry
+TELEMETRY_LOG_PATH = None  # append every finished span here as a JSON line, e.g. os.path.join(CACHE_DIR, "spans.jsonl")
+TELEMETRY_RECENT_SPANS = 200  # spans kept in memory for inspection
+TELEMETRY_PANEL_REFRESH_MS = 2000  # how often the UI's performance panel is refreshed
+
+# Ingestion
+INGEST_BATCH_SIZE = 256  # documents embedded and written to Chroma per batch
+INGEST_READ_AHEAD = 4 * INGEST_BATCH_SIZE  # workbook rows parsed ahead while the previous batch is embedded
+INGEST_CHECKPOINT_FILE = "ingest_checkpoint.json"  # stored inside PERSIST_DIR
+INGEST_MANIFEST_FILE = "ingest_manifest.sqlite3"  # stored inside PERSIST_DIR; maps every source row/chunk to its vector
+INGEST_MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # processes used to partition documents
+INGEST_MAX_CONCURRENT_JOBS = 2  # ingestion jobs the desktop app runs at once; partitioning processes are shared between them
+INGEST_JOBS_FILE = "ingest_jobs.sqlite3"  # stored inside PERSIST_DIR; queued and interrupted jobs resume on restart
+INGEST_QUERY_PRIORITY_WAIT_S = 5.0  # longest an ingestion batch waits for in-flight queries before continuing
+INGEST_FILE_EXTENSIONS = (".txt", ".pdf", ".docx", ".md")  # picked up when a folder is ingested
+CHUNK_TOKENS = 256  # target size of uploaded-document chunks, in embedding-model tokens (the model reads at most 512)
+CHUNK_OVERLAP_TOKENS = 32  # tokens from the end of each chunk repeated at the start of the next
+KB_VERSION_FILE = "kb_version"  # stored inside PERSIST_DIR, rewritten whenever ingestion adds documents
 disclaimer = """
 ⚠️ This information is for educational purposes only and is not a substitute for professional medical advice.
 """
@@ -50,7 +125,7 @@ URL: [Full URL of Source 2]
    - If the situation involves severe bleeding, difficulty breathing, chest pain, signs of stroke (FAST), loss of consciousness, or any other potentially life-threatening symptoms, the **Triage** section **MUST** be: "Call emergency services immediately."
 
 **2. Information Sourcing:**
-   - If the initial context provided is insufficient to fill out the template accurately, you **MUST** use the `google-serper` tool to find the necessary information. Do not ask for permission.
+   - If the initial context provided is insufficient to fill out the template accurately, you **MUST** use the `google-serper` tool to find the necessary information. Do not ask for permission. The Search Context already holds the results of searching the user's query, so search only for the specific information that is missing rather than repeating it.
    - You are forbidden from using any information, data, or medical knowledge you have from outside the provided context and the `google-serper` tool results. **No exceptions.**
 
 **3. Content and Language:**
@@ -0,0 +1,107 @@
+import json
+import re
+from dataclasses import dataclass
+
+from src.medical_assistant.config import CONTEXT_TOKEN_BUDGET, SNIPPET_DUPLICATE_THRESHOLD
+from src.medical_assistant.history import estimate_tokens
+
+LOCAL_SOURCE_TITLE = "Local Knowledge Base"
+
+
+@dataclass
+class ContextRecord:
+    """A single piece of retrieved context with the details needed to cite it."""
+    title: str
+    url: str
+    text: str
+
+
+def parse_serper_results(raw: str) -> list:
+    """
+    Extracts title/URL/snippet records from a raw Serper JSON payload, in rank
+    order: answer box, knowledge graph, organic results, then "people also ask".
+    Related searches, images and other fields are dropped, as are repeated URLs.
+    Returns an empty list if the payload is not Serper JSON (e.g. an error message).
+    """
+    try:
+        payload = json.loads(raw)
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(payload, dict):
+        return []
+
+    candidates = []
+    answer_box = payload.get("answerBox") or {}
+    if answer_box:
+        candidates.append((answer_box.get("title"), answer_box.get("link"),
+                           answer_box.get("answer") or answer_box.get("snippet")))
+    knowledge_graph = payload.get("knowledgeGraph") or {}
+    if knowledge_graph:
+        candidates.append((knowledge_graph.get("title"),
+                           knowledge_graph.get("descriptionLink") or knowledge_graph.get("website"),
+                           knowledge_graph.get("description")))
+    for result in payload.get("organic") or []:
+        candidates.append((result.get("title"), result.get("link"), result.get("snippet")))
+    for question in payload.get("peopleAlsoAsk") or []:
+        candidates.append((question.get("title") or question.get("question"), question.get("link"),
+                           question.get("snippet")))
+
+    records, seen_urls = [], set()
+    for title, url, text in candidates:
+        if not url or not text or url in seen_urls:
+            continue
+        seen_urls.add(url)
+        records.append(ContextRecord(title=(title or url).strip(), url=url.strip(), text=" ".join(text.split())))
+    return records
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    if len(words) < 3:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def is_near_duplicate(a: str, b: str, threshold: float = SNIPPET_DUPLICATE_THRESHOLD) -> bool:
+    """
+    Compares two snippets by the Jaccard similarity of their word trigrams.
+    """
+    shingles_a, shingles_b = _shingles(a), _shingles(b)
+    if not shingles_a or not shingles_b:
+        return False
+    return len(shingles_a & shingles_b) / len(shingles_a | shingles_b) >= threshold
+
+
+def format_search_records(records: list) -> str:
+    return "\n\n".join(f"Title: {r.title}\nURL: {r.url}\nSnippet: {r.text}" for r in records)
+
+
+def format_local_records(records: list) -> str:
+    return "\n----------------\n".join(
+        r.text if r.title == LOCAL_SOURCE_TITLE else f"{r.text}\n(Source: {r.title})" for r in records
+    )
+
+
+def assemble_context(local_records: list, search_records: list,
+                     token_budget: int = CONTEXT_TOKEN_BUDGET,
+                     duplicate_threshold: float = SNIPPET_DUPLICATE_THRESHOLD) -> tuple:
+    """
+    Merges local and search records into the prompt's two context sections.
+    Local hits come first, then search results in rank order. Records that
+    nearly duplicate an already selected one are dropped, and records that no
+    longer fit in token_budget are skipped.
+    Returns (local_records, search_records) as selected.
+    """
+    selected_local, selected_search, selected_texts = [], [], []
+    used = 0
+    for records, selected in ((local_records, selected_local), (search_records, selected_search)):
+        for record in records:
+            if any(is_near_duplicate(record.text, text, duplicate_threshold) for text in selected_texts):
+                continue
+            cost = estimate_tokens(f"{record.title} {record.url} {record.text}")
+            if used + cost > token_budget:
+                continue
+            used += cost
+            selected.append(record)
+            selected_texts.append(record.text)
+    return selected_local, selected_search
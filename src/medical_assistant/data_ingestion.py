@@ -1,107 +1,198 @@
+import datetime
 import os
 import shutil
-import pandas as pd
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 
-from src.medical_assistant.config import DATA_PATH, PERSIST_DIR, EMBEDDING_MODEL_NAME
+from src.medical_assistant.config import (
+    DATA_PATH, PERSIST_DIR, EMBEDDING_MODEL_NAME, INGEST_BATCH_SIZE, INGEST_CHECKPOINT_FILE,
+    INGEST_MANIFEST_FILE, INGEST_READ_AHEAD, KB_VERSION_FILE,
+    DATA_SHEETS, DATA_TEXT_COLUMNS, DATA_METADATA_COLUMNS
+)
+from src.medical_assistant.indexing import IngestionCheckpoint, bump_kb_version, ingest_documents, read_ahead
+from src.medical_assistant.manifest import IngestionManifest, track_items
+from src.medical_assistant.registry import discard_vectorstore, get_embedding_model, get_vectorstore
+
+
+def _metadata_value(value):
+    """Converts a cell value to a type Chroma accepts as metadata, or None to leave it out."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def iter_rows(data_path: str, sheets: tuple = DATA_SHEETS, text_columns: tuple = DATA_TEXT_COLUMNS,
+              metadata_columns: tuple = DATA_METADATA_COLUMNS):
+    """
+    Streams the workbook one row at a time (openpyxl read-only mode, so memory
+    stays flat for any workbook size) and yields (item, text, metadata) for
+    every non-empty text cell. item identifies the cell, e.g. "Burns!Sentence 12";
+    metadata holds the sheet, the row number and the row's other columns
+    (metadata_columns, or all of them when None).
+    Sheets default to all sheets; sheets without any of the text columns are skipped.
+    """
+    from openpyxl import load_workbook
 
-def ingest_main():
+    workbook = load_workbook(data_path, read_only=True, data_only=True)
+    try:
+        found_text_column = False
+        for sheet_name in (sheets or workbook.sheetnames):
+            rows = workbook[sheet_name].iter_rows(values_only=True)
+            header = [str(name).strip() if name is not None else "" for name in next(rows, ())]
+            text_indexes = [(name, header.index(name)) for name in text_columns if name in header]
+            if not text_indexes:
+                print(f"Skipping sheet '{sheet_name}': none of the columns {list(text_columns)} found.")
+                continue
+            found_text_column = True
+            metadata_indexes = [
+                (name, index) for index, name in enumerate(header)
+                if name and name not in text_columns and (metadata_columns is None or name in metadata_columns)
+            ]
+            for row_number, row in enumerate(rows, start=2):
+                metadata = {"sheet": sheet_name, "row": row_number}
+                for name, index in metadata_indexes:
+                    value = _metadata_value(row[index]) if index < len(row) else None
+                    if value is not None:
+                        metadata[name] = value
+                for name, index in text_indexes:
+                    text = row[index] if index < len(row) else None
+                    if text is not None and str(text).strip():
+                        yield f"{sheet_name}!{name} {row_number}", str(text), metadata
+    finally:
+        workbook.close()
+
+    if not found_text_column:
+        raise ValueError(f"Column(s) {list(text_columns)} not found in '{data_path}'. "
+                         f"Please ensure the column name is correct.")
+
+
+def iter_sentences(data_path: str):
+    """
+    Yields the text of every configured sheet and column one at a time.
+    """
+    for _, sentence, _ in iter_rows(data_path):
+        yield sentence
+
+
+def print_progress(stats):
+    print(f"Committed batch {stats.batches}: {stats.read} rows read, {stats.added} new documents added.")
+
+
+def ingest_main(data_path: str = None, persist_dir: str = None):
     """
     Main function to ingest data, create embeddings, and persist the vector store.
-    It now checks for existing documents using similarity_search before adding.
+    data_path and persist_dir default to DATA_PATH and PERSIST_DIR.
+    Rows are streamed from every configured sheet in batches of
+    INGEST_BATCH_SIZE: each batch is checked against the content-hash index,
+    embedded and written, while a reader thread parses up to INGEST_READ_AHEAD
+    rows ahead. A checkpoint in the persist directory lets an interrupted run resume
+    from the last committed batch.
+    The ingestion manifest makes re-runs incremental: an unchanged data file is
+    skipped without loading the model, rows already in the manifest are not
+    looked up or embedded again, and the vectors of removed or edited rows are
+    deleted once the whole file has been ingested.
     """
+    data_path = data_path or DATA_PATH
+    persist_dir = persist_dir or PERSIST_DIR
     print("--- Starting Data Ingestion ---")
 
     # Check data file exists using isfile to avoid mocking conflicts
-    if not os.path.isfile(DATA_PATH):
+    if not os.path.isfile(data_path):
         raise FileNotFoundError(
-            f"Error: Data file not found at '{DATA_PATH}'. Please ensure it's in the project root."
+            f"Error: Data file not found at '{data_path}'. Please ensure it's in the project root."
         )
-    print(f"Found data file: '{DATA_PATH}'")
-
-    try:
-        df = pd.read_excel(DATA_PATH)
-        if "Sentence" not in df.columns:
-            raise ValueError(f"Column 'Sentence' not found in '{DATA_PATH}'. Please ensure the column name is correct.")
-        sentences = df["Sentence"].dropna().tolist()
-        if not sentences:
-            print(f"Warning: No valid sentences found in the 'Sentence' column of '{DATA_PATH}'. Exiting.")
+    print(f"Found data file: '{data_path}'")
+
+    manifest_path = os.path.join(persist_dir, INGEST_MANIFEST_FILE)
+    if os.path.isfile(manifest_path):
+        manifest = IngestionManifest(manifest_path)
+        unchanged = manifest.is_unchanged(data_path)
+        manifest.close()
+        if unchanged:
+            print(f"'{data_path}' has not changed since it was last ingested. ChromaDB is already up to date.")
             return
-        print(f"Successfully loaded {len(sentences)} sentences from the 'Sentence' column in '{DATA_PATH}'.")
-    except Exception as e:
-        print(f"Error loading or processing Excel file '{DATA_PATH}': {e}")
-        return
-
-    all_new_documents = [Document(page_content=sentence) for sentence in sentences]
 
     print(f"Loading embedding model: '{EMBEDDING_MODEL_NAME}'...")
     print("(This may take a few minutes and download data on the first run if not cached)")
     try:
-        embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+        get_embedding_model()
     except Exception as e:
         print(f"Error initializing embedding model: {e}")
         print("Please check your internet connection")
         return
 
     vectorstore = None
-    documents_to_add = []
 
-    chroma_db_exists = os.path.exists(PERSIST_DIR) and any(f.startswith('chroma') for f in os.listdir(PERSIST_DIR))
+    chroma_db_exists = os.path.exists(persist_dir) and any(f.startswith('chroma') for f in os.listdir(persist_dir))
 
     if chroma_db_exists:
-        print(f"Found existing vector store at '{PERSIST_DIR}'. Attempting to load...")
+        print(f"Found existing vector store at '{persist_dir}'. Attempting to load...")
         try:
-            vectorstore = Chroma(
-                persist_directory=PERSIST_DIR,
-                embedding_function=embedding_model
-            )
+            vectorstore = get_vectorstore(persist_dir)
             print("ChromaDB loaded successfully.")
-
-            print("Checking for existing documents in ChromaDB using similarity search...")
-            for doc in all_new_documents:
-                existing_docs = vectorstore.similarity_search(doc.page_content, k=1)
-
-                if not (existing_docs and existing_docs[0].page_content == doc.page_content):
-                    documents_to_add.append(doc)
-
-            if not documents_to_add:
-                print("No new unique documents from the data file found to add. ChromaDB is already up to date.")
-            else:
-                print(f"Identified {len(documents_to_add)} new unique documents to add to the existing database.")
-
         except Exception as e:
-            print(f"Error loading existing Chroma vector store from '{PERSIST_DIR}': {e}")
+            print(f"Error loading existing Chroma vector store from '{persist_dir}': {e}")
             print("The existing vector store might be corrupted or incompatible. Attempting to create a new one.")
-            if os.path.exists(PERSIST_DIR):
-                print(f"Removing potentially corrupted vector store at '{PERSIST_DIR}'...")
-                shutil.rmtree(PERSIST_DIR)
+            discard_vectorstore(persist_dir)
+            if os.path.exists(persist_dir):
+                print(f"Removing potentially corrupted vector store at '{persist_dir}'...")
+                shutil.rmtree(persist_dir)
             vectorstore = None
 
     if vectorstore is None:
-        print(f"Creating a new vector store at '{PERSIST_DIR}'...")
+        print(f"Creating a new vector store at '{persist_dir}'...")
         try:
-            vectorstore = Chroma.from_documents(
-                documents=all_new_documents,
-                embedding=embedding_model,
-                persist_directory=PERSIST_DIR
-            )
-            print(f"Successfully created a new vector store with {len(all_new_documents)} documents.")
+            vectorstore = get_vectorstore(persist_dir)
         except Exception as e:
             print(f"Error creating Chroma vector store: {e}")
             return
-    elif documents_to_add:
-        try:
-            print(f"Adding {len(documents_to_add)} new unique documents to the existing vector store...")
-            vectorstore.add_documents(documents=documents_to_add)
-            print("New documents successfully added.")
-        except Exception as e:
-            print(f"Error adding new documents to existing Chroma vector store: {e}")
-            return
+
+    manifest = IngestionManifest(manifest_path)
+    checkpoint = IngestionCheckpoint(os.path.join(persist_dir, INGEST_CHECKPOINT_FILE), data_path)
+    if checkpoint.load() == 0:
+        manifest.clear_staged(data_path)
+    counts = {}
+    documents = track_items(
+        manifest, data_path,
+        ((item, Document(page_content=text, metadata=metadata))
+         for item, text, metadata in read_ahead(iter_rows(data_path), INGEST_READ_AHEAD)),
+        batch_size=INGEST_BATCH_SIZE, counts=counts,
+    )
+    try:
+        stats = ingest_documents(
+            vectorstore,
+            documents,
+            batch_size=INGEST_BATCH_SIZE,
+            checkpoint=checkpoint,
+            progress_callback=print_progress,
+        )
+        removed = manifest.commit_source(vectorstore, data_path)
+    except Exception as e:
+        print(f"Error ingesting '{data_path}': {e}")
+        print("Re-run the ingestion to resume from the last committed batch.")
+        return
+    finally:
+        manifest.close()
+
+    if stats.added or removed:
+        bump_kb_version(os.path.join(persist_dir, KB_VERSION_FILE))
+    if stats.resumed_from:
+        print(f"Resumed after {stats.resumed_from} previously committed rows.")
+    rows = counts.get("items", 0)
+    if rows == 0:
+        print(f"Warning: No valid sentences found in the 'Sentence' column of '{data_path}'.")
+    elif stats.added == 0 and removed == 0:
+        print("No new unique documents from the data file found to add. ChromaDB is already up to date.")
+    else:
+        print(f"Added {stats.added} new unique documents from {rows} rows.")
+        if removed:
+            print(f"Removed {removed} documents whose rows were edited or deleted.")
 
     print("--- Data Ingestion Complete! ---")
-    print(f"Vector store is ready at '{PERSIST_DIR}'.")
+    print(f"Vector store is ready at '{persist_dir}'.")
 
 if __name__ == "__main__":
     ingest_main()
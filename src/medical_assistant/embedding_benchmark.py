@@ -0,0 +1,140 @@
+"""
+Throughput, latency and parity benchmark for the embedding backends.
+
+Embeds the knowledge-base sentences with each backend (docs/sec), embeds
+queries one at a time (p50/p95 latency) and compares every backend's vectors
+with the PyTorch fp32 reference: per-document cosine similarity and how many
+of each query's top-k neighbours agree with the reference.
+
+    python -m src.medical_assistant.embedding_benchmark --backends torch onnx onnx-int8 --docs 1000
+"""
+import argparse
+import json
+import sys
+import time
+from itertools import islice
+
+import numpy as np
+
+from src.medical_assistant.config import DATA_PATH
+from src.medical_assistant.http_client import LatencyStats
+from src.medical_assistant.registry import EMBEDDING_BACKENDS, create_embedding_model
+
+REFERENCE_BACKEND = "torch"
+SAMPLE_QUERIES = (
+    "How do I treat a minor burn?",
+    "What should I do if someone is choking?",
+    "First aid for a nosebleed",
+    "Signs of a heart attack",
+    "How to stop heavy bleeding from a cut",
+    "What to do for a sprained ankle",
+    "Someone fainted, what now?",
+    "Bee sting swelling and itching",
+    "How to recognise heat stroke",
+    "Child swallowed a small battery",
+)
+
+
+def load_documents(limit: int) -> list:
+    """Returns up to `limit` knowledge-base sentences, or the sample queries if the data file is unavailable."""
+    try:
+        from src.medical_assistant.data_ingestion import iter_sentences
+
+        documents = list(islice(iter_sentences(DATA_PATH), limit))
+    except (OSError, ValueError):
+        documents = []
+    return documents or list(islice(iter(SAMPLE_QUERIES * (limit // len(SAMPLE_QUERIES) + 1)), limit))
+
+
+def benchmark_backend(embedding_model, documents: list, queries: list) -> dict:
+    """
+    Times embed_documents over all documents and embed_query for each query.
+    Returns the timings together with the vectors, for the parity check.
+    """
+    embedding_model.embed_query("warm-up")
+    started = time.perf_counter()
+    document_vectors = np.asarray(embedding_model.embed_documents(documents), dtype=np.float32)
+    documents_seconds = time.perf_counter() - started
+
+    latencies = LatencyStats(window=len(queries))
+    query_vectors = []
+    for query in queries:
+        started = time.perf_counter()
+        query_vectors.append(embedding_model.embed_query(query))
+        latencies.record(time.perf_counter() - started, ok=True)
+    latency = latencies.snapshot()
+    return {
+        "docs_per_sec": len(documents) / documents_seconds if documents_seconds else float("inf"),
+        "query_p50_ms": latency["p50"] * 1000,
+        "query_p95_ms": latency["p95"] * 1000,
+        "document_vectors": document_vectors,
+        "query_vectors": np.asarray(query_vectors, dtype=np.float32),
+    }
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def parity(reference: dict, candidate: dict, k: int = 5) -> dict:
+    """
+    Compares a backend's vectors with the reference backend's: cosine similarity
+    of each document vector, and the fraction of each query's top-k documents
+    that the reference also ranks in its top-k.
+    """
+    ref_docs, cand_docs = _unit_rows(reference["document_vectors"]), _unit_rows(candidate["document_vectors"])
+    cosines = np.sum(ref_docs * cand_docs, axis=1)
+
+    k = min(k, len(ref_docs))
+    ref_top = np.argsort(-(_unit_rows(reference["query_vectors"]) @ ref_docs.T), axis=1)[:, :k]
+    cand_top = np.argsort(-(_unit_rows(candidate["query_vectors"]) @ cand_docs.T), axis=1)[:, :k]
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)]
+    return {
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        f"top{k}_agreement": float(np.mean(overlap)),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=EMBEDDING_BACKENDS, default=list(EMBEDDING_BACKENDS),
+                        help="backends to benchmark (default: all)")
+    parser.add_argument("--docs", type=int, default=1000, help="documents to embed (default: %(default)s)")
+    parser.add_argument("--queries", type=int, default=100, help="queries to embed one by one (default: %(default)s)")
+    parser.add_argument("--min-cosine", type=float, default=0.98,
+                        help="fail if a backend's minimum cosine to the reference is below this (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    documents = load_documents(args.docs)
+    queries = list(islice(iter(SAMPLE_QUERIES * (args.queries // len(SAMPLE_QUERIES) + 1)), args.queries))
+    backends = [REFERENCE_BACKEND] + [backend for backend in args.backends if backend != REFERENCE_BACKEND]
+
+    runs, results = {}, {}
+    for backend in backends:
+        runs[backend] = benchmark_backend(create_embedding_model(backend), documents, queries)
+        results[backend] = {key: value for key, value in runs[backend].items() if not key.endswith("_vectors")}
+        if backend != REFERENCE_BACKEND:
+            results[backend]["parity"] = parity(runs[REFERENCE_BACKEND], runs[backend])
+
+    if args.json:
+        print(json.dumps({"documents": len(documents), "queries": len(queries), "backends": results}, indent=2))
+    else:
+        print(f"{len(documents)} documents, {len(queries)} queries (reference: {REFERENCE_BACKEND})")
+        for backend, result in results.items():
+            line = (f"  {backend:10} {result['docs_per_sec']:8.1f} docs/s   "
+                    f"query p50 {result['query_p50_ms']:6.1f} ms   p95 {result['query_p95_ms']:6.1f} ms")
+            if "parity" in result:
+                line += "   " + "   ".join(f"{name} {value:.4f}" for name, value in result["parity"].items())
+            print(line)
+
+    failed = [backend for backend, result in results.items()
+              if "parity" in result and result["parity"]["min_cosine"] < args.min_cosine]
+    for backend in failed:
+        print(f"FAIL: {backend} min cosine {results[backend]['parity']['min_cosine']:.4f} < {args.min_cosine}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
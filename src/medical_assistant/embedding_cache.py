@@ -0,0 +1,107 @@
+import atexit
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from src.medical_assistant import telemetry
+from src.medical_assistant.config import QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_PATH
+from src.medical_assistant.indexing import normalize_text
+
+
+def _model_key(embedding_model) -> str:
+    return str(getattr(embedding_model, "model_name", type(embedding_model).__name__))
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query -> embedding vector.
+    Keys include the embedding model name so vectors from different models never mix.
+    When persist_path is set, the cache is loaded from and saved to a JSON file.
+    """
+
+    def __init__(self, max_size: int, persist_path: str = None):
+        self.max_size = max_size
+        self.persist_path = persist_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if persist_path:
+            self.load()
+
+    def embed_query(self, query: str, embedding_model) -> list:
+        """
+        Returns the embedding of the query, computing it with embedding_model only on a miss.
+        """
+        key = f"{_model_key(embedding_model)}::{normalize_text(query)}"
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                telemetry.record_cache_lookup("query_embedding", True)
+                return vector
+            self.misses += 1
+        telemetry.record_cache_lookup("query_embedding", False)
+
+        vector = list(embedding_model.embed_query(query))
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": size,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def load(self):
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            for key, vector in entries[-self.max_size:]:
+                self._entries[key] = vector
+
+    def save(self):
+        if not self.persist_path:
+            return
+        with self._lock:
+            entries = list(self._entries.items())
+        os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+        tmp_path = f"{self.persist_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.persist_path)
+
+
+_query_embedding_cache = None
+_query_embedding_cache_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """
+    Returns the process-wide query embedding cache. A persisted cache is saved on exit.
+    """
+    global _query_embedding_cache
+    with _query_embedding_cache_lock:
+        if _query_embedding_cache is None:
+            _query_embedding_cache = QueryEmbeddingCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_PATH)
+            if QUERY_EMBEDDING_CACHE_PATH:
+                atexit.register(_query_embedding_cache.save)
+        return _query_embedding_cache
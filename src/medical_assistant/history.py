@@ -0,0 +1,102 @@
+import re
+
+from src.medical_assistant.config import HISTORY_TOKEN_BUDGET, HISTORY_SUMMARY_TOKEN_BUDGET
+
+SUMMARY_PREFIX = "Summary of our earlier conversation:"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (about four characters per token for English text).
+    """
+    return max(1, len(text) // 4)
+
+
+def _field(answer: str, name: str) -> str:
+    match = re.search(rf"\*\*{name}\*\*:\s*(.+)", answer)
+    return match.group(1).strip() if match else ""
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def summarize_turns(turns: list) -> list:
+    """
+    Extractive summary of (query, answer) turns: one line per turn with the
+    question and the Condition/Triage lines of the templated answer.
+    No LLM call is needed, so compaction adds no latency.
+    """
+    lines = []
+    for query, answer in turns:
+        condition, triage = _field(answer, "Condition"), _field(answer, "Triage")
+        if condition or triage:
+            outcome = "; ".join(part for part in [f"Condition: {condition}" if condition else "",
+                                                  f"Triage: {triage}" if triage else ""] if part)
+        else:
+            outcome = answer
+        lines.append(f"- User asked: {_shorten(query, 150)} -> {_shorten(outcome, 200)}")
+    return lines
+
+
+class ChatHistory:
+    """
+    Conversation memory sent to the agent with every query.
+    Keeps the real user queries and the assistant answers (without the
+    disclaimer). Once the recent turns exceed token_budget, the oldest turns
+    are compacted into a rolling summary capped at summary_token_budget, so the
+    prompt cost stays roughly constant however long the conversation runs.
+    """
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET,
+                 summary_token_budget: int = HISTORY_SUMMARY_TOKEN_BUDGET,
+                 summarizer=summarize_turns):
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.summarizer = summarizer
+        self.turns = []
+        self.summary_lines = []
+
+    def add_turn(self, query: str, answer: str):
+        self.turns.append((query, answer))
+        self._compact()
+
+    def _turn_tokens(self) -> int:
+        return sum(estimate_tokens(query) + estimate_tokens(answer) for query, answer in self.turns)
+
+    def _compact(self):
+        evicted = []
+        while len(self.turns) > 1 and self._turn_tokens() > self.token_budget:
+            evicted.append(self.turns.pop(0))
+        if evicted:
+            self.summary_lines.extend(self.summarizer(evicted))
+        while self.summary_lines and estimate_tokens("\n".join(self.summary_lines)) > self.summary_token_budget:
+            self.summary_lines.pop(0)
+
+    @property
+    def summary(self) -> str:
+        return "\n".join(self.summary_lines)
+
+    def messages(self) -> list:
+        """Returns the messages to prepend to the next query."""
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        messages = []
+        if self.summary_lines:
+            messages.append(HumanMessage(content=f"{SUMMARY_PREFIX}\n{self.summary}"))
+            messages.append(AIMessage(content="Noted."))
+        for query, answer in self.turns:
+            messages.append(HumanMessage(content=query))
+            messages.append(AIMessage(content=answer))
+        return messages
+
+    def token_count(self) -> int:
+        return sum(estimate_tokens(message.content) for message in self.messages())
+
+    def clear(self):
+        self.turns.clear()
+        self.summary_lines.clear()
+
+    def __len__(self):
+        return len(self.turns)
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.medical_assistant.config import (
+    SERPER_URL, SERPER_CONNECT_TIMEOUT, SERPER_READ_TIMEOUT,
+    SERPER_MAX_RETRIES, SERPER_BACKOFF_FACTOR, HTTP_POOL_SIZE
+)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class LatencyStats:
+    """
+    Thread-safe record of request latencies over a sliding window of recent calls.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            self._samples.append(seconds)
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            requests_made, errors = self.requests, self.errors
+        if not samples:
+            return {"requests": requests_made, "errors": errors, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "requests": requests_made,
+            "errors": errors,
+            "mean": sum(samples) / len(samples),
+            "p50": samples[int(0.50 * (len(samples) - 1))],
+            "p95": samples[int(0.95 * (len(samples) - 1))],
+            "max": samples[-1],
+        }
+
+
+def _payload(query: str) -> str:
+    return json.dumps({"q": query})
+
+
+def _headers(api_key: str) -> dict:
+    return {'X-API-KEY': api_key, 'Content-Type': 'application/json'}
+
+
+class SerperClient:
+    """
+    Serper client on a pooled keep-alive requests.Session.
+    Requests use connect/read timeouts and are retried with exponential backoff
+    on connection errors and 429/5xx responses (honouring Retry-After).
+    """
+
+    def __init__(self, url: str = SERPER_URL, connect_timeout: float = SERPER_CONNECT_TIMEOUT,
+                 read_timeout: float = SERPER_READ_TIMEOUT, max_retries: int = SERPER_MAX_RETRIES,
+                 backoff_factor: float = SERPER_BACKOFF_FACTOR, pool_size: int = HTTP_POOL_SIZE):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.latency = LatencyStats()
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def search(self, query: str, api_key: str) -> str:
+        """
+        Returns the raw JSON text of the search results.
+        Raises requests.exceptions.RequestException once retries are exhausted.
+        """
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.post(
+                self.url, headers=_headers(api_key), data=_payload(query), timeout=self.timeout
+            )
+            response.raise_for_status()
+            ok = True
+            return response.text
+        finally:
+            self.latency.record(time.perf_counter() - started, ok)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncSerperClient:
+    """
+    asyncio counterpart of SerperClient for concurrent query paths, built on a
+    pooled httpx.AsyncClient with the same timeouts and retry policy.
+    """
+
+    def __init__(self, url: str = SERPER_URL, connect_timeout: float = SERPER_CONNECT_TIMEOUT,
+                 read_timeout: float = SERPER_READ_TIMEOUT, max_retries: int = SERPER_MAX_RETRIES,
+                 backoff_factor: float = SERPER_BACKOFF_FACTOR, pool_size: int = HTTP_POOL_SIZE):
+        self.url = url
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.latency = LatencyStats()
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_factor * (2 ** attempt)
+
+    async def search(self, query: str, api_key: str) -> str:
+        """
+        Returns the raw JSON text of the search results.
+        Raises httpx.HTTPError once retries are exhausted.
+        """
+        started = time.perf_counter()
+        ok = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                last_attempt = attempt == self.max_retries
+                try:
+                    response = await self.client.post(
+                        self.url, headers=_headers(api_key), content=_payload(query)
+                    )
+                except httpx.TransportError:
+                    if last_attempt:
+                        raise
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+                if response.status_code in RETRY_STATUSES and not last_attempt:
+                    await asyncio.sleep(self._backoff(attempt, response))
+                    continue
+                response.raise_for_status()
+                ok = True
+                return response.text
+        finally:
+            self.latency.record(time.perf_counter() - started, ok)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_serper_client = None
+_serper_client_lock = threading.Lock()
+
+
+def get_serper_client() -> SerperClient:
+    """
+    Returns the process-wide SerperClient so every search reuses its connection pool.
+    """
+    global _serper_client
+    with _serper_client_lock:
+        if _serper_client is None:
+            _serper_client = SerperClient()
+        return _serper_client
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import uuid
+from dataclasses import dataclass
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from src.medical_assistant import telemetry
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+
+class IngestionCancelled(Exception):
+    """
+    Raised from an ingestion progress callback to stop ingesting. Batches already
+    written stay in the store and the source is not committed to the manifest,
+    so the next run picks up where this one stopped.
+    """
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes text before hashing so that copies differing only in
+    whitespace map to the same content id.
+    """
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def content_id(text: str) -> str:
+    """
+    Returns the SHA-256 hex digest of the normalized text. It is used as the
+    Chroma document id, which makes the vector store its own content-hash index.
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def unique_by_content(texts: list) -> tuple[list, list]:
+    """
+    Collapses duplicates within a batch of texts.
+    Returns the unique texts (first occurrence wins) and their content ids.
+    """
+    unique_texts, ids, seen = [], [], set()
+    for text in texts:
+        text_id = content_id(text)
+        if text_id in seen:
+            continue
+        seen.add(text_id)
+        unique_texts.append(text)
+        ids.append(text_id)
+    return unique_texts, ids
+
+
+def existing_ids(vectorstore, ids: list) -> set:
+    """
+    Returns the subset of ids already stored in the vector store using a
+    single exact id lookup, without embedding anything.
+    """
+    if not ids:
+        return set()
+    found = vectorstore.get(ids=list(ids), include=[])
+    return set(found.get("ids", []))
+
+
+def filter_new_texts(vectorstore, texts: list) -> tuple[list, list]:
+    """
+    Returns the texts (and their content ids) that are not yet in the vector store.
+    Only these need to be embedded.
+    """
+    unique_texts, ids = unique_by_content(texts)
+    present = existing_ids(vectorstore, ids)
+    new_texts = [text for text, text_id in zip(unique_texts, ids) if text_id not in present]
+    new_ids = [text_id for text_id in ids if text_id not in present]
+    return new_texts, new_ids
+
+
+@dataclass
+class IngestionStats:
+    """Running totals reported after every committed batch."""
+    read: int = 0
+    added: int = 0
+    batches: int = 0
+    resumed_from: int = 0
+
+
+class IngestionCheckpoint:
+    """
+    Records how many records of a source have been committed to the vector
+    store so an interrupted run can resume after the last committed batch.
+    The checkpoint is tied to the source's size and mtime and is ignored
+    once the source changes.
+    """
+
+    def __init__(self, path: str, source_path: str):
+        self.path = path
+        stat = os.stat(source_path)
+        self.source_key = f"{os.path.abspath(source_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def load(self) -> int:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if data.get("source") != self.source_key:
+            return 0
+        return int(data.get("committed", 0))
+
+    def save(self, committed: int):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"source": self.source_key, "committed": committed}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """Yields lists of at most size items from the iterable without materializing it."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+_END = object()
+
+
+def read_ahead(iterable: Iterable, buffer_size: int) -> Iterator:
+    """
+    Yields the items of iterable while a background thread produces up to
+    buffer_size items ahead, so reading a source overlaps with embedding the
+    previous batch. Exceptions from the iterable are re-raised in the consumer,
+    and the producer stops when the consumer does.
+    """
+    buffer = queue.Queue(maxsize=max(1, buffer_size))
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put((_END, e))
+        else:
+            put((_END, None))
+
+    producer = threading.Thread(target=produce, name="read-ahead", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if isinstance(item, tuple) and len(item) == 2 and item[0] is _END:
+                if item[1] is not None:
+                    raise item[1]
+                return
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
+
+
+def ingest_documents(vectorstore, documents: Iterable["Document"], batch_size: int,
+                     checkpoint: IngestionCheckpoint = None, progress_callback=None) -> IngestionStats:
+    """
+    Streams documents into the vector store in batches of batch_size.
+    Each batch is deduplicated against the content-hash index, the new texts are
+    embedded through the store's embed_documents in one call, and the batch is
+    written before the next one is read, so memory stays flat for any corpus size.
+    """
+    stats = IngestionStats()
+    if checkpoint is not None:
+        stats.resumed_from = stats.read = checkpoint.load()
+        documents = islice(documents, stats.resumed_from, None)
+
+    for batch in batched(documents, batch_size):
+        with telemetry.span("ingest.batch", documents=len(batch)) as span:
+            metadata_by_id = {}
+            for doc in batch:
+                metadata_by_id.setdefault(content_id(doc.page_content), doc.metadata or None)
+            new_texts, new_ids = filter_new_texts(vectorstore, [doc.page_content for doc in batch])
+            if new_texts:
+                metadatas = [metadata_by_id[text_id] for text_id in new_ids]
+                vectorstore.add_texts(
+                    texts=new_texts,
+                    metadatas=metadatas if any(metadatas) else None,
+                    ids=new_ids,
+                )
+            span.set(added=len(new_texts))
+        stats.read += len(batch)
+        stats.added += len(new_texts)
+        stats.batches += 1
+        if checkpoint is not None:
+            checkpoint.save(stats.read)
+        if progress_callback is not None:
+            progress_callback(stats)
+
+    if checkpoint is not None:
+        checkpoint.clear()
+    return stats
+
+
+def read_kb_version(path: str) -> str:
+    """
+    Returns the current knowledge-base version marker, or "0" if none was written yet.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip() or "0"
+    except OSError:
+        return "0"
+
+
+def bump_kb_version(path: str) -> str:
+    """
+    Records that the knowledge base changed, so answers cached against the
+    previous version are no longer served.
+    """
+    version = uuid.uuid4().hex
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(version)
+    return version
@@ -0,0 +1,364 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+
+from src.medical_assistant import telemetry
+from src.medical_assistant.config import (
+    INGEST_JOBS_FILE, INGEST_MAX_CONCURRENT_JOBS, INGEST_MAX_WORKERS, INGEST_QUERY_PRIORITY_WAIT_S,
+    KB_VERSION_FILE, PERSIST_DIR
+)
+from src.medical_assistant.indexing import IngestionCancelled
+from src.medical_assistant.manifest import IngestionManifest, get_manifest
+from src.medical_assistant.partitioning import ingest_paths
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+class QueryPriorityGate:
+    """
+    Lets background ingestion give way to interactive queries: ingestion jobs
+    wait between batches while any query is being answered, so the embedding
+    model and the CPU are free for the query. A batch never waits longer than
+    max_wait seconds, so a steady stream of queries cannot starve ingestion.
+    """
+
+    def __init__(self, max_wait: float = INGEST_QUERY_PRIORITY_WAIT_S):
+        self.max_wait = max_wait
+        self._active = 0
+        self._idle = threading.Condition()
+
+    @contextmanager
+    def query(self):
+        with self._idle:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._active -= 1
+                if not self._active:
+                    self._idle.notify_all()
+
+    def wait_for_queries(self, cancelled: threading.Event = None) -> float:
+        """Blocks while queries are in flight; returns the seconds waited."""
+        if not self._active:
+            return 0.0
+        start = time.perf_counter()
+        deadline = start + self.max_wait
+        with self._idle:
+            while self._active and not (cancelled is not None and cancelled.is_set()):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._idle.wait(min(remaining, 0.1))
+        return time.perf_counter() - start
+
+
+_query_gate = QueryPriorityGate()
+
+
+def query_priority():
+    """Marks a query as in flight, pausing background ingestion between batches until it is answered."""
+    return _query_gate.query()
+
+
+@dataclass
+class IngestionJob:
+    """A file or folder queued for ingestion and its progress."""
+    id: int
+    path: str
+    status: str = QUEUED
+    files_done: int = 0
+    files_total: int = 0
+    partitioned: int = 0  # chunks produced by partitioning
+    embedded: int = 0  # chunks through the embedding stage
+    written: int = 0  # new sections written to the store
+    message: str = ""
+    created: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(os.path.normpath(self.path)) or self.path
+
+    def describe(self) -> str:
+        """One line for the job list, e.g. "notes.pdf: running, 1/2 files, 40/120 chunks embedded, 40 written"."""
+        parts = [f"{self.name}: {self.status}"]
+        if self.files_total:
+            parts.append(f"{self.files_done}/{self.files_total} files")
+        if self.partitioned:
+            parts.append(f"{self.embedded}/{self.partitioned} chunks embedded, {self.written} written")
+        if self.message and self.status in (DONE, FAILED):
+            parts.append(self.message)
+        return ", ".join(parts)
+
+
+class IngestionJobStore:
+    """
+    Persists ingestion jobs in SQLite so that queued and interrupted jobs
+    survive an application restart. Safe to share across threads.
+    """
+
+    _FIELDS = ("path", "status", "files_done", "files_total", "partitioned", "embedded", "written",
+               "message", "created")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL, status TEXT NOT NULL, "
+            "files_done INTEGER NOT NULL, files_total INTEGER NOT NULL, partitioned INTEGER NOT NULL, "
+            "embedded INTEGER NOT NULL, written INTEGER NOT NULL, message TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def add(self, path: str) -> IngestionJob:
+        job = IngestionJob(id=0, path=os.path.abspath(path), created=time.time())
+        with self._lock:
+            cursor = self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(self._FIELDS)}) VALUES ({', '.join('?' * len(self._FIELDS))})",
+                [getattr(job, field) for field in self._FIELDS],
+            )
+            self._conn.commit()
+        job.id = cursor.lastrowid
+        return job
+
+    def save(self, job: IngestionJob):
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{field} = ?' for field in self._FIELDS)} WHERE id = ?",
+                [getattr(job, field) for field in self._FIELDS] + [job.id],
+            )
+            self._conn.commit()
+
+    def jobs(self) -> list:
+        """Returns all jobs, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT id, {', '.join(self._FIELDS)} FROM jobs ORDER BY id").fetchall()
+        return [IngestionJob(*row) for row in rows]
+
+    def requeue_interrupted(self) -> int:
+        """Puts jobs that were running when the application stopped back in the queue."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, message = ? WHERE status = ?", (QUEUED, "interrupted, resuming", RUNNING)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def clear_finished(self) -> int:
+        """Forgets jobs that are done, failed or cancelled."""
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE status NOT IN ({', '.join('?' * len(ACTIVE_STATUSES))})", ACTIVE_STATUSES
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class IngestionJobQueue:
+    """
+    Runs ingestion jobs, one per selected file or folder, on a pool of
+    max_concurrent threads. Each job is an ingest_paths call with its own share
+    of the partitioning processes; the manifest makes a resumed or repeated job
+    skip whatever was already written. on_update(job) receives a copy of a job
+    whenever its status or progress changes and on_file_failed(job, path, error)
+    every file that could not be ingested; both are called from pool threads.
+    A job whose files overlap those of a running job (a folder and a file in
+    it) waits for that job to finish before it starts.
+    """
+
+    def __init__(self, vectorstore, store: IngestionJobStore, kb_version_path: str = None,
+                 manifest: IngestionManifest = None, max_concurrent: int = INGEST_MAX_CONCURRENT_JOBS,
+                 on_update=None, on_file_failed=None, gate: QueryPriorityGate = None):
+        self.vectorstore = vectorstore
+        self.store = store
+        self.kb_version_path = kb_version_path or os.path.join(PERSIST_DIR, KB_VERSION_FILE)
+        self.manifest = manifest or get_manifest(os.path.dirname(self.kb_version_path))
+        self.max_concurrent = max(1, max_concurrent)
+        self.partition_workers = max(1, INGEST_MAX_WORKERS // self.max_concurrent)
+        self.on_update = on_update
+        self.on_file_failed = on_file_failed
+        self.gate = gate or _query_gate
+        self._jobs = {}
+        self._cancelled = {}
+        self._closing = False
+        self._lock = threading.Lock()
+        self._status_changed = threading.Condition(self._lock)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="ingest-job")
+
+    def resume(self) -> list:
+        """Schedules the jobs left queued or interrupted by a previous run and returns all known jobs."""
+        self.store.requeue_interrupted()
+        jobs = self.store.jobs()
+        with self._lock:
+            self._jobs.update((job.id, job) for job in jobs)
+        snapshots = [replace(job) for job in jobs]
+        for job in jobs:
+            if job.status == QUEUED:
+                self._schedule(job)
+        return snapshots
+
+    def submit(self, paths) -> list:
+        """Queues a job for every path that is not already queued or running; returns the new jobs."""
+        if isinstance(paths, str):
+            paths = [paths]
+        new_jobs = []
+        for path in paths:
+            path = os.path.abspath(path)
+            with self._lock:
+                if any(job.path == path and job.status in ACTIVE_STATUSES for job in self._jobs.values()):
+                    continue
+            job = self.store.add(path)
+            with self._lock:
+                self._jobs[job.id] = job
+            new_jobs.append(replace(job))
+            self._schedule(job)
+        return new_jobs
+
+    def jobs(self) -> list:
+        with self._lock:
+            return [replace(job) for job in sorted(self._jobs.values(), key=lambda job: job.id)]
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancels a queued or running job. A running job stops after its current batch."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ACTIVE_STATUSES:
+                return False
+            self._cancelled.setdefault(job_id, threading.Event()).set()
+            if job.status != QUEUED:
+                return True
+            # Still queued under the lock, so _claim cannot start it any more.
+            job.status, job.message = CANCELLED, "cancelled"
+            snapshot = replace(job)
+            self._status_changed.notify_all()
+        self._save(snapshot)
+        return True
+
+    def clear_finished(self):
+        self.store.clear_finished()
+        with self._lock:
+            self._jobs = {job_id: job for job_id, job in self._jobs.items() if job.status in ACTIVE_STATUSES}
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stops running jobs after their current batch without marking them
+        cancelled, so they are resumed the next time the queue starts.
+        """
+        with self._lock:
+            self._closing = True
+            for job in self._jobs.values():
+                if job.status in ACTIVE_STATUSES:
+                    self._cancelled.setdefault(job.id, threading.Event()).set()
+            self._status_changed.notify_all()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _schedule(self, job: IngestionJob):
+        with self._lock:
+            self._cancelled.setdefault(job.id, threading.Event())
+        self._executor.submit(self._run, job)
+
+    def _update(self, job: IngestionJob, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            snapshot = replace(job)
+            if "status" in fields:
+                self._status_changed.notify_all()
+        self._save(snapshot)
+
+    def _save(self, snapshot: IngestionJob):
+        self.store.save(snapshot)
+        if self.on_update:
+            self.on_update(snapshot)
+
+    def _claim(self, job: IngestionJob, cancelled: threading.Event) -> bool:
+        """
+        Marks a queued job running, once no running job covers any of its files.
+        Returns False, leaving the job alone, if it was cancelled first.
+        """
+        with self._lock:
+            while job.status == QUEUED and not cancelled.is_set() and self._overlaps_running(job):
+                self._status_changed.wait()
+            if job.status != QUEUED or cancelled.is_set():
+                return False
+            job.status, job.message = RUNNING, ""
+            snapshot = replace(job)
+        self._save(snapshot)
+        return True
+
+    def _overlaps_running(self, job: IngestionJob) -> bool:
+        # Two jobs over the same file would clear and commit each other's staged manifest rows.
+        return any(other.status == RUNNING and _paths_overlap(other.path, job.path)
+                   for other in self._jobs.values() if other is not job)
+
+    def _run(self, job: IngestionJob):
+        cancelled = self._cancelled[job.id]
+        if not self._claim(job, cancelled):
+            return
+        chunks = {}  # path -> (chunks done, total chunks, added)
+
+        def check_cancelled():
+            if cancelled.is_set():
+                raise IngestionCancelled()
+
+        def on_file(path, done, total):
+            self._update(job, files_done=done, files_total=total)
+            check_cancelled()
+
+        def on_chunks(path, done, total, added):
+            chunks[path] = (done, total, added)
+            self._update(job, partitioned=sum(c[1] for c in chunks.values()),
+                         embedded=sum(c[0] for c in chunks.values()), written=sum(c[2] for c in chunks.values()))
+            check_cancelled()
+            waited = self.gate.wait_for_queries(cancelled)
+            if waited:
+                telemetry.increment("ingest_query_priority_wait_seconds", waited)
+            check_cancelled()
+
+        def on_failed(path, error):
+            if self.on_file_failed:
+                self.on_file_failed(replace(job), path, error)
+
+        try:
+            with telemetry.span("ingest.job", path=job.path) as span:
+                success, message = ingest_paths(
+                    self.vectorstore, [job.path], self.kb_version_path, max_workers=self.partition_workers,
+                    progress_callback=on_file, failure_callback=on_failed, chunk_callback=on_chunks,
+                    manifest=self.manifest,
+                )
+                if not success:
+                    span.fail(message)
+            self._update(job, status=DONE if success else FAILED, message=message)
+        except IngestionCancelled:
+            if self._closing:
+                self._update(job, status=QUEUED, message="interrupted, resuming")
+            else:
+                self._update(job, status=CANCELLED, message="cancelled")
+        except Exception as e:
+            print(f"Ingestion job for '{job.path}' failed: {e}")
+            self._update(job, status=FAILED, message=f"An error occurred during ingestion: {e}")
+
+
+def _paths_overlap(first: str, second: str) -> bool:
+    """True if the files or folders first and second are the same or one contains the other."""
+    first, second = os.path.realpath(first), os.path.realpath(second)
+    return os.path.commonpath([first, second]) in (first, second)
+
+
+def get_job_store(persist_dir: str = PERSIST_DIR) -> IngestionJobStore:
+    """Opens the job store kept next to the vector store in persist_dir."""
+    return IngestionJobStore(os.path.join(persist_dir, INGEST_JOBS_FILE))
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator
+
+from src.medical_assistant import telemetry
+from src.medical_assistant.config import INGEST_MANIFEST_FILE, PERSIST_DIR
+from src.medical_assistant.indexing import batched, content_id
+
+# SQLite's default limit on host parameters is 999 on older builds.
+_PARAMETERS_PER_QUERY = 900
+
+
+def _in_chunks(values: list, size: int = _PARAMETERS_PER_QUERY) -> Iterator[list]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+    """
+    Records, for every ingested source file, its size, mtime and SHA-256, and
+    for every item in it (a spreadsheet row or a document chunk) the content id
+    of its vector. Vector ids are content ids shared by identical text across
+    sources, so a vector is only deleted once no item of any source refers to it.
+
+    Items of a source being (re)ingested are staged and swapped in by
+    commit_source once the whole source has been written, so an interrupted
+    run never loses track of vectors that the previous version referenced.
+    Safe to share across threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "source TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "sha256 TEXT NOT NULL, items INTEGER NOT NULL, ingested REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "source TEXT NOT NULL, item TEXT NOT NULL, content_id TEXT NOT NULL, PRIMARY KEY (source, item));"
+            "CREATE INDEX IF NOT EXISTS entries_content_id ON entries (content_id);"
+            "CREATE TABLE IF NOT EXISTS staged ("
+            "source TEXT NOT NULL, item TEXT NOT NULL, content_id TEXT NOT NULL, PRIMARY KEY (source, item));"
+        )
+        self._conn.commit()
+
+    def is_unchanged(self, source: str) -> bool:
+        """
+        True if source was fully ingested and has not changed since. The size and
+        mtime are compared first; the file is only hashed when they differ, and a
+        file that was merely touched has its new mtime recorded.
+        """
+        source = os.path.abspath(source)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, sha256 FROM files WHERE source = ?", (source,)
+            ).fetchone()
+        if row is None or not os.path.isfile(source):
+            return False
+        stat = os.stat(source)
+        if stat.st_size != row[0]:
+            return False
+        if stat.st_mtime_ns == row[1]:
+            return True
+        if file_sha256(source) != row[2]:
+            return False
+        with self._lock:
+            self._conn.execute("UPDATE files SET mtime_ns = ? WHERE source = ?", (stat.st_mtime_ns, source))
+            self._conn.commit()
+        return True
+
+    def known_ids(self, ids: Iterable[str]) -> set:
+        """Returns the ids that committed items refer to, i.e. vectors known to be in the store."""
+        ids, known = list(set(ids)), set()
+        with self._lock:
+            for chunk in _in_chunks(ids):
+                known.update(row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT content_id FROM entries WHERE content_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ))
+        return known
+
+    def clear_staged(self, source: str):
+        """Drops items staged by an earlier, unfinished ingestion of source."""
+        with self._lock:
+            self._conn.execute("DELETE FROM staged WHERE source = ?", (os.path.abspath(source),))
+            self._conn.commit()
+
+    def stage(self, source: str, items: list):
+        """Stages (item, content_id) pairs of the version of source being ingested."""
+        source = os.path.abspath(source)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO staged (source, item, content_id) VALUES (?, ?, ?)",
+                [(source, item, text_id) for item, text_id in items],
+            )
+            self._conn.commit()
+
+    def _orphans(self, source: str, candidates: set) -> list:
+        """
+        Returns the candidate ids that no item of another source refers to,
+        including items staged by an ingestion still in progress.
+        """
+        candidates = list(candidates)
+        used = set()
+        for chunk in _in_chunks(candidates, _PARAMETERS_PER_QUERY // 2):
+            placeholders = ",".join("?" * len(chunk))
+            used.update(row[0] for row in self._conn.execute(
+                f"SELECT content_id FROM entries WHERE source != ? AND content_id IN ({placeholders}) "
+                f"UNION SELECT content_id FROM staged WHERE source != ? AND content_id IN ({placeholders})",
+                [source, *chunk, source, *chunk],
+            ))
+        return [text_id for text_id in candidates if text_id not in used]
+
+    @staticmethod
+    def _delete_vectors(vectorstore, ids: list):
+        for chunk in _in_chunks(ids):
+            vectorstore.delete(ids=chunk)
+
+    def commit_source(self, vectorstore, source: str) -> int:
+        """
+        Replaces source's items with the staged ones and records its current
+        size, mtime and hash. Vectors that only the replaced items referred to
+        are deleted from vectorstore first, so a crash in between at worst
+        leaves the source to be re-ingested. Returns the number of vectors deleted.
+        """
+        source = os.path.abspath(source)
+        stat = os.stat(source)
+        sha256 = file_sha256(source)
+        with self._lock:
+            old = {row[0] for row in self._conn.execute("SELECT content_id FROM entries WHERE source = ?", (source,))}
+            new = {row[0] for row in self._conn.execute("SELECT content_id FROM staged WHERE source = ?", (source,))}
+            orphans = self._orphans(source, old - new)
+            self._delete_vectors(vectorstore, orphans)
+            items = self._conn.execute("SELECT COUNT(*) FROM staged WHERE source = ?", (source,)).fetchone()[0]
+            with self._conn:
+                self._conn.execute("DELETE FROM entries WHERE source = ?", (source,))
+                self._conn.execute(
+                    "INSERT INTO entries (source, item, content_id) "
+                    "SELECT source, item, content_id FROM staged WHERE source = ?", (source,)
+                )
+                self._conn.execute("DELETE FROM staged WHERE source = ?", (source,))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files (source, size, mtime_ns, sha256, items, ingested) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (source, stat.st_size, stat.st_mtime_ns, sha256, items, time.time()),
+                )
+        telemetry.increment("manifest_vectors_deleted", len(orphans))
+        return len(orphans)
+
+    def remove_source(self, vectorstore, source: str) -> int:
+        """Forgets a source that no longer exists and deletes the vectors only it referred to."""
+        source = os.path.abspath(source)
+        with self._lock:
+            old = {row[0] for row in self._conn.execute("SELECT content_id FROM entries WHERE source = ?", (source,))}
+            orphans = self._orphans(source, old)
+            self._delete_vectors(vectorstore, orphans)
+            with self._conn:
+                for table in ("entries", "staged", "files"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+        telemetry.increment("manifest_vectors_deleted", len(orphans))
+        return len(orphans)
+
+    def sources(self, folder: str = None) -> list:
+        """Returns the ingested sources, optionally only those under folder."""
+        with self._lock:
+            sources = [row[0] for row in self._conn.execute("SELECT source FROM files ORDER BY source")]
+        if folder is None:
+            return sources
+        prefix = os.path.join(os.path.abspath(folder), "")
+        return [source for source in sources if source.startswith(prefix)]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def get_manifest(persist_dir: str = PERSIST_DIR) -> IngestionManifest:
+    """Returns the process-wide manifest of the vector store in persist_dir, opening it on first use."""
+    with _manifests_lock:
+        if persist_dir not in _manifests:
+            _manifests[persist_dir] = IngestionManifest(os.path.join(persist_dir, INGEST_MANIFEST_FILE))
+        return _manifests[persist_dir]
+
+
+def track_items(manifest: IngestionManifest, source: str, items: Iterable, batch_size: int,
+                counts: dict = None) -> Iterator:
+    """
+    Stages every (item, document) of source in the manifest as it passes and
+    yields only the documents whose vectors are not already known to the
+    manifest, so unchanged rows are neither embedded nor looked up in the store.
+    The number of items seen is kept in counts["items"] when given.
+    """
+    for batch in batched(items, batch_size):
+        staged = [(item, content_id(doc.page_content)) for item, doc in batch]
+        manifest.stage(source, staged)
+        known = manifest.known_ids(text_id for _, text_id in staged)
+        if counts is not None:
+            counts["items"] = counts.get("items", 0) + len(batch)
+        for (_, doc), (_, text_id) in zip(batch, staged):
+            if text_id not in known:
+                yield doc
+
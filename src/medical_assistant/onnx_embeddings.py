@@ -0,0 +1,171 @@
+import json
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CONFIG_FILE = "embedding_config.json"
+FP32_MODEL_FILE = "model.onnx"
+INT8_MODEL_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+def _sentence_transformers_config(model_path: str) -> dict:
+    """
+    Reads the pooling mode, normalization and maximum sequence length that
+    sentence-transformers applies on top of the transformer, so the ONNX
+    backend produces the same vectors as HuggingFaceEmbeddings.
+    """
+    config = {"pooling": "mean", "normalize": False, "max_length": 512}
+    try:
+        with open(os.path.join(model_path, "modules.json"), "r", encoding="utf-8") as f:
+            modules = json.load(f)
+    except (OSError, ValueError):
+        return config
+
+    for module in modules:
+        module_type = module.get("type", "")
+        if module_type.endswith("Normalize"):
+            config["normalize"] = True
+        elif module_type.endswith("Pooling"):
+            with open(os.path.join(model_path, module["path"], "config.json"), "r", encoding="utf-8") as f:
+                pooling = json.load(f)
+            config["pooling"] = "cls" if pooling.get("pooling_mode_cls_token") else "mean"
+    try:
+        with open(os.path.join(model_path, "sentence_bert_config.json"), "r", encoding="utf-8") as f:
+            config["max_length"] = json.load(f).get("max_seq_length", config["max_length"])
+    except (OSError, ValueError):
+        pass
+    return config
+
+
+def export_onnx_model(model_name: str, output_dir: str, quantize: bool = True) -> dict:
+    """
+    Exports the transformer of a sentence-transformers model to ONNX, writes its
+    tokenizer and pooling settings next to it and, when quantize is set, a
+    dynamically int8-quantized copy of the weights.
+    Needs torch, transformers and onnx; the exported model only needs onnxruntime.
+    Returns the embedding config that was written.
+    """
+    import torch
+    from huggingface_hub import snapshot_download
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    model_path = model_name if os.path.isdir(model_name) else snapshot_download(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModel.from_pretrained(model_path).eval()
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, TOKENIZER_FILE))
+
+    sample = tokenizer(["first aid for a minor burn"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, transformer):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(model), tuple(sample[name] for name in input_names),
+            os.path.join(output_dir, FP32_MODEL_FILE), input_names=input_names,
+            output_names=["last_hidden_state"], dynamic_axes=dynamic_axes, opset_version=14,
+        )
+    if quantize:
+        quantize_dynamic(os.path.join(output_dir, FP32_MODEL_FILE), os.path.join(output_dir, INT8_MODEL_FILE),
+                         weight_type=QuantType.QInt8)
+
+    config = dict(_sentence_transformers_config(model_path), model_name=model_name,
+                  pad_token=tokenizer.pad_token, pad_id=tokenizer.pad_token_id)
+    with open(os.path.join(output_dir, EMBEDDING_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return config
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeddings computed with ONNX Runtime on CPU from a model exported by
+    export_onnx_model. Texts are embedded in length-sorted batches to keep
+    padding small, then pooled and normalized like the sentence-transformers model.
+    """
+
+    def __init__(self, session, tokenizer, model_name: str, pooling: str = "mean",
+                 normalize: bool = False, batch_size: int = 32):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.model_name = model_name
+        self.pooling = pooling
+        self.normalize = normalize
+        self.batch_size = batch_size
+        self._input_names = {model_input.name for model_input in session.get_inputs()}
+
+    @classmethod
+    def from_directory(cls, model_dir: str, quantized: bool = True, batch_size: int = 32) -> "OnnxEmbeddings":
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, EMBEDDING_CONFIG_FILE), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        tokenizer.enable_truncation(max_length=config["max_length"])
+        tokenizer.enable_padding(pad_id=config.get("pad_id", 0), pad_token=config.get("pad_token", "[PAD]"))
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        model_file = INT8_MODEL_FILE if quantized else FP32_MODEL_FILE
+        session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, model_file), options, providers=["CPUExecutionProvider"]
+        )
+        suffix = "onnx-int8" if quantized else "onnx"
+        return cls(session, tokenizer, f"{config['model_name']}@{suffix}",
+                   pooling=config["pooling"], normalize=config["normalize"], batch_size=batch_size)
+
+    def _embed_batch(self, texts: list) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: value for name, value in inputs.items() if name in self._input_names})[0]
+
+        if self.pooling == "cls":
+            vectors = hidden[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(hidden.dtype)
+            vectors = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    def embed_documents(self, texts: list) -> list:
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text: str) -> list:
+        return self._embed_batch([text])[0].tolist()
+
+
+def load_onnx_embeddings(model_name: str, model_dir: str, quantized: bool = True,
+                         batch_size: int = 32) -> OnnxEmbeddings:
+    """
+    Opens the exported ONNX model in model_dir, exporting it first if it is missing.
+    """
+    model_file = INT8_MODEL_FILE if quantized else FP32_MODEL_FILE
+    if not os.path.isfile(os.path.join(model_dir, model_file)):
+        print(f"Exporting '{model_name}' to ONNX in '{model_dir}' (one-time)...")
+        export_onnx_model(model_name, model_dir, quantize=quantized)
+    return OnnxEmbeddings.from_directory(model_dir, quantized=quantized, batch_size=batch_size)
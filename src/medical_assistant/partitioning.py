@@ -0,0 +1,188 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.medical_assistant import telemetry
+from src.medical_assistant.chunking import chunk_elements
+from src.medical_assistant.config import INGEST_BATCH_SIZE, INGEST_FILE_EXTENSIONS, INGEST_MAX_WORKERS
+from src.medical_assistant.indexing import IngestionCancelled, bump_kb_version, ingest_documents
+from src.medical_assistant.manifest import IngestionManifest, track_items
+
+
+def collect_document_paths(paths: list) -> list:
+    """
+    Expands the selected files and folders into a sorted list of supported documents.
+    Folders are searched recursively; files picked explicitly are always kept.
+    """
+    document_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in files:
+                    if os.path.splitext(name)[1].lower() in INGEST_FILE_EXTENSIONS:
+                        document_paths.append(os.path.join(root, name))
+        else:
+            document_paths.append(path)
+    return sorted(dict.fromkeys(document_paths))
+
+
+def partition_file(path: str) -> list:
+    """
+    Partitions a single document and returns its text as chunks sized for the
+    embedding model (see chunking.chunk_elements), with the pages they came from.
+    Runs inside a worker process, so unstructured is imported here rather than
+    at module level, and chunking is parallelized along with partitioning.
+    """
+    from unstructured.partition.auto import partition
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File not found: {path}")
+    elements = partition(path)
+    return chunk_elements([
+        (el.text, getattr(el.metadata, "page_number", None))
+        for el in elements if hasattr(el, 'text') and el.text.strip()
+    ])
+
+
+def partition_files(paths: list, max_workers: int):
+    """
+    Yields (path, chunks, error) for every path as soon as it has been partitioned.
+    Several files are partitioned in parallel in a process pool, since
+    partitioning is CPU-bound and would otherwise hold the GIL; a single file is
+    partitioned in-process to avoid the pool start-up cost. Closing the
+    generator early cancels the files not yet started.
+    """
+    if max_workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            try:
+                yield path, partition_file(path), None
+            except Exception as e:
+                yield path, [], str(e)
+        return
+
+    # "spawn" avoids forking a process that is running Qt threads.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(paths)), mp_context=context) as pool:
+        futures = {pool.submit(partition_file, path): path for path in paths}
+        try:
+            for future in as_completed(futures):
+                path = futures.pop(future)
+                try:
+                    yield path, future.result(), None
+                except Exception as e:
+                    yield path, [], str(e)
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+
+def ingest_paths(vectorstore, document_paths: list, kb_version_path: str,
+                 max_workers: int = INGEST_MAX_WORKERS, batch_size: int = INGEST_BATCH_SIZE,
+                 progress_callback=None, failure_callback=None,
+                 manifest: IngestionManifest = None, chunk_callback=None) -> tuple[bool, str]:
+    """
+    Partitions and chunks the given files and folders and writes the chunks to
+    the vector store, tagging each with its source path, page and position. The
+    caller's thread is the single embedding/writer stage. The knowledge-base
+    version is bumped when anything was added or removed.
+    With a manifest, files unchanged since they were last ingested are skipped
+    without being partitioned, only new or edited chunks are embedded, the
+    vectors of chunks that disappeared from an edited file are deleted, and so
+    are those of previously ingested files missing from a selected folder.
+    progress_callback(path, files_done, total_files) is called after every file,
+    failure_callback(path, error) for every file that could not be ingested and
+    chunk_callback(path, chunks_done, total_chunks, added) once a file has been
+    partitioned and after every batch written. A callback may raise
+    IngestionCancelled to stop, which is propagated to the caller.
+    Returns (success, message); success is False only if every file failed.
+    """
+    from langchain_core.documents import Document
+
+    removed = 0
+    if manifest is not None:
+        for folder in filter(os.path.isdir, document_paths):
+            for source in manifest.sources(folder):
+                if not os.path.exists(source):
+                    print(f"'{source}' no longer exists; removing it from the knowledge base.")
+                    removed += manifest.remove_source(vectorstore, source)
+
+    paths = collect_document_paths(document_paths)
+    if not paths and not removed:
+        return False, "No supported documents found."
+
+    unchanged = {path for path in paths if manifest is not None and manifest.is_unchanged(path)}
+    for done, path in enumerate(sorted(unchanged), start=1):
+        print(f"'{path}' has not changed since it was last ingested; skipping it.")
+        if progress_callback:
+            progress_callback(path, done, len(paths))
+    changed = [path for path in paths if path not in unchanged]
+
+    if changed:
+        print(f"Starting document partitioning for {len(changed)} file(s)...")
+    added, failed, error = 0, [], None
+    try:
+        for done, (path, chunks, error) in enumerate(partition_files(changed, max_workers), start=len(unchanged) + 1):
+            if error is None:
+                with telemetry.span("ingest.file", path=path, chunks=len(chunks)) as span:
+                    try:
+                        print(f"Partitioned '{path}' into {len(chunks)} chunks.")
+                        counts = {}
+                        on_batch = None
+                        if chunk_callback:
+                            chunk_callback(path, 0, len(chunks), 0)
+                            on_batch = lambda stats: chunk_callback(
+                                path, counts.get("items", stats.read), len(chunks), stats.added)
+                        documents = (Document(page_content=chunk.text, metadata=chunk.metadata(path, index))
+                                     for index, chunk in enumerate(chunks))
+                        if manifest is not None:
+                            manifest.clear_staged(path)
+                            items = ((f"chunk {document.metadata['chunk']}", document) for document in documents)
+                            documents = track_items(manifest, path, items, batch_size, counts)
+                        stats = ingest_documents(vectorstore, documents, batch_size=batch_size,
+                                                 progress_callback=on_batch)
+                        added += stats.added
+                        if manifest is not None:
+                            removed += manifest.commit_source(vectorstore, path)
+                        if chunk_callback:
+                            chunk_callback(path, len(chunks), len(chunks), stats.added)
+                        span.set(added=stats.added)
+                    except IngestionCancelled:
+                        span.fail("cancelled")
+                        raise
+                    except Exception as e:
+                        error = str(e)
+                        span.fail(error)
+            if error is not None:
+                print(f"Failed to ingest '{path}': {error}")
+                telemetry.increment("ingest_file_failures")
+                failed.append(path)
+                if failure_callback:
+                    failure_callback(path, error)
+            if progress_callback:
+                progress_callback(path, done, len(paths))
+    except IngestionCancelled:
+        # Batches written before the cancellation may already have changed the store.
+        bump_kb_version(kb_version_path)
+        raise
+
+    if paths and len(failed) == len(paths):
+        message = (f"An error occurred during ingestion: {error}" if len(paths) == 1
+                   else f"All {len(paths)} files failed to ingest.")
+        print(message)
+        return False, message
+
+    if added or removed:
+        bump_kb_version(kb_version_path)
+    if added:
+        message = f"Added {added} new sections to the knowledge base."
+    elif not removed:
+        message = "Content already exists in the knowledge base."
+    else:
+        message = ""
+    if removed:
+        message = f"{message} Removed {removed} outdated sections.".strip()
+    if unchanged:
+        message += f" {len(unchanged)} unchanged file(s) skipped."
+    if failed:
+        message += f" {len(failed)} of {len(paths)} files failed."
+    print(message)
+    return True, message
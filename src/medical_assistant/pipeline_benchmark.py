@@ -0,0 +1,386 @@
+"""
+Benchmarks ingestion, retrieval and full queries with deterministic local
+stand-ins for Gemini and Serper (configurable latency) and, by default, a
+hashing embedder so runs need no model download and are comparable across commits.
+
+    python -m src.medical_assistant.pipeline_benchmark --output before.json
+    python -m src.medical_assistant.pipeline_benchmark --compare before.json
+
+Stages:
+    ingest_main              a synthetic spreadsheet ingested into a fresh store (rows/s)
+    ingestion_jobs           a folder of text files as a job of the GUI's IngestionJobQueue (files/s)
+    retrieval[n=N,k=K]       augment_prompt_with_rag on a corpus of N sentences (queries/s)
+    query                    the GUI's QueryScheduler end to end, streamed, answer cache bypassed (queries/s)
+
+Every stage reports p50/p95 latency of one operation and the throughput.
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.medical_assistant import agent, registry
+from src.medical_assistant.answer_cache import get_answer_cache
+from src.medical_assistant.config import (
+    INGEST_BATCH_SIZE, SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_TTL, system_prompt
+)
+from src.medical_assistant.data_ingestion import ingest_main
+from src.medical_assistant.embedding_cache import QueryEmbeddingCache, get_query_embedding_cache
+from src.medical_assistant.history import ChatHistory
+from src.medical_assistant.http_client import LatencyStats
+from src.medical_assistant.indexing import ingest_documents
+from src.medical_assistant.search_cache import SearchCache
+
+STAGES = ("ingest_main", "ingestion_jobs", "retrieval", "query")
+CONDITIONS = (
+    "burn", "cut", "sprained ankle", "nosebleed", "bee sting", "broken arm", "choking", "fever",
+    "heat stroke", "hypothermia", "allergic reaction", "blister", "dog bite", "concussion", "dehydration",
+)
+ACTIONS = (
+    "cool the area under running water", "apply firm pressure with a clean cloth",
+    "keep the person still and calm", "raise the injured limb", "call emergency services",
+    "remove tight clothing and jewellery", "give small sips of water", "cover it with a sterile dressing",
+    "monitor their breathing", "seek medical attention promptly",
+)
+DURATIONS = ("for ten minutes", "until help arrives", "for at least twenty minutes", "every few minutes")
+STUB_ANSWER = (
+    "**Triage**: This can likely be managed at home with caution.\n\n"
+    "**Condition**: Benchmark stand-in answer.\n\n"
+    "**First-Aid Steps**:\n- Step 1: Follow the retrieved guidance.\n\n"
+    "**Key Medicine(s)**: No specific over-the-counter medications are recommended in the sources.\n\n"
+    "**Source Citations**:\nBenchmark Source\nURL: https://example.org/first-aid"
+)
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic stand-in for the embedding model: hashed word unigrams and
+    bigrams, L2-normalized. Similar texts get similar vectors, so retrieval
+    behaves realistically without loading a model.
+    """
+
+    def __init__(self, dimensions: int = 384, latency_seconds: float = 0.0):
+        self.dimensions = dimensions
+        self.latency_seconds = latency_seconds
+        self.model_name = f"hash-embeddings-{dimensions}"
+
+    def _vector(self, text: str) -> list:
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = int(hashlib.md5(feature.encode("utf-8")).hexdigest()[:8], 16)
+            vector[digest % self.dimensions] += 1.0 if digest & (1 << 31) else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list) -> list:
+        time.sleep(self.latency_seconds)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        time.sleep(self.latency_seconds)
+        return self._vector(text)
+
+
+class StubChatModel(BaseChatModel):
+    """Stand-in for Gemini that waits latency_seconds and answers with a fixed templated response."""
+    latency_seconds: float = 0.0
+    answer: str = STUB_ANSWER
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-stub"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_seconds)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_seconds)
+        for token in re.findall(r"\S+\s*", self.answer):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class StubSerperClient:
+    """Stand-in for AsyncSerperClient that waits latency_seconds and returns three fixed results."""
+
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+        self.latency = LatencyStats()
+
+    async def search(self, query: str, api_key: str) -> str:
+        await asyncio.sleep(self.latency_seconds)
+        return json.dumps({"organic": [
+            {"title": f"First aid guide {i}", "link": f"https://example.org/guide-{i}",
+             "snippet": f"Guide {i}: {ACTIONS[i]} {DURATIONS[i % len(DURATIONS)]} after a {query[:40]}."}
+            for i in range(3)
+        ]})
+
+    async def aclose(self):
+        pass
+
+
+def synthetic_sentences(count: int) -> list:
+    """Returns `count` distinct first-aid sentences, the same for every run."""
+    return [
+        f"For a {CONDITIONS[i % len(CONDITIONS)]}, {ACTIONS[(i // len(CONDITIONS)) % len(ACTIONS)]} "
+        f"{DURATIONS[i % len(DURATIONS)]} (case {i})."
+        for i in range(count)
+    ]
+
+
+def synthetic_queries(count: int) -> list:
+    """Returns `count` questions that differ enough for the semantic answer cache to miss."""
+    return [
+        f"What should I do about a {CONDITIONS[i % len(CONDITIONS)]} if I also need to "
+        f"{ACTIONS[(i * 7) % len(ACTIONS)]}? Question {i}"
+        for i in range(count)
+    ]
+
+
+def summarize(latencies: list, operations: int, elapsed: float, unit: str) -> dict:
+    """Returns p50/p95 latency (ms) and throughput (operations per second) for one stage."""
+    stats = LatencyStats(window=max(1, len(latencies)))
+    for seconds in latencies:
+        stats.record(seconds, ok=True)
+    snapshot = stats.snapshot()
+    return {
+        "p50_ms": snapshot["p50"] * 1000,
+        "p95_ms": snapshot["p95"] * 1000,
+        "throughput": operations / elapsed if elapsed else 0.0,
+        "unit": unit,
+        "samples": len(latencies),
+    }
+
+
+def build_store(workdir: str, name: str, sentences: list):
+    """Opens a fresh vector store under workdir and fills it with sentences."""
+    from langchain_core.documents import Document
+
+    vectorstore = registry.get_vectorstore(os.path.join(workdir, name))
+    ingest_documents(vectorstore, (Document(page_content=s) for s in sentences), batch_size=INGEST_BATCH_SIZE)
+    return vectorstore
+
+
+def bench_ingest_main(workdir: str, rows: int, repeats: int) -> dict:
+    data_path = os.path.join(workdir, "ingest_main.xlsx")
+    pd.DataFrame({"Sentence": synthetic_sentences(rows)}).to_excel(data_path, index=False)
+    latencies = []
+    for run in range(repeats):
+        persist_dir = os.path.join(workdir, f"ingest_main_{run}")
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ingest_main(data_path, persist_dir)
+        latencies.append(time.perf_counter() - started)
+        registry.discard_vectorstore(persist_dir)
+    return summarize(latencies, rows * repeats, sum(latencies), "rows/s")
+
+
+def bench_ingestion_jobs(workdir: str, files: int, sections_per_file: int, repeats: int) -> dict:
+    from src.medical_assistant.ingestion_jobs import ACTIVE_STATUSES, DONE, IngestionJobQueue, IngestionJobStore
+
+    folder = os.path.join(workdir, "documents")
+    os.makedirs(folder, exist_ok=True)
+    sentences = synthetic_sentences(files * sections_per_file)
+    for i in range(files):
+        with open(os.path.join(folder, f"guide_{i}.txt"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(sentences[i * sections_per_file:(i + 1) * sections_per_file]))
+
+    latencies = []
+    for run in range(repeats):
+        persist_dir = os.path.join(workdir, f"jobs_{run}")
+        finished = queue.Queue()
+        job_queue = IngestionJobQueue(
+            registry.get_vectorstore(persist_dir), IngestionJobStore(":memory:"),
+            kb_version_path=os.path.join(persist_dir, "kb_version"), max_concurrent=1,
+            on_update=lambda job: job.status in ACTIVE_STATUSES or finished.put(job),
+        )
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            job_queue.submit(folder)
+            job = finished.get()
+        latencies.append(time.perf_counter() - started)
+        job_queue.shutdown()
+        registry.discard_vectorstore(persist_dir)
+        if job.status != DONE:
+            raise RuntimeError(f"Ingestion job failed: {job.status}, {job.message}")
+    return summarize(latencies, files * repeats, sum(latencies), "files/s")
+
+
+def bench_retrieval(vectorstore, queries: list, k: int) -> dict:
+    # A zero-size cache embeds every query, as on a first-time question.
+    embedding_cache = QueryEmbeddingCache(max_size=0)
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        agent.augment_prompt_with_rag(query, vectorstore, embedding_cache, k=k)
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies, len(queries), sum(latencies), "queries/s")
+
+
+def bench_query(vectorstore, queries: list, llm_latency: float, search_latency: float) -> dict:
+    from langgraph.prebuilt import create_react_agent
+    from src.medical_assistant.query_scheduler import DONE, QueryScheduler
+    from src.medical_assistant.service import MedicalAssistantService
+
+    agent_executor = create_react_agent(model=StubChatModel(latency_seconds=llm_latency),
+                                        tools=[agent.create_search_tool()], prompt=system_prompt)
+    service = MedicalAssistantService(agent_executor, vectorstore, "", max_concurrent_queries=1,
+                                      serper_client=StubSerperClient(search_latency))
+    finished = queue.Queue()
+    scheduler = QueryScheduler(None, None, "", service=service, stream=True, on_finished=finished.put)
+    answer_cache = get_answer_cache()
+    latencies = []
+    try:
+        for query in queries:
+            answer_cache.invalidate()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                scheduler.submit(query, ChatHistory())
+                task = finished.get()
+            latencies.append(time.perf_counter() - started)
+            if task.status != DONE or STUB_ANSWER not in task.answer:
+                raise RuntimeError(f"Query failed: {task.status}, {task.error or task.answer}")
+    finally:
+        scheduler.shutdown()
+    return summarize(latencies, len(queries), sum(latencies), "queries/s")
+
+
+def run_benchmarks(args) -> dict:
+    if args.embeddings == "hash":
+        embedding_model = HashEmbeddings(latency_seconds=args.embedding_latency_ms / 1000)
+    else:
+        embedding_model = registry.create_embedding_model(args.embeddings)
+    registry.set_embedding_model(embedding_model)
+    # Benchmark queries must not end up in the persisted query embedding and search caches.
+    get_query_embedding_cache().persist_path = None
+    agent._search_cache = SearchCache(":memory:", SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES)
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="medical_benchmark_")
+    try:
+        if "ingest_main" in args.stages:
+            results["ingest_main"] = bench_ingest_main(workdir, args.ingest_rows, args.repeats)
+        if "ingestion_jobs" in args.stages:
+            results["ingestion_jobs"] = bench_ingestion_jobs(
+                workdir, args.ingest_files, args.sections_per_file, args.repeats
+            )
+        queries = synthetic_queries(args.queries)
+        stores = {}
+        if "retrieval" in args.stages:
+            for size in args.corpus_sizes:
+                stores[size] = build_store(workdir, f"corpus_{size}", synthetic_sentences(size))
+                for k in args.k:
+                    results[f"retrieval[n={size},k={k}]"] = bench_retrieval(stores[size], queries, k)
+        if "query" in args.stages:
+            size = max(args.corpus_sizes)
+            vectorstore = stores.get(size) or build_store(workdir, f"corpus_{size}", synthetic_sentences(size))
+            results["query"] = bench_query(vectorstore, queries, args.llm_latency_ms / 1000,
+                                           args.search_latency_ms / 1000)
+    finally:
+        registry.reset()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current: dict, baseline: dict) -> list:
+    """Returns one line per stage present in both runs with the relative change of p50, p95 and throughput."""
+    lines = []
+    for stage, result in current.items():
+        before = baseline.get(stage)
+        if not before:
+            continue
+        changes = []
+        for metric in ("p50_ms", "p95_ms", "throughput"):
+            if before[metric]:
+                changes.append(f"{metric} {100 * (result[metric] - before[metric]) / before[metric]:+.1f}%")
+        lines.append(f"  {stage:28} " + "   ".join(changes))
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="stages to run (default: all)")
+    parser.add_argument("--embeddings", choices=("hash",) + registry.EMBEDDING_BACKENDS, default="hash",
+                        help="embedding model: the hashing stand-in or a real backend (default: %(default)s)")
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0,
+                        help="added latency per call of the hashing stand-in (default: %(default)s)")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0,
+                        help="latency of the stand-in LLM before its first token (default: %(default)s)")
+    parser.add_argument("--search-latency-ms", type=float, default=150.0,
+                        help="latency of the stand-in web search (default: %(default)s)")
+    parser.add_argument("--ingest-rows", type=int, default=2000, help="spreadsheet rows for ingest_main (default: %(default)s)")
+    parser.add_argument("--ingest-files", type=int, default=8, help="files for the ingestion job (default: %(default)s)")
+    parser.add_argument("--sections-per-file", type=int, default=50, help="paragraphs per file (default: %(default)s)")
+    parser.add_argument("--corpus-sizes", type=int, nargs="+", default=[1000, 10000],
+                        help="knowledge-base sizes for retrieval (default: %(default)s)")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10], help="documents retrieved (default: %(default)s)")
+    parser.add_argument("--queries", type=int, default=50, help="queries per retrieval and query stage (default: %(default)s)")
+    parser.add_argument("--repeats", type=int, default=3, help="runs of each ingestion stage (default: %(default)s)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {name: value for name, value in vars(args).items() if name not in ("output", "compare", "json")},
+        "stages": run_benchmarks(args),
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"commit {report['commit'] or 'unknown'}, embeddings: {args.embeddings}")
+        for stage, result in report["stages"].items():
+            print(f"  {stage:28} p50 {result['p50_ms']:8.1f} ms   p95 {result['p95_ms']:8.1f} ms   "
+                  f"{result['throughput']:9.1f} {result['unit']}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != report["settings"]:
+            print("Warning: the baseline was run with different settings.")
+        print(f"change against {baseline.get('commit') or args.compare}:")
+        print("\n".join(compare(report["stages"], baseline["stages"])))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+import asyncio
+import itertools
+import threading
+from dataclasses import dataclass
+
+from src.medical_assistant.config import (
+    QUERY_MAX_CONCURRENT, QUERY_MAX_PENDING, QUERY_TIMEOUT_S, STREAM_RESPONSES
+)
+from src.medical_assistant.history import ChatHistory
+from src.medical_assistant.ingestion_jobs import query_priority
+from src.medical_assistant.service import MedicalAssistantService, Session
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, TIMED_OUT = "queued", "running", "done", "failed", "cancelled", "timed_out"
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED, TIMED_OUT)
+
+
+@dataclass
+class QueryTask:
+    """A question submitted to the scheduler and, once finished, its outcome."""
+    id: int
+    conversation_id: str
+    query: str
+    status: str = QUEUED
+    answer: str = ""
+    error: str = ""
+    cached: bool = False
+
+
+class QueryScheduler:
+    """
+    Answers the desktop client's questions on a private asyncio loop through
+    MedicalAssistantService, so at most max_concurrent queries run at once
+    however fast questions are asked, without a thread per question.
+
+    Queries of one conversation run one after another in the order they were
+    asked, each with the history left by the previous one, so their answers
+    are delivered in order; at most max_pending may be waiting or running per
+    conversation. A query that takes longer than timeout seconds is stopped.
+    cancel() stops running queries mid-call: the Serper request or the LLM call
+    in flight is aborted rather than awaited, so no further tokens are spent.
+
+    on_text(task, text_so_far) is called while an answer streams and
+    on_finished(task) once a task is done, failed, cancelled or timed out;
+    both are called on the scheduler's loop thread.
+    """
+
+    def __init__(self, agent_executor, vectorstore, serper_api_key: str,
+                 max_concurrent: int = QUERY_MAX_CONCURRENT, max_pending: int = QUERY_MAX_PENDING,
+                 timeout: float = QUERY_TIMEOUT_S, stream: bool = STREAM_RESPONSES,
+                 on_text=None, on_finished=None, service: MedicalAssistantService = None):
+        self.service = service or MedicalAssistantService(
+            agent_executor, vectorstore, serper_api_key, max_concurrent_queries=max_concurrent
+        )
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.stream = stream
+        self.on_text = on_text
+        self.on_finished = on_finished
+        self._ids = itertools.count(1)
+        self._sessions = {}
+        self._futures = {}  # task id -> (task, concurrent.futures.Future)
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="query-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, query: str, history: ChatHistory, conversation_id: str = "default") -> QueryTask:
+        """
+        Queues query in the conversation whose memory is history. Returns the
+        task, or None when max_pending queries of the conversation are already
+        waiting or running.
+        """
+        with self._lock:
+            if self.pending(conversation_id) >= self.max_pending:
+                return None
+            session = self._sessions.get(conversation_id)
+            if session is None or session.history is not history:
+                session = self._sessions[conversation_id] = Session(history=history)
+            task = QueryTask(id=next(self._ids), conversation_id=conversation_id, query=query)
+            future = asyncio.run_coroutine_threadsafe(self._run(task, session), self._loop)
+            self._futures[task.id] = (task, future)
+        future.add_done_callback(lambda _: self._forget(task, future))
+        return task
+
+    def pending(self, conversation_id: str = None) -> int:
+        """Returns the number of queries waiting or running, in one conversation or in all."""
+        return sum(1 for task, _ in list(self._futures.values())
+                   if conversation_id is None or task.conversation_id == conversation_id)
+
+    def cancel(self, conversation_id: str = None) -> int:
+        """Stops the waiting and running queries of a conversation, or of all; returns how many."""
+        with self._lock:
+            futures = [future for task, future in self._futures.values()
+                       if conversation_id is None or task.conversation_id == conversation_id]
+        # Newest first: the loop cancels the waiting queries before the running one
+        # releases its conversation, so none of them starts in between.
+        return sum(1 for future in reversed(futures) if future.cancel())
+
+    def shutdown(self):
+        """Cancels every query and stops the loop thread."""
+        self.cancel()
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    async def _close(self):
+        # A cancelled query is reported as soon as its future is cancelled, but its
+        # task still unwinds on the loop (aborting requests, closing callbacks).
+        tasks = asyncio.all_tasks() - {asyncio.current_task()}
+        if tasks:
+            await asyncio.wait(tasks, timeout=5)
+        await self.service.close()
+
+    def _forget(self, task: QueryTask, future):
+        with self._lock:
+            self._futures.pop(task.id, None)
+        # A query cancelled before it started never runs, so it is reported here.
+        if future.cancelled():
+            self._finish(task, CANCELLED, "Stopped.")
+
+    def _finish(self, task: QueryTask, status: str, error: str = ""):
+        with self._lock:
+            if task.status in FINISHED_STATUSES:
+                return
+            task.status, task.error = status, error
+        if self.on_finished:
+            self.on_finished(task)
+
+    async def _run(self, task: QueryTask, session: Session):
+        text_so_far = ""
+
+        async def on_text(delta):
+            nonlocal text_so_far
+            text_so_far = "" if delta is None else text_so_far + delta
+            if self.on_text:
+                self.on_text(task, text_so_far)
+
+        try:
+            async with session.lock:
+                task.status = RUNNING
+                with query_priority():
+                    task.answer, task.cached = await asyncio.wait_for(
+                        self.service.answer(task.query, session.history, on_text=on_text if self.stream else None),
+                        self.timeout,
+                    )
+                session.history.add_turn(task.query, task.answer)
+        except asyncio.CancelledError:
+            self._finish(task, CANCELLED, "Stopped.")
+            raise
+        except asyncio.TimeoutError:
+            self._finish(task, TIMED_OUT, f"No answer within {self.timeout:g} seconds; the query was stopped.")
+        except Exception as e:
+            print(f"Error during AI processing: {e}")
+            self._finish(task, FAILED, f"Error during AI processing: {e}")
+        else:
+            self._finish(task, DONE)
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import psutil
+
+from src.medical_assistant.config import (
+    PERSIST_DIR, EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, ONNX_MODEL_DIR, EMBEDDING_BATCH_SIZE
+)
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+# One embedding model and one Chroma client per persist directory for the whole
+# process, shared by agent creation, ingestion and any other entry point.
+_lock = threading.RLock()
+_embedding_model = None
+_vectorstores = {}
+load_stats = {}
+
+
+def resident_memory_mb() -> float:
+    """Returns the resident set size of this process in MiB."""
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+
+def _timed_load(name: str, loader):
+    rss_before = resident_memory_mb()
+    loaded_at = time.monotonic()
+    started = time.perf_counter()
+    value = loader()
+    load_stats[name] = {
+        "seconds": time.perf_counter() - started,
+        "rss_delta_mb": resident_memory_mb() - rss_before,
+        "loaded_at": loaded_at,
+    }
+    print(f"Loaded {name} in {load_stats[name]['seconds']:.2f}s "
+          f"(+{load_stats[name]['rss_delta_mb']:.0f} MiB resident).")
+    return value
+
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def create_embedding_model(backend: str = EMBEDDING_BACKEND):
+    """
+    Builds a new embedding model for the given backend:
+    "torch" (sentence-transformers on PyTorch), "onnx" (ONNX Runtime fp32)
+    or "onnx-int8" (ONNX Runtime with dynamically quantized int8 weights).
+    """
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    if backend in ("onnx", "onnx-int8"):
+        from src.medical_assistant.onnx_embeddings import load_onnx_embeddings
+
+        return load_onnx_embeddings(EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR, quantized=backend == "onnx-int8",
+                                    batch_size=EMBEDDING_BATCH_SIZE)
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {', '.join(EMBEDDING_BACKENDS)}.")
+
+
+def get_embedding_model():
+    """
+    Returns the shared embedding model for EMBEDDING_BACKEND, loading it on first use.
+    """
+    global _embedding_model
+    with _lock:
+        if _embedding_model is None:
+            _embedding_model = _timed_load("embedding model", create_embedding_model)
+        return _embedding_model
+
+
+def set_embedding_model(embedding_model):
+    """
+    Makes embedding_model the shared embedding model, e.g. a stand-in for
+    benchmarks. Vector stores opened afterwards use it.
+    """
+    global _embedding_model
+    with _lock:
+        _embedding_model = embedding_model
+
+
+def get_vectorstore(persist_directory: str = PERSIST_DIR) -> "Chroma":
+    """
+    Returns the shared Chroma vector store for persist_directory, opening it on first use.
+    """
+    key = os.path.abspath(persist_directory)
+    with _lock:
+        if key not in _vectorstores:
+            from langchain_chroma import Chroma
+
+            embedding_model = get_embedding_model()
+            _vectorstores[key] = _timed_load(
+                "vector store",
+                lambda: Chroma(persist_directory=persist_directory, embedding_function=embedding_model),
+            )
+        return _vectorstores[key]
+
+
+def discard_vectorstore(persist_directory: str = PERSIST_DIR):
+    """Forgets the shared vector store so the next get_vectorstore() reopens it."""
+    with _lock:
+        _vectorstores.pop(os.path.abspath(persist_directory), None)
+
+
+def warm_up(persist_directory: str = PERSIST_DIR) -> dict:
+    """
+    Loads the embedding model and vector store and runs one query embedding so
+    the first user query does not pay for lazy initialization.
+    Returns the load report of this call: components that were already loaded
+    are not in it.
+    """
+    started = time.monotonic()
+    vectorstore = get_vectorstore(persist_directory)
+    _timed_load("warm-up query", lambda: vectorstore.embeddings.embed_query("first aid"))
+    return report(since=started)
+
+
+def report(since: float = None) -> dict:
+    """
+    Returns load times per component and the current resident memory; with
+    since (a time.monotonic() value), only the components loaded after it.
+    """
+    with _lock:
+        return {
+            "components": {name: dict(stats) for name, stats in load_stats.items()
+                           if since is None or stats["loaded_at"] >= since},
+            "rss_mb": resident_memory_mb(),
+        }
+
+
+def reset():
+    """Drops every shared instance (used by tests)."""
+    global _embedding_model
+    with _lock:
+        _embedding_model = None
+        _vectorstores.clear()
+        load_stats.clear()
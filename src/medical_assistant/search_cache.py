@@ -0,0 +1,97 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Words that do not change what a first-aid search returns.
+_FILLER_WORDS = {
+    "a", "an", "the", "to", "of", "for", "do", "does", "i", "my", "me", "you",
+    "should", "please", "can", "is", "are", "what", "someone", "someones",
+}
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a search query so that trivially different phrasings share a
+    cache entry: case, punctuation, extra whitespace and filler words are dropped.
+    """
+    words = re.findall(r"[a-z0-9]+", query.casefold().replace("'", ""))
+    kept = [word for word in words if word not in _FILLER_WORDS]
+    return " ".join(kept or words)
+
+
+class SearchCache:
+    """
+    On-disk cache of search results keyed by the normalized query.
+    Entries expire after ttl_seconds and the least recently used entries are
+    evicted once more than max_entries are stored. Safe to share across threads.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS search_cache_lru ON search_cache (last_used)")
+        self._conn.commit()
+
+    def get(self, query: str):
+        """Returns the cached result for the query, or None on a miss or expired entry."""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE search_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, query: str, value: str):
+        """Stores a result and evicts the least recently used entries beyond max_entries."""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM search_cache WHERE key IN ("
+                "SELECT key FROM search_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": size,
+        }
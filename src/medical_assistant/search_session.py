@@ -0,0 +1,88 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+
+from src.medical_assistant.config import AGENT_MAX_TOOL_SEARCHES, SEARCH_DEDUP_SIMILARITY
+from src.medical_assistant.search_cache import normalize_query
+
+# Words the agent adds when rephrasing a first-aid question that do not change what it is about.
+_GENERIC_TERMS = {"how", "first", "aid", "treat", "treating", "treatment", "steps", "guide", "guidelines"}
+
+_current_session = contextvars.ContextVar("search_session", default=None)
+
+
+def _terms(query: str) -> frozenset:
+    words = normalize_query(query).split()
+    kept = [word for word in words if word not in _GENERIC_TERMS] or words
+    return frozenset(word[:-1] if len(word) > 3 and word.endswith("s") else word for word in kept)
+
+
+class SearchSession:
+    """
+    The web searches made while answering one query: the prefetch and every
+    search the agent makes through its tool. A tool search whose terms match
+    an earlier search's with a Jaccard similarity of at least `similarity`
+    (after dropping filler and generic first-aid words and plural endings) is
+    answered from the conversation instead of searching again, and at most
+    max_tool_searches tool searches go out per query. A query answered on
+    asyncio passes its AsyncSerperClient as serper_client, for the tool's
+    searches to go through.
+    """
+
+    def __init__(self, max_tool_searches: int = AGENT_MAX_TOOL_SEARCHES,
+                 similarity: float = SEARCH_DEDUP_SIMILARITY, serper_client=None):
+        self.max_tool_searches = max_tool_searches
+        self.similarity = similarity
+        self.serper_client = serper_client
+        self.tool_searches = 0
+        self.deduplicated = 0
+        self.capped = 0
+        self._searched = []
+        self._lock = threading.Lock()
+
+    def add(self, query: str):
+        """Records that the results of query are already in the conversation."""
+        with self._lock:
+            self._searched.append((query, _terms(query)))
+
+    def find(self, query: str) -> str:
+        """Returns an earlier search that query is a near-duplicate of, or None."""
+        terms = _terms(query)
+        with self._lock:
+            for earlier_query, earlier_terms in self._searched:
+                if len(terms & earlier_terms) / max(1, len(terms | earlier_terms)) >= self.similarity:
+                    return earlier_query
+        return None
+
+    def start_tool_search(self, query: str) -> tuple[str, str]:
+        """
+        Decides what to do with a search the agent asked for. Returns
+        ("deduplicated", earlier_query), ("capped", None) or ("search", None);
+        a "search" counts towards max_tool_searches.
+        """
+        earlier_query = self.find(query)
+        with self._lock:
+            if earlier_query is not None:
+                self.deduplicated += 1
+                return "deduplicated", earlier_query
+            if self.tool_searches >= self.max_tool_searches:
+                self.capped += 1
+                return "capped", None
+            self.tool_searches += 1
+            return "search", None
+
+
+@contextmanager
+def search_session(**kwargs):
+    """Makes a new SearchSession current for the enclosed block (one query)."""
+    session = SearchSession(**kwargs)
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+
+
+def current_search_session() -> SearchSession:
+    """Returns the SearchSession of the query being answered, or None outside of one."""
+    return _current_session.get()
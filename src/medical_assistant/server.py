@@ -0,0 +1,171 @@
+"""
+Headless HTTP server for the medical assistant, for running without the GUI
+or behind a load balancer.
+
+    python -m src.medical_assistant.server --host 127.0.0.1 --port 8080
+
+Endpoints:
+    GET  /health  readiness, load and cache statistics
+    GET  /metrics per-stage latency histograms and counters in the Prometheus text format
+    POST /query   {"query": "...", "session_id": "...", "stream": false}
+                  With "stream": true the answer is sent as server-sent events:
+                  "token" (text delta), "reset" (the agent restarts its answer
+                  after a tool call), then "done" or "error".
+    POST /ingest  {"paths": ["guide.pdf", "folder/"]}, paths on the server's filesystem
+                  inside SERVER_INGEST_ROOT (relative paths are taken from it)
+
+GOOGLE_API_KEY and SERPER_API_KEY are read from the environment (or .env).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from src.medical_assistant import agent, registry, telemetry
+from src.medical_assistant.config import (
+    disclaimer, SERVER_HOST, SERVER_PORT, SERVER_INGEST_ROOT, SERVER_MAX_CONCURRENT_QUERIES
+)
+from src.medical_assistant.service import MedicalAssistantService
+
+SERVICE_KEY = web.AppKey("service", MedicalAssistantService)
+
+
+def _bad_request(message: str) -> web.Response:
+    return web.json_response({"error": message}, status=400)
+
+
+async def _read_json(request: web.Request):
+    try:
+        payload = await request.json()
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response(request.app[SERVICE_KEY].health())
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=telemetry.get_telemetry().prometheus_text(), content_type="text/plain",
+                        charset="utf-8")
+
+
+async def handle_query(request: web.Request) -> web.StreamResponse:
+    service = request.app[SERVICE_KEY]
+    payload = await _read_json(request)
+    if payload is None:
+        return _bad_request("Expected a JSON object.")
+    query = payload.get("query")
+    if not isinstance(query, str) or not query.strip():
+        return _bad_request("'query' must be a non-empty string.")
+    session_id, session = service.sessions.get(payload.get("session_id"))
+
+    if not payload.get("stream"):
+        async with session.lock:
+            try:
+                answer, cached = await service.answer(query, session.history)
+            except Exception as e:
+                print(f"Error during AI processing: {e}")
+                return web.json_response({"error": f"Error during AI processing: {e}", "session_id": session_id},
+                                         status=500)
+            session.history.add_turn(query, answer)
+        return web.json_response({"session_id": session_id, "answer": answer,
+                                  "disclaimer": disclaimer.strip(), "cached": cached})
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+
+    async def send(event: str, data: dict):
+        await response.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+
+    async def on_text(text):
+        await (send("reset", {}) if text is None else send("token", {"text": text}))
+
+    async with session.lock:
+        try:
+            answer, cached = await service.answer(query, session.history, on_text=on_text)
+        except Exception as e:
+            print(f"Error during AI processing: {e}")
+            await send("error", {"error": f"Error during AI processing: {e}", "session_id": session_id})
+        else:
+            session.history.add_turn(query, answer)
+            await send("done", {"session_id": session_id, "answer": answer,
+                                "disclaimer": disclaimer.strip(), "cached": cached})
+    await response.write_eof()
+    return response
+
+
+async def handle_ingest(request: web.Request) -> web.Response:
+    payload = await _read_json(request)
+    paths = payload.get("paths") if payload else None
+    if not isinstance(paths, list) or not paths or not all(isinstance(path, str) for path in paths):
+        return _bad_request("'paths' must be a non-empty list of file or folder paths.")
+    service = request.app[SERVICE_KEY]
+    paths, rejected = service.resolve_ingest_paths(paths)
+    if rejected:
+        return web.json_response({"error": "Only files inside the server's ingest folder can be ingested.",
+                                  "rejected": rejected}, status=403)
+    success, message, failed = await service.ingest(paths)
+    return web.json_response({"success": success, "message": message, "failed": failed},
+                             status=200 if success else 422)
+
+
+def create_app(service: MedicalAssistantService) -> web.Application:
+    app = web.Application()
+    app[SERVICE_KEY] = service
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_post("/query", handle_query)
+    app.router.add_post("/ingest", handle_ingest)
+
+    async def close_service(app: web.Application):
+        await app[SERVICE_KEY].close()
+
+    app.on_cleanup.append(close_service)
+    return app
+
+
+async def build_app(google_api_key: str, serper_api_key: str, max_concurrent_queries: int,
+                    ingest_root: str = SERVER_INGEST_ROOT) -> web.Application:
+    """
+    Creates the agent and warms up the shared embedding model and vector store
+    before the server starts accepting requests.
+    """
+    agent_executor, vectorstore = await asyncio.to_thread(agent.create_medical_agent, google_api_key)
+    if agent_executor is None:
+        raise RuntimeError("Failed to initialize the agent. Check the API key and the vector store.")
+    report = await asyncio.to_thread(registry.warm_up)
+    print(f"Models loaded, {report['rss_mb']:.0f} MiB resident.")
+    return create_app(MedicalAssistantService(agent_executor, vectorstore, serper_api_key, max_concurrent_queries,
+                                              ingest_root=ingest_root))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVER_HOST, help="interface to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--max-concurrent-queries", type=int, default=SERVER_MAX_CONCURRENT_QUERIES,
+                        help="queries processed at once (default: %(default)s)")
+    parser.add_argument("--ingest-root", default=SERVER_INGEST_ROOT,
+                        help="folder POST /ingest may read documents from (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    google_api_key = os.environ.get("GOOGLE_API_KEY")
+    serper_api_key = os.environ.get("SERPER_API_KEY")
+    if not google_api_key or not serper_api_key:
+        print("GOOGLE_API_KEY and SERPER_API_KEY must be set in the environment or in .env.")
+        return 1
+
+    web.run_app(build_app(google_api_key, serper_api_key, args.max_concurrent_queries, args.ingest_root),
+                host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
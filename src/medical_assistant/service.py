@@ -0,0 +1,197 @@
+"""
+The query and ingestion service behind the headless server and the desktop
+client's query scheduler: chat sessions and the RAG + agent pipeline on
+asyncio. Kept free of aiohttp so the GUI can use it without the web stack.
+"""
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from src.medical_assistant import agent, registry, telemetry
+from src.medical_assistant.answer_cache import get_answer_cache
+from src.medical_assistant.config import (
+    KB_VERSION_FILE, PERSIST_DIR, SERVER_INGEST_ROOT, SERVER_MAX_CONCURRENT_QUERIES, SERVER_MAX_SESSIONS,
+    SERVER_SESSION_TTL
+)
+from src.medical_assistant.embedding_cache import get_query_embedding_cache
+from src.medical_assistant.history import ChatHistory
+from src.medical_assistant.http_client import AsyncSerperClient
+from src.medical_assistant.manifest import get_manifest
+from src.medical_assistant.partitioning import ingest_paths
+from src.medical_assistant.search_session import search_session
+
+
+@dataclass
+class Session:
+    """One client's conversation. The lock keeps its queries in order."""
+    history: ChatHistory = field(default_factory=ChatHistory)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class SessionStore:
+    """
+    Chat sessions by id. Sessions idle for longer than ttl_seconds are dropped,
+    as are the least recently used ones beyond max_sessions.
+    """
+
+    def __init__(self, max_sessions: int = SERVER_MAX_SESSIONS, ttl_seconds: float = SERVER_SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+
+    def get(self, session_id: str = None) -> tuple[str, Session]:
+        """Returns (session_id, session), starting a new session for a missing or unknown id."""
+        now = time.monotonic()
+        for stale_id in [sid for sid, session in self._sessions.items()
+                         if now - session.last_used > self.ttl_seconds and not session.lock.locked()]:
+            del self._sessions[stale_id]
+
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            idle = [sid for sid, other in self._sessions.items() if not other.lock.locked()]
+            for evicted_id in idle[:max(0, len(self._sessions) - self.max_sessions + 1)]:
+                del self._sessions[evicted_id]
+            session_id = session_id or uuid.uuid4().hex
+            session = self._sessions[session_id] = Session()
+        self._sessions.move_to_end(session_id)
+        session.last_used = now
+        return session_id, session
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class MedicalAssistantService:
+    """
+    Runs the RAG + agent pipeline of agent.answer_query on asyncio. At most
+    max_concurrent_queries queries run at once; while one waits on Serper,
+    the vector store or the LLM, the others proceed. Only files inside
+    ingest_root can be ingested.
+    """
+
+    def __init__(self, agent_executor, vectorstore, serper_api_key: str,
+                 max_concurrent_queries: int = SERVER_MAX_CONCURRENT_QUERIES,
+                 sessions: SessionStore = None, serper_client: AsyncSerperClient = None,
+                 ingest_root: str = SERVER_INGEST_ROOT):
+        self.agent_executor = agent_executor
+        self.vectorstore = vectorstore
+        self.serper_api_key = serper_api_key
+        self.max_concurrent_queries = max_concurrent_queries
+        self.ingest_root = os.path.realpath(ingest_root)
+        self.sessions = sessions or SessionStore()
+        self.serper_client = serper_client or AsyncSerperClient()
+        self.in_flight = 0
+        self.waiting = 0
+        self._query_slots = asyncio.Semaphore(max_concurrent_queries)
+        self._ingest_lock = asyncio.Lock()
+
+    async def answer(self, query: str, history: ChatHistory, on_text=None) -> tuple[str, bool]:
+        """
+        Answers query given the session history; see agent.uses_answer_cache for
+        which queries use the answer cache. When on_text is set, the answer is
+        streamed: on_text(delta) is awaited for every new piece of text and
+        on_text(None) when the agent discards its answer so far.
+        Returns (answer, served_from_cache).
+        """
+        from langchain_core.messages import HumanMessage
+
+        self.waiting += 1
+        try:
+            await self._query_slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            with telemetry.span("query", streamed=bool(on_text)) as query_span, \
+                    search_session(serper_client=self.serper_client) as searches:
+                history_messages = history.messages()
+                answer_cache = get_answer_cache()
+                query_vector = None
+                if agent.uses_answer_cache(answer_cache, history_messages):
+                    query_vector, cached = await asyncio.to_thread(
+                        agent.lookup_cached_answer, answer_cache, query, self.vectorstore,
+                        get_query_embedding_cache(),
+                    )
+                    if cached is not None:
+                        answer = agent.serve_cached_answer(query_span, cached)
+                        if on_text:
+                            await on_text(answer)
+                        return answer, True
+
+                with telemetry.span("retrieval"):
+                    local_context, serper_context = await agent.gather_context_async(
+                        query, self.vectorstore, self.serper_api_key, self.serper_client
+                    )
+                augmented_prompt = agent.build_augmented_prompt(query, local_context, serper_context)
+                messages = [*history_messages, HumanMessage(content=augmented_prompt)]
+
+                with telemetry.span("llm") as span:
+                    run = agent.AgentRun(span, messages)
+                    for agent_input, config in run.runs():
+                        if on_text and run.final_step:
+                            await on_text(None)  # text streamed with the refused searches
+                        if on_text:
+                            async for chunk, metadata in self.agent_executor.astream(
+                                    agent_input, config, stream_mode="messages"):
+                                text = run.add_chunk(chunk, metadata)
+                                if text is None or text:
+                                    await on_text(text)
+                        else:
+                            run.add_response(await self.agent_executor.ainvoke(agent_input, config))
+                    run.finish(query_span, searches)
+
+                agent.store_answer(answer_cache, query, query_vector, run.answer)
+                return run.answer, False
+        finally:
+            self.in_flight -= 1
+            self._query_slots.release()
+
+    def resolve_ingest_paths(self, paths: list) -> tuple[list, list]:
+        """
+        Resolves paths against ingest_root, following symlinks and "..".
+        Returns (resolved paths, requested paths that lie outside ingest_root).
+        """
+        resolved, rejected = [], []
+        for path in paths:
+            real_path = os.path.realpath(os.path.join(self.ingest_root, path))
+            if os.path.commonpath([real_path, self.ingest_root]) == self.ingest_root:
+                resolved.append(real_path)
+            else:
+                rejected.append(path)
+        return resolved, rejected
+
+    async def ingest(self, paths: list) -> tuple[bool, str, list]:
+        """
+        Ingests files and folders on the server into the shared vector store.
+        Ingestions run one at a time in a worker thread.
+        Returns (success, message, failed files).
+        """
+        failed = []
+        async with self._ingest_lock:
+            success, message = await asyncio.to_thread(
+                ingest_paths, self.vectorstore, paths, os.path.join(PERSIST_DIR, KB_VERSION_FILE),
+                failure_callback=lambda path, error: failed.append({"path": path, "error": error}),
+                manifest=get_manifest(PERSIST_DIR),
+            )
+        return success, message, failed
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrent_queries": self.max_concurrent_queries,
+            "sessions": len(self.sessions),
+            "answer_cache": get_answer_cache().stats(),
+            "query_embedding_cache": get_query_embedding_cache().stats(),
+            "serper_latency": self.serper_client.latency.snapshot(),
+            "resources": registry.report(),
+            "telemetry": telemetry.get_telemetry().summary(),
+        }
+
+    async def close(self):
+        await self.serper_client.aclose()
@@ -0,0 +1,100 @@
+"""
+Import-time benchmark for the GUI entry point.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters, attributes
+the import time to top-level packages and fails if any heavy ML/LLM/document
+package is imported at startup or the median total exceeds the budget.
+
+    python -m src.medical_assistant.startup_benchmark --runs 5 --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+# Packages that must only be loaded once the agent is initialized or a document is ingested,
+# and aiohttp, which only the headless server needs.
+HEAVY_PACKAGES = (
+    "langchain_core", "langchain_chroma", "langchain_community", "langchain_google_genai",
+    "langchain_huggingface", "langgraph", "chromadb", "sentence_transformers", "transformers",
+    "torch", "unstructured", "pandas", "aiohttp",
+)
+DEFAULT_MODULE = "src.medical_assistant.ui"
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Parses `-X importtime` output into the microseconds spent in each top-level package.
+    """
+    per_package = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|", 2)
+        per_package[name.strip().split(".")[0]] += int(self_us)
+    return dict(per_package)
+
+
+def measure_import(module: str = DEFAULT_MODULE, runs: int = 3) -> dict:
+    """
+    Imports module in `runs` fresh interpreters and returns the median total
+    import time, the per-package breakdown of the median run and the heavy
+    packages that were loaded.
+    """
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+        per_package = parse_importtime(completed.stderr)
+        samples.append((sum(per_package.values()), per_package))
+
+    samples.sort(key=lambda sample: sample[0])
+    total_us, per_package = samples[len(samples) // 2]
+    return {
+        "module": module,
+        "runs": runs,
+        "total_ms": total_us / 1000,
+        "all_runs_ms": [sample[0] / 1000 for sample in samples],
+        "packages_ms": {
+            name: us / 1000 for name, us in sorted(per_package.items(), key=lambda item: -item[1])
+        },
+        "heavy_loaded": sorted(name for name in per_package if name in HEAVY_PACKAGES),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default=DEFAULT_MODULE, help="module to import (default: %(default)s)")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to run (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=10, help="packages to list (default: %(default)s)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if the median import exceeds this")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    result = measure_import(args.module, args.runs)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import {result['module']}: median {result['total_ms']:.0f} ms over {result['runs']} run(s)")
+        for name, ms in list(result["packages_ms"].items())[:args.top]:
+            print(f"  {ms:8.1f} ms  {name}")
+
+    failed = False
+    if result["heavy_loaded"]:
+        print(f"FAIL: heavy packages imported at startup: {', '.join(result['heavy_loaded'])}")
+        failed = True
+    if args.budget_ms is not None and result["total_ms"] > args.budget_ms:
+        print(f"FAIL: startup import took {result['total_ms']:.0f} ms (budget {args.budget_ms:.0f} ms)")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
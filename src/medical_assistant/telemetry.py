@@ -0,0 +1,219 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from src.medical_assistant.config import TELEMETRY_LOG_PATH, TELEMETRY_RECENT_SPANS
+from src.medical_assistant.http_client import LatencyStats
+
+METRIC_PREFIX = "medical_assistant"
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    One timed stage of a query or ingestion. Spans opened while another span is
+    active (in the same thread, asyncio task or copied context) become its children
+    and share its trace id.
+    """
+
+    def __init__(self, name: str, parent: "Span" = None, attributes: dict = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.counts = {}
+        self.error = None
+        self.start_time = time.time()
+        self.duration = None
+        self._started = time.perf_counter()
+
+    def set(self, **attributes):
+        """Records attributes that are logged with the span."""
+        self.attributes.update(attributes)
+
+    def count(self, name: str, value: float = 1):
+        """Adds to a per-span count (e.g. tokens or tool calls), also exported as a counter."""
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def fail(self, error: str):
+        """Marks the span as failed without raising, for stages that degrade gracefully."""
+        self.error = error
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "counts": self.counts,
+            "error": self.error,
+        }
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items())) + "}"
+
+
+class Telemetry:
+    """
+    Collects finished spans into latency statistics, a Prometheus-style duration
+    histogram per span name and counters, keeps the most recent spans and, when
+    log_path is set, appends every span to it as a JSON line.
+    """
+
+    def __init__(self, log_path: str = None, recent_spans: int = 200):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(LatencyStats)
+        self._buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+        self._duration_sums = defaultdict(float)
+        self._span_counts = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._counters = defaultdict(float)
+        self._recent = deque(maxlen=recent_spans)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Times the enclosed block as a span named name."""
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            self._record(span)
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Adds value to the counter name{labels}."""
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def _record(self, span: Span):
+        with self._lock:
+            self._latencies[span.name].record(span.duration, ok=span.error is None)
+            self._span_counts[span.name] += 1
+            self._duration_sums[span.name] += span.duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    self._buckets[span.name][i] += 1
+            if span.error is not None:
+                self._errors[span.name] += 1
+            for name, value in span.counts.items():
+                self._counters[(name, (("span", span.name),))] += value
+            self._recent.append(span.to_dict())
+            if self.log_path:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    def recent_spans(self) -> list:
+        with self._lock:
+            return list(self._recent)
+
+    def summary(self) -> dict:
+        """Returns count, errors and p50/p95 latency per span name, and every counter."""
+        with self._lock:
+            names = sorted(self._span_counts)
+            latencies = {name: self._latencies[name].snapshot() for name in names}
+            spans = {
+                name: {
+                    "count": self._span_counts[name],
+                    "errors": self._errors[name],
+                    "p50_ms": latencies[name]["p50"] * 1000,
+                    "p95_ms": latencies[name]["p95"] * 1000,
+                }
+                for name in names
+            }
+            counters = {f"{name}{_labels(dict(labels))}": value
+                        for (name, labels), value in sorted(self._counters.items())}
+        return {"spans": spans, "counters": counters}
+
+    def format_summary(self) -> str:
+        """Plain-text summary for the status panel."""
+        summary = self.summary()
+        lines = [f"{name}: {s['count']}x, p50 {s['p50_ms']:.0f} ms, p95 {s['p95_ms']:.0f} ms"
+                 + (f", {s['errors']} failed" if s["errors"] else "")
+                 for name, s in summary["spans"].items()]
+        lines += [f"{name}: {value:g}" for name, value in summary["counters"].items()]
+        return "\n".join(lines) or "No activity yet."
+
+    def prometheus_text(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                f"# HELP {METRIC_PREFIX}_span_duration_seconds Time spent in each pipeline stage.",
+                f"# TYPE {METRIC_PREFIX}_span_duration_seconds histogram",
+            ]
+            for name in sorted(self._span_counts):
+                for bound, count in zip(DURATION_BUCKETS, self._buckets[name]):
+                    lines.append(f"{METRIC_PREFIX}_span_duration_seconds_bucket"
+                                 f"{_labels({'span': name, 'le': bound})} {count}")
+                lines.append(f"{METRIC_PREFIX}_span_duration_seconds_bucket"
+                             f"{_labels({'span': name, 'le': '+Inf'})} {self._span_counts[name]}")
+                lines.append(f"{METRIC_PREFIX}_span_duration_seconds_sum{_labels({'span': name})} "
+                             f"{self._duration_sums[name]}")
+                lines.append(f"{METRIC_PREFIX}_span_duration_seconds_count{_labels({'span': name})} "
+                             f"{self._span_counts[name]}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_span_errors_total counter")
+            for name in sorted(self._errors):
+                lines.append(f"{METRIC_PREFIX}_span_errors_total{_labels({'span': name})} {self._errors[name]}")
+            counter_names = sorted({name for name, _ in self._counters})
+            for counter_name in counter_names:
+                lines.append(f"# TYPE {METRIC_PREFIX}_{counter_name}_total counter")
+                for (name, labels), value in sorted(self._counters.items()):
+                    if name == counter_name:
+                        lines.append(f"{METRIC_PREFIX}_{name}_total{_labels(dict(labels))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            for store in (self._latencies, self._buckets, self._duration_sums, self._span_counts,
+                          self._errors, self._counters):
+                store.clear()
+            self._recent.clear()
+
+
+_telemetry = Telemetry(TELEMETRY_LOG_PATH, TELEMETRY_RECENT_SPANS)
+
+
+def get_telemetry() -> Telemetry:
+    """Returns the process-wide telemetry collector."""
+    return _telemetry
+
+
+def span(name: str, **attributes):
+    """Times the enclosed block as a span of the process-wide collector."""
+    return _telemetry.span(name, **attributes)
+
+
+def increment(name: str, value: float = 1, **labels):
+    """Adds to a counter of the process-wide collector."""
+    _telemetry.increment(name, value, **labels)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    increment("cache_lookups", cache=cache, result="hit" if hit else "miss")
@@ -0,0 +1,206 @@
+import itertools
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QRectF, QSize, Qt
+from PySide6.QtGui import QAbstractTextDocumentLayout, QColor, QPainter, QPalette, QTextDocument, QTextOption
+from PySide6.QtWidgets import QAbstractItemView, QApplication, QListView, QMenu, QStyledItemDelegate
+
+from src.medical_assistant.config import TRANSCRIPT_LAYOUT_CACHE_SIZE
+
+BUBBLE_COLORS = {"Assistant": "#2c3e50", "You": "#0078d4"}
+DEFAULT_BUBBLE_COLOR = "#6c757d"
+AI_TEXT_COLOR = "#ecf0f1"
+TEXT_COLOR = "#ffffff"
+BUBBLE_WIDTH_RATIO = 0.7  # of the viewport
+MARGIN = 5
+PADDING = 10
+RADIUS = 10
+
+_message_ids = itertools.count()
+
+
+@dataclass
+class ChatMessage:
+    """One bubble of the transcript. revision changes whenever its text does."""
+    sender: str
+    text: str
+    is_ai: bool = False
+    revision: int = 0
+    id: int = field(default_factory=lambda: next(_message_ids))
+
+
+class ChatTranscriptModel(QAbstractListModel):
+    """The chat transcript as a list model holding only the messages' text."""
+
+    MessageRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._messages = []
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._messages):
+            return None
+        message = self._messages[index.row()]
+        if role == Qt.DisplayRole:
+            return message.text
+        if role == self.MessageRole:
+            return message
+        return None
+
+    def append(self, sender: str, text: str, is_ai: bool = False) -> int:
+        """Adds a message at the end and returns its row."""
+        row = len(self._messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._messages.append(ChatMessage(sender, text, is_ai))
+        self.endInsertRows()
+        return row
+
+    def set_text(self, row: int, text: str):
+        message = self._messages[row]
+        message.text = text
+        message.revision += 1
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+    def clear(self):
+        self.beginResetModel()
+        self._messages = []
+        self.endResetModel()
+
+
+class MessageDelegate(QStyledItemDelegate):
+    """
+    Paints messages as chat bubbles, rendering Markdown for the assistant's.
+    No widget is created per message: a row is laid out to learn its height and
+    when it is painted. Laid out documents are kept in an LRU cache of
+    cache_size entries, and only each row's height is remembered beyond that,
+    so memory stays bounded however long the session runs. Both are keyed by
+    the message's revision and the bubble width, so edited messages and
+    resizes reflow.
+    """
+
+    def __init__(self, view: QListView, cache_size: int = TRANSCRIPT_LAYOUT_CACHE_SIZE):
+        super().__init__(view)
+        self.view = view
+        self.cache_size = cache_size
+        self._documents = OrderedDict()  # (message id, revision, width) -> QTextDocument
+        self._heights = {}  # message id -> (revision, row height at _heights_width)
+        self._heights_width = None
+
+    def bubble_width(self) -> int:
+        return max(1, int(self.view.viewport().width() * BUBBLE_WIDTH_RATIO) - 2 * PADDING)
+
+    def document(self, message: ChatMessage, width: int) -> QTextDocument:
+        key = (message.id, message.revision, width)
+        document = self._documents.get(key)
+        if document is not None:
+            self._documents.move_to_end(key)
+            return document
+        document = QTextDocument()
+        document.setDocumentMargin(0)
+        document.setDefaultFont(self.view.font())
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WrapMode.WordWrap)
+        document.setDefaultTextOption(option)
+        if message.is_ai:
+            document.setMarkdown(message.text)
+        else:
+            document.setPlainText(message.text)
+        document.setTextWidth(width)
+        self._documents[key] = document
+        while len(self._documents) > self.cache_size:
+            self._documents.popitem(last=False)
+        return document
+
+    def sizeHint(self, option, index) -> QSize:
+        message = index.data(ChatTranscriptModel.MessageRole)
+        width = self.bubble_width()
+        if width != self._heights_width:
+            self._heights, self._heights_width = {}, width
+        revision, height = self._heights.get(message.id, (None, None))
+        if revision != message.revision:
+            height = int(self.document(message, width).size().height()) + 2 * (PADDING + MARGIN)
+            self._heights[message.id] = (message.revision, height)
+        return QSize(self.view.viewport().width(), height)
+
+    def paint(self, painter: QPainter, option, index):
+        message = index.data(ChatTranscriptModel.MessageRole)
+        document = self.document(message, self.bubble_width())
+        text_width = min(document.idealWidth(), document.textWidth())
+        bubble = QRectF(0, option.rect.top() + MARGIN, text_width + 2 * PADDING,
+                        document.size().height() + 2 * PADDING)
+        if message.is_ai:
+            bubble.moveLeft(option.rect.left() + MARGIN)
+        else:
+            bubble.moveRight(option.rect.right() - MARGIN)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(BUBBLE_COLORS.get(message.sender, DEFAULT_BUBBLE_COLOR)))
+        painter.drawRoundedRect(bubble, RADIUS, RADIUS)
+        painter.translate(bubble.left() + PADDING, bubble.top() + PADDING)
+        context = QAbstractTextDocumentLayout.PaintContext()
+        context.palette.setColor(QPalette.Text, QColor(AI_TEXT_COLOR if message.is_ai else TEXT_COLOR))
+        document.documentLayout().draw(painter, context)
+        painter.restore()
+
+    def clear_cache(self):
+        self._documents.clear()
+        self._heights = {}
+
+
+class ChatTranscriptView(QListView):
+    """
+    Scrollable chat transcript backed by ChatTranscriptModel and
+    MessageDelegate. Bubbles reflow when the view is resized; a message's text
+    can be copied from its context menu.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.transcript = ChatTranscriptModel(self)
+        self.delegate = MessageDelegate(self)
+        self.setModel(self.transcript)
+        self.setItemDelegate(self.delegate)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setResizeMode(QListView.Adjust)
+        self.setLayoutMode(QListView.Batched)
+        self.setWordWrap(True)
+        self.setStyleSheet("QListView { border: none; }")
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.show_context_menu)
+        self.transcript.dataChanged.connect(self.on_data_changed)
+
+    def add_message(self, sender: str, text: str, is_ai: bool = False) -> int:
+        row = self.transcript.append(sender, text, is_ai)
+        self.scrollToBottom()
+        return row
+
+    def update_message(self, row: int, text: str):
+        self.transcript.set_text(row, text)
+        self.scrollToBottom()
+
+    def clear(self):
+        self.transcript.clear()
+        self.delegate.clear_cache()
+
+    def on_data_changed(self, top_left, bottom_right, roles=()):
+        # A longer or shorter text changes the row height, which the view only re-queries when told.
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            self.delegate.sizeHintChanged.emit(self.transcript.index(row))
+
+    def show_context_menu(self, position):
+        index = self.indexAt(position)
+        if not index.isValid():
+            return
+        menu = QMenu(self)
+        copy_action = menu.addAction("Copy Message")
+        if menu.exec(self.viewport().mapToGlobal(position)) == copy_action:
+            QApplication.clipboard().setText(index.data(Qt.DisplayRole))
@@ -4,16 +4,24 @@ from PySide6.QtWidgets import (
     QLineEdit, QFormLayout, QSplitter, QPushButton, QLabel,
     QListWidgetItem, QHBoxLayout, QMessageBox, QFileDialog, QTextEdit,
 )
-from PySide6.QtCore import Qt, QSize
-from PySide6.QtGui import QTextOption
+from PySide6.QtCore import Qt, QTimer, Signal
 
-from langchain_core.messages import HumanMessage, AIMessage
-
-from src.medical_assistant.workers import (
-    ChromaDBIngestionWorker, MedicalAgentWorker, AgentInitializationWorker
-)
+from src.medical_assistant import telemetry
+from src.medical_assistant.config import disclaimer, TELEMETRY_PANEL_REFRESH_MS
+from src.medical_assistant.history import ChatHistory
+from src.medical_assistant.ingestion_jobs import ACTIVE_STATUSES, DONE, IngestionJobQueue, get_job_store
+from src.medical_assistant import query_scheduler
+from src.medical_assistant.query_scheduler import QueryScheduler
+from src.medical_assistant.transcript import ChatTranscriptView
+from src.medical_assistant.workers import AgentInitializationWorker
 
 class MedicalMainWindow(QMainWindow):
+    # Ingestion jobs and queries report from background threads; signals carry their updates to the GUI thread.
+    job_updated = Signal(object)
+    job_file_failed = Signal(object, str, str)
+    query_text = Signal(object, str)
+    query_finished = Signal(object)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Medical AI Assistant")
@@ -21,21 +29,36 @@ class MedicalMainWindow(QMainWindow):
 
         self.agent_executor = None
         self.vector_store = None
-        self.chat_history = []
+        self.chat_history = ChatHistory()
+        self.query_scheduler = None
+        self.answer_messages = {}  # task id -> transcript row of its answer bubble
+        self.active_queries = set()
+        self.ingestion_queue = None
+        self.job_items = {}
+        self.job_updated.connect(self.on_job_updated)
+        self.job_file_failed.connect(self.on_ingestion_file_failed)
+        self.query_text.connect(self.on_query_text)
+        self.query_finished.connect(self.on_query_finished)
 
         self.main_layout = QVBoxLayout()
 
-        self.chat_list_widget = QListWidget()
-        self.chat_list_widget.setSelectionMode(QListWidget.NoSelection)
-        self.chat_list_widget.setStyleSheet("QListWidget { border: none; }")
+        self.chat_view = ChatTranscriptView()
 
         self.user_input_line = QLineEdit()
         self.user_input_line.setPlaceholderText("Initialize agent to begin...")
         self.user_input_line.returnPressed.connect(self.handle_user_input)
         self.user_input_line.setEnabled(False)
 
-        self.main_layout.addWidget(self.chat_list_widget)
-        self.main_layout.addWidget(self.user_input_line)
+        self.stopButton = QPushButton("Stop")
+        self.stopButton.setEnabled(False)
+        self.stopButton.clicked.connect(self.stop_queries)
+
+        input_layout = QHBoxLayout()
+        input_layout.addWidget(self.user_input_line)
+        input_layout.addWidget(self.stopButton)
+
+        self.main_layout.addWidget(self.chat_view)
+        self.main_layout.addLayout(input_layout)
 
         sidebar_layout = QVBoxLayout()
         form_layout = QFormLayout()
@@ -56,17 +79,45 @@ class MedicalMainWindow(QMainWindow):
         self.initAgentButton.clicked.connect(self.initialize_agent)
         form_layout.addRow(self.initAgentButton)
 
-        self.upload_button = QPushButton("Add Document to Knowledge Base")
+        self.upload_button = QPushButton("Add Documents to Knowledge Base")
         self.upload_button.setEnabled(False)
         self.upload_button.clicked.connect(self.open_file_dialog)
         form_layout.addRow(self.upload_button)
 
+        self.upload_folder_button = QPushButton("Add Folder to Knowledge Base")
+        self.upload_folder_button.setEnabled(False)
+        self.upload_folder_button.clicked.connect(self.open_folder_dialog)
+        form_layout.addRow(self.upload_folder_button)
+
         self.statusLabel = QLabel("Status: Not Initialized")
         self.statusLabel.setWordWrap(True)
         form_layout.addRow(self.statusLabel)
 
         sidebar_layout.addLayout(form_layout)
-        sidebar_layout.addStretch()
+
+        sidebar_layout.addWidget(QLabel("Ingestion jobs:"))
+        self.jobsList = QListWidget()
+        self.jobsList.setWordWrap(True)
+        sidebar_layout.addWidget(self.jobsList)
+        jobs_buttons = QHBoxLayout()
+        self.cancelJobButton = QPushButton("Cancel Job")
+        self.cancelJobButton.clicked.connect(self.cancel_selected_job)
+        jobs_buttons.addWidget(self.cancelJobButton)
+        self.clearJobsButton = QPushButton("Clear Finished")
+        self.clearJobsButton.clicked.connect(self.clear_finished_jobs)
+        jobs_buttons.addWidget(self.clearJobsButton)
+        sidebar_layout.addLayout(jobs_buttons)
+
+        sidebar_layout.addWidget(QLabel("Performance:"))
+        self.metricsPanel = QTextEdit()
+        self.metricsPanel.setReadOnly(True)
+        self.metricsPanel.setLineWrapMode(QTextEdit.NoWrap)
+        self.metricsPanel.setStyleSheet("QTextEdit { font-family: monospace; font-size: 11px; }")
+        sidebar_layout.addWidget(self.metricsPanel)
+        self.metricsTimer = QTimer(self)
+        self.metricsTimer.timeout.connect(self.refresh_metrics)
+        self.metricsTimer.start(TELEMETRY_PANEL_REFRESH_MS)
+        self.refresh_metrics()
 
         self.clearChatButton = QPushButton("Clear Chat")
         self.clearChatButton.clicked.connect(self.clear_chat)
@@ -86,6 +137,10 @@ class MedicalMainWindow(QMainWindow):
 
         self.setCentralWidget(splitter)
 
+    def refresh_metrics(self):
+        """Shows per-stage latencies and cache hit counts collected so far."""
+        self.metricsPanel.setPlainText(telemetry.get_telemetry().format_summary())
+
     def initialize_agent(self):
         google_api_key = self.google_apiKeyInput.text()
         serper_api_key = self.serper_apiKeyInput.text()
@@ -103,18 +158,32 @@ class MedicalMainWindow(QMainWindow):
         self.initAgentButton.setEnabled(False)
 
         self.init_worker = AgentInitializationWorker(google_api_key)
+        self.load_report = ""
+        self.init_worker.load_report.connect(self.on_load_report)
         self.init_worker.agent_initialized.connect(self.on_agent_initialized)
         self.init_worker.start()
 
+    def on_load_report(self, report):
+        self.load_report = report
+
     def on_agent_initialized(self, success, agent_executor, vector_store):
         if success:
             self.agent_executor = agent_executor
             self.vector_store = vector_store
-            self.statusLabel.setText("Status: Agent is ready.")
+            if self.query_scheduler is not None:
+                self.query_scheduler.shutdown()
+            self.query_scheduler = QueryScheduler(
+                agent_executor, vector_store, self.serper_apiKeyInput.text(),
+                on_text=self.query_text.emit, on_finished=self.query_finished.emit,
+            )
+            ready = f"Status: Agent is ready ({self.load_report})." if self.load_report else "Status: Agent is ready."
+            self.statusLabel.setText(ready)
             self.statusLabel.setStyleSheet("color: green;")
             self.user_input_line.setEnabled(True)
             self.user_input_line.setPlaceholderText("Ask a medical question...")
             self.upload_button.setEnabled(True)
+            self.upload_folder_button.setEnabled(True)
+            self.start_ingestion_queue()
         else:
             self.statusLabel.setText("Status: Failed to initialize. Check console for errors.")
             self.statusLabel.setStyleSheet("color: red;")
@@ -122,22 +191,69 @@ class MedicalMainWindow(QMainWindow):
 
     def open_file_dialog(self):
         file_filters = "Documents (*.txt *.pdf *.docx *.md);;All Files (*)"
-        file_name, _ = QFileDialog.getOpenFileName(
-            self, "Open Document", "", file_filters
+        file_names, _ = QFileDialog.getOpenFileNames(
+            self, "Open Documents", "", file_filters
         )
-        if file_name:
-            self.statusLabel.setText("Status: Ingesting document...")
-            self.statusLabel.setStyleSheet("color: orange;")
-            self.upload_button.setEnabled(False)
-
-            self.ingestion_worker = ChromaDBIngestionWorker(file_name, self.vector_store)
-            self.ingestion_worker.finished.connect(self.on_ingestion_finished)
-            self.ingestion_worker.start()
-
-    def on_ingestion_finished(self, success, message):
-        self.statusLabel.setText(f"Status: {message}")
-        self.statusLabel.setStyleSheet("color: green;" if success else "color: red;")
-        self.upload_button.setEnabled(True)
+        if file_names:
+            self.start_ingestion(file_names)
+
+    def open_folder_dialog(self):
+        folder = QFileDialog.getExistingDirectory(self, "Open Folder", "")
+        if folder:
+            self.start_ingestion([folder])
+
+    def start_ingestion_queue(self):
+        """Creates the ingestion job queue once the vector store is ready and resumes unfinished jobs."""
+        if self.ingestion_queue is not None:
+            self.ingestion_queue.vectorstore = self.vector_store
+            return
+        self.ingestion_queue = IngestionJobQueue(
+            self.vector_store, get_job_store(),
+            on_update=self.job_updated.emit, on_file_failed=self.job_file_failed.emit,
+        )
+        for job in self.ingestion_queue.resume():
+            self.on_job_updated(job)
+
+    def start_ingestion(self, paths):
+        for job in self.ingestion_queue.submit(paths):
+            self.on_job_updated(job)
+
+    def on_job_updated(self, job):
+        item = self.job_items.get(job.id)
+        if item is None:
+            item = QListWidgetItem()
+            item.setData(Qt.UserRole, job.id)
+            self.jobsList.addItem(item)
+            self.job_items[job.id] = item
+        item.setText(job.describe())
+        item.setToolTip(job.path)
+        if job.status not in ACTIVE_STATUSES and job.message:
+            self.statusLabel.setText(f"Status: {job.name}: {job.message}")
+            self.statusLabel.setStyleSheet("color: green;" if job.status == DONE else "color: red;")
+
+    def cancel_selected_job(self):
+        item = self.jobsList.currentItem()
+        if item is not None and self.ingestion_queue is not None:
+            self.ingestion_queue.cancel(item.data(Qt.UserRole))
+
+    def clear_finished_jobs(self):
+        if self.ingestion_queue is None:
+            return
+        self.ingestion_queue.clear_finished()
+        active = {job.id for job in self.ingestion_queue.jobs()}
+        for job_id in [job_id for job_id in self.job_items if job_id not in active]:
+            self.jobsList.takeItem(self.jobsList.row(self.job_items.pop(job_id)))
+
+    def on_ingestion_file_failed(self, job, path, error):
+        self.add_message("System", f"Failed to ingest {os.path.basename(path)}: {error}")
+
+    def closeEvent(self, event):
+        if self.query_scheduler is not None:
+            self.query_scheduler.shutdown()
+        # Running jobs stop after their current batch and resume on the next start.
+        if self.ingestion_queue is not None:
+            self.ingestion_queue.shutdown(wait=False)
+        super().closeEvent(event)
 
     def handle_user_input(self):
         if not self.agent_executor:
@@ -148,70 +264,59 @@ class MedicalMainWindow(QMainWindow):
         if not user_text:
             return
 
+        task = self.query_scheduler.submit(user_text, self.chat_history)
+        if task is None:
+            self.add_message("System", "Still answering your previous questions. Wait for them or press Stop.")
+            return
         self.add_message("You", user_text)
         self.user_input_line.clear()
-
-        self.agent_worker = MedicalAgentWorker(
-            agent_executor=self.agent_executor,
-            vector_store=self.vector_store,
-            serper_apiKeyInput=self.serper_apiKeyInput.text(),
-            query=user_text,
-            chat_history=self.chat_history
-        )
-        self.agent_worker.response_generated.connect(self.on_ai_response)
-        self.agent_worker.start()
-
-    def on_ai_response(self, text):
-        self.add_message("Assistant", text, is_ai=True)
-        self.chat_history.append(HumanMessage(content=self.user_input_line.placeholderText()))
-        self.chat_history.append(AIMessage(content=text))
-
-    def add_message(self, sender, text, is_ai=False):
-        item = QListWidgetItem()
-        message_widget = QWidget()
-        layout = QHBoxLayout(message_widget)
-        layout.setContentsMargins(5, 5, 5, 5)
-
-        text_edit = QTextEdit()
-        text_edit.setReadOnly(True)
-        text_edit.setTextInteractionFlags(Qt.TextSelectableByMouse)
-        text_edit.setWordWrapMode(QTextOption.WrapMode.WordWrap)
-        text_edit.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        max_width = int(self.chat_list_widget.viewport().width() * 0.7)
-        text_edit.setMaximumWidth(max_width)
-
-        doc = text_edit.document()
-        doc.setTextWidth(max_width)
-
-        if is_ai:
-            text_edit.setMarkdown(text)
-            text_edit.setStyleSheet(
-                "background-color: #2c3e50; color: #ecf0f1; border-radius: 10px; padding: 10px; border: none;"
-            )
-            layout.addWidget(text_edit)
-            layout.addStretch()
+        self.active_queries.add(task.id)
+        self.stopButton.setEnabled(True)
+
+    def stop_queries(self):
+        if self.query_scheduler is not None:
+            self.query_scheduler.cancel()
+
+    def on_query_text(self, task, text):
+        if task.id not in self.active_queries:
+            return  # text that raced with a cancellation
+        if task.id not in self.answer_messages:
+            self.answer_messages[task.id] = self.add_message("Assistant", text, is_ai=True)
         else:
-            text_edit.setPlainText(text)
-            bg_color = "#0078d4" if sender == "You" else "#6c757d"
-            text_edit.setStyleSheet(
-                f"background-color: {bg_color}; color: #ffffff; border-radius: 10px; padding: 10px; border: none;"
-            )
-            layout.addStretch()
-            layout.addWidget(text_edit)
+            self.update_message(self.answer_messages[task.id], text)
+
+    def on_query_finished(self, task):
+        if task.id not in self.active_queries:
+            return  # stopped by clearing the chat
+        self.active_queries.discard(task.id)
+        self.stopButton.setEnabled(bool(self.active_queries))
+        row = self.answer_messages.pop(task.id, None)
+        if task.status != query_scheduler.DONE:
+            self.add_message("System", task.error)
+            return
+        # The scheduler records the turn in chat_history; the disclaimer is only shown.
+        text = f"{disclaimer}\n\n{task.answer}"
+        if row is not None:
+            self.update_message(row, text)
+        else:
+            self.add_message("Assistant", text, is_ai=True)
 
-        doc.adjustSize()
-        height = doc.size().height()
-        text_edit.setFixedHeight(int(height) + 15)
+    def add_message(self, sender, text, is_ai=False):
+        """Appends a bubble to the transcript and returns its row, for update_message."""
+        return self.chat_view.add_message(sender, text, is_ai)
 
-        item.setSizeHint(QSize(self.chat_list_widget.width() - 5, text_edit.height() + 15))
-        self.chat_list_widget.addItem(item)
-        self.chat_list_widget.setItemWidget(item, message_widget)
-        self.chat_list_widget.scrollToBottom()
+    def update_message(self, row, text):
+        """Replaces a bubble's text in place; the transcript reflows it."""
+        self.chat_view.update_message(row, text)
 
     def clear_chat(self):
         reply = QMessageBox.question(self, 'Clear Chat',
                                      "Are you sure you want to clear the chat history?",
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            self.chat_list_widget.clear()
-            self.chat_history.clear()
\ No newline at end of file
+            self.stop_queries()
+            self.chat_view.clear()
+            self.chat_history.clear()
+            self.answer_messages.clear()
+            self.active_queries.clear()
+            self.stopButton.setEnabled(False)
\ No newline at end of file
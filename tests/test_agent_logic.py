@@ -1,13 +1,43 @@
+import threading
+import time
 import unittest
 import json
 import requests
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 
-from src.medical_assistant.agent import augment_prompt_with_rag, serper_search
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.prebuilt import create_react_agent
+
+from src.medical_assistant.agent import (
+    augment_prompt_with_rag, serper_search, gather_context, search_tool_results, answer_query
+)
+from src.medical_assistant.answer_cache import SemanticAnswerCache
+from src.medical_assistant.context import ContextRecord
+from src.medical_assistant.embedding_cache import QueryEmbeddingCache
+from src.medical_assistant.search_cache import SearchCache
+
+SERPER_PAYLOAD = json.dumps({
+    "organic": [
+        {"title": "Burns and scalds - NHS", "link": "https://www.nhs.uk/burns",
+         "snippet": "Cool the burn with cool or lukewarm running water for 20 minutes."},
+    ],
+    "relatedSearches": [{"query": "burn cream"}],
+})
 
 class TestAgentLogic(unittest.TestCase):
     """Tests for agent helper functions."""
 
+    def setUp(self):
+        self.search_cache = SearchCache(":memory:", ttl_seconds=60, max_entries=10)
+        self.embedding_cache = QueryEmbeddingCache(max_size=10)
+        for target, cache in [('get_search_cache', self.search_cache),
+                              ('get_query_embedding_cache', self.embedding_cache)]:
+            patcher = patch(f'src.medical_assistant.agent.{target}', return_value=cache)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
     def test_augment_prompt_with_rag(self):
         """Test that the RAG context is correctly formatted."""
         mock_vectorstore = MagicMock()
@@ -16,29 +46,168 @@ class TestAgentLogic(unittest.TestCase):
         mock_doc2 = MagicMock()
         mock_doc2.page_content = "Content of doc 2."
         
-        mock_vectorstore.similarity_search.return_value = [mock_doc1, mock_doc2]
+        mock_vectorstore.embeddings.embed_query.return_value = [0.1, 0.2]
+        mock_vectorstore.similarity_search_by_vector.return_value = [mock_doc1, mock_doc2]
 
         result = augment_prompt_with_rag("test query", mock_vectorstore)
         
         expected_context = "Content of doc 1.\n----------------\nContent of doc 2."
         self.assertEqual(result, expected_context)
-        mock_vectorstore.similarity_search.assert_called_once_with("test query", k=5)
+        mock_vectorstore.embeddings.embed_query.assert_called_once_with("test query")
+        mock_vectorstore.similarity_search_by_vector.assert_called_once_with([0.1, 0.2], k=5)
+
+    def test_augment_prompt_reuses_cached_query_embedding(self):
+        """Test that a repeated query is not embedded again."""
+        mock_vectorstore = MagicMock()
+        mock_vectorstore.embeddings.embed_query.return_value = [0.1, 0.2]
+        mock_vectorstore.similarity_search_by_vector.return_value = []
+
+        augment_prompt_with_rag("test query", mock_vectorstore)
+        augment_prompt_with_rag("test  query ", mock_vectorstore)
+
+        mock_vectorstore.embeddings.embed_query.assert_called_once()
+        self.assertEqual(mock_vectorstore.similarity_search_by_vector.call_count, 2)
+        self.assertEqual(self.embedding_cache.stats()["hits"], 1)
 
     def test_augment_prompt_with_no_results(self):
         """Test RAG augmentation when the vector store returns no results."""
         mock_vectorstore = MagicMock()
-        mock_vectorstore.similarity_search.return_value = []
+        mock_vectorstore.embeddings.embed_query.return_value = [0.1, 0.2]
+        mock_vectorstore.similarity_search_by_vector.return_value = []
 
         result = augment_prompt_with_rag("test query", mock_vectorstore)
         
         self.assertEqual(result, "There was no Local Context")
 
 
-    @patch('src.medical_assistant.agent.requests.post')
-    def test_serper_search_failure(self, mock_post):
+    @patch('src.medical_assistant.agent.get_serper_client')
+    def test_serper_search_failure(self, mock_get_client):
         """Test the serper_search function when the API call fails."""
-        mock_post.side_effect = requests.exceptions.RequestException("Network Error")
+        mock_get_client.return_value.search.side_effect = requests.exceptions.RequestException("Network Error")
 
         result = serper_search("flu symptoms", "fake_api_key")
 
-        self.assertEqual(result, "There was no Search Context due to an error.")
\ No newline at end of file
+        self.assertEqual(result, "There was no Search Context due to an error.")
+        self.assertIsNone(self.search_cache.get("flu symptoms"))
+
+    @patch('src.medical_assistant.agent.get_serper_client')
+    def test_serper_search_serves_repeats_from_cache(self, mock_get_client):
+        """Test that a repeated query is answered from the cache without a new request."""
+        mock_search = mock_get_client.return_value.search
+        mock_search.return_value = '{"organic": []}'
+
+        first = serper_search("How to treat a burn?", "fake_api_key")
+        second = serper_search("how to treat a burn", "fake_api_key")
+
+        self.assertEqual(first, second)
+        mock_search.assert_called_once_with("How to treat a burn?", "fake_api_key")
+        self.assertEqual(self.search_cache.stats()["hits"], 1)
+
+    @patch('src.medical_assistant.agent.serper_search')
+    @patch('src.medical_assistant.agent.retrieve_local_records')
+    def test_gather_context_runs_sources_concurrently(self, mock_retrieve, mock_serper):
+        """Test that both sources are fetched in parallel, so the wait is not their sum."""
+        both_started = threading.Barrier(2, timeout=2)
+
+        def slow_source(result):
+            def fetch(*args):
+                both_started.wait()
+                time.sleep(0.2)
+                return result
+            return fetch
+
+        mock_retrieve.side_effect = slow_source([ContextRecord("Local Knowledge Base", "", "local")])
+        mock_serper.side_effect = slow_source(SERPER_PAYLOAD)
+
+        started = time.monotonic()
+        local_context, search_context = gather_context("burn", MagicMock(), "fake_api_key")
+
+        self.assertEqual(local_context, "local")
+        self.assertIn("URL: https://www.nhs.uk/burns", search_context)
+        self.assertLess(time.monotonic() - started, 0.39)
+
+    @patch('src.medical_assistant.agent.serper_search')
+    @patch('src.medical_assistant.agent.retrieve_local_records')
+    def test_gather_context_degrades_on_search_timeout(self, mock_retrieve, mock_serper):
+        """Test that a slow search degrades to no search context instead of blocking."""
+        mock_retrieve.return_value = [ContextRecord("Local Knowledge Base", "", "local")]
+        release = threading.Event()
+        mock_serper.side_effect = lambda *args: release.wait(5) and "late search"
+
+        started = time.monotonic()
+        timings = {}
+        local_context, search_context = gather_context(
+            "burn", MagicMock(), "fake_api_key", local_timeout=1.0, search_timeout=0.1, timings=timings
+        )
+        release.set()
+
+        self.assertEqual(local_context, "local")
+        self.assertEqual(search_context, "There was no Search Context due to an error.")
+        self.assertLess(time.monotonic() - started, 1.0)
+        time.sleep(0.05)  # the late search finishes without touching the caller's timings
+        self.assertEqual(set(timings), {"local_retrieval"})
+
+    @patch('src.medical_assistant.agent.serper_search')
+    def test_search_tool_returns_compact_records(self, mock_serper):
+        """Test that the agent's search tool sees title/URL/snippet records, not raw JSON."""
+        mock_serper.return_value = SERPER_PAYLOAD
+
+        result = search_tool_results("burn")
+
+        self.assertEqual(result, (
+            "Title: Burns and scalds - NHS\nURL: https://www.nhs.uk/burns\n"
+            "Snippet: Cool the burn with cool or lukewarm running water for 20 minutes."
+        ))
+
+    @patch('src.medical_assistant.agent.serper_search')
+    @patch('src.medical_assistant.agent.retrieve_local_records')
+    def test_answer_query_prompts_with_local_and_search_context(self, mock_retrieve, mock_serper):
+        mock_retrieve.return_value = [ContextRecord(title="Local Knowledge Base", url="", text="Mocked local context.")]
+        mock_serper.return_value = json.dumps({"organic": [
+            {"title": "Mocked title", "link": "https://example.org", "snippet": "Mocked search context."}
+        ]})
+        mock_agent_executor = MagicMock()
+        mock_agent_executor.invoke.return_value = {"messages": [SimpleNamespace(content="This is the AI response.")]}
+        mock_vector_store = MagicMock()
+
+        result = answer_query(mock_agent_executor, mock_vector_store, "fake_api_key", "test query")
+
+        mock_retrieve.assert_called_once_with("test query", mock_vector_store)
+        mock_serper.assert_called_once_with("test query", "fake_api_key")
+        prompt = mock_agent_executor.invoke.call_args[0][0]["messages"][-1].content
+        self.assertIn("Mocked local context.", prompt)
+        self.assertIn("Mocked search context.", prompt)
+        self.assertIn("URL: https://example.org", prompt)
+        self.assertEqual(result.answer, "This is the AI response.")
+
+    @patch('src.medical_assistant.agent.gather_context')
+    def test_answer_query_serves_similar_question_from_cache(self, mock_gather):
+        mock_gather.return_value = ("local", "search")
+        mock_agent_executor = MagicMock()
+        mock_agent_executor.invoke.return_value = {"messages": [SimpleNamespace(content="Cool the burn.")]}
+        mock_vector_store = MagicMock()
+        mock_vector_store.embeddings.embed_query.side_effect = (
+            lambda query: [1.0, 0.0] if "burn" in query else [0.0, 1.0]
+        )
+        answer_cache = SemanticAnswerCache(0.95, 60, 10, kb_version_path="missing/kb_version")
+
+        results = [answer_query(mock_agent_executor, mock_vector_store, "key", query,
+                                answer_cache=answer_cache, embedding_cache=self.embedding_cache)
+                   for query in ["How to treat a burn?", "how do I treat a burn", "bee sting"]]
+
+        self.assertEqual(mock_agent_executor.invoke.call_count, 2)
+        self.assertEqual(mock_gather.call_count, 2)
+        self.assertEqual([result.cached for result in results], [False, True, False])
+        self.assertEqual(results[1].answer, "Cool the burn.")
+
+    @patch('src.medical_assistant.agent.gather_context')
+    def test_answer_query_streams_tokens(self, mock_gather):
+        mock_gather.return_value = ("local", "search")
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="Cool the burn")]))
+        agent_executor = create_react_agent(model=llm, tools=[])
+        partials = []
+
+        result = answer_query(agent_executor, MagicMock(), "key", "burn", on_text=partials.append)
+
+        self.assertEqual(partials, ["Cool", "Cool ", "Cool the", "Cool the ", "Cool the burn"])
+        self.assertEqual(result.answer, "Cool the burn")
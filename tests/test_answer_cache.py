@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.medical_assistant.answer_cache import SemanticAnswerCache
+from src.medical_assistant.indexing import bump_kb_version
+
+class TestSemanticAnswerCache(unittest.TestCase):
+    """Tests for the semantic answer cache."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.kb_version_path = os.path.join(self.temp_dir, "db", "kb_version")
+        self.cache = SemanticAnswerCache(0.95, ttl_seconds=60, max_entries=2, kb_version_path=self.kb_version_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_returns_answer_for_near_duplicate_query(self):
+        self.cache.store("treat a burn", [1.0, 0.0, 0.0], "Cool the burn.")
+
+        self.assertEqual(self.cache.lookup([0.99, 0.05, 0.0]), ("treat a burn", "Cool the burn."))
+        self.assertIsNone(self.cache.lookup([0.5, 0.5, 0.0]))
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_entries_expire(self):
+        with patch('src.medical_assistant.answer_cache.time.time', return_value=100.0):
+            self.cache.store("treat a burn", [1.0, 0.0], "Cool the burn.")
+        with patch('src.medical_assistant.answer_cache.time.time', return_value=161.0):
+            self.assertIsNone(self.cache.lookup([1.0, 0.0]))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_knowledge_base_change_invalidates_entries(self):
+        self.cache.store("treat a burn", [1.0, 0.0], "Cool the burn.")
+        bump_kb_version(self.kb_version_path)
+
+        self.assertIsNone(self.cache.lookup([1.0, 0.0]))
+
+    def test_oldest_entry_is_evicted(self):
+        self.cache.store("burn", [1.0, 0.0, 0.0], "a")
+        self.cache.store("sprain", [0.0, 1.0, 0.0], "b")
+        self.cache.store("choking", [0.0, 0.0, 1.0], "c")
+
+        self.assertIsNone(self.cache.lookup([1.0, 0.0, 0.0]))
+        self.assertEqual(self.cache.lookup([0.0, 0.0, 1.0])[1], "c")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+from src.medical_assistant.batch_query import RateLimiter, StubAgent, read_queries, run_batch, stub_search
+
+class TestBatchQuery(unittest.TestCase):
+    """Tests for the batch query CLI."""
+
+    def test_read_queries_from_text_and_jsonl(self):
+        with tempfile.TemporaryDirectory() as folder:
+            text_path, jsonl_path = os.path.join(folder, "q.txt"), os.path.join(folder, "q.jsonl")
+            with open(text_path, "w") as f:
+                f.write("# reference questions\nHow to treat a burn?\n\nBee sting\n")
+            with open(jsonl_path, "w") as f:
+                f.write('{"id": "burn-1", "query": "How to treat a burn?"}\n')
+
+            self.assertEqual(read_queries(text_path), [(2, "How to treat a burn?"), (4, "Bee sting")])
+            self.assertEqual(read_queries(jsonl_path), [("burn-1", "How to treat a burn?")])
+
+    def test_rate_limiter_spaces_out_calls(self):
+        limiter = RateLimiter(20)
+        started = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+    @patch('src.medical_assistant.agent.retrieve_local_records')
+    def test_run_batch_writes_answers_in_input_order(self, mock_retrieve):
+        mock_retrieve.side_effect = lambda query, vectorstore: (
+            time.sleep(0.05 if "burn" in query else 0),
+            [SimpleNamespace(title="Local Knowledge Base", url="", text=f"Local advice about {query}.")],
+        )[1]
+        output = io.StringIO()
+
+        summary = run_batch([(1, "burn"), (2, "sting")], output, StubAgent(), MagicMock(), "", workers=2,
+                            rate_per_second=0, search=stub_search)
+
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([record["id"] for record in records], [1, 2])
+        self.assertIn("**Condition**: burn", records[0]["answer"])
+        self.assertEqual(records[0]["local_context"], "Local advice about burn.")
+        self.assertEqual(records[1]["search_context"], "There was no Search Context")
+        self.assertEqual(set(records[0]["timings_ms"]), {"local_retrieval", "search", "retrieval", "llm", "total"})
+        self.assertEqual(summary["errors"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from src.medical_assistant.agent import local_source_title
+from src.medical_assistant.chunking import Chunk, TokenCounter, chunk_elements
+
+
+def word_counter() -> TokenCounter:
+    """A tokenizer with one token per word or punctuation mark, so sizes are easy to reason about."""
+    tokenizer = Tokenizer(WordLevel({"[UNK]": 0}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    return TokenCounter(tokenizer)
+
+
+class TestChunking(unittest.TestCase):
+    """Tests for token-aware chunking of partitioned documents."""
+
+    def setUp(self):
+        self.counter = word_counter()
+
+    def test_small_elements_are_merged(self):
+        elements = [("Burns", 1), ("Cool the burn", 1), ("- Remove jewellery", 1), ("3", 1), ("Cover it", 2)]
+
+        chunks = chunk_elements(elements, self.counter, chunk_tokens=50, overlap_tokens=5)
+
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0].text, "Burns\nCool the burn\n- Remove jewellery\n3\nCover it")
+        self.assertEqual(chunks[0].pages, [1, 2])
+
+    def test_large_elements_are_split_with_overlap(self):
+        sentences = [f"Sentence {i} has five words." for i in range(20)]  # six tokens each
+
+        chunks = chunk_elements([(" ".join(sentences), 4)], self.counter, chunk_tokens=30, overlap_tokens=6)
+
+        self.assertTrue(all(self.counter.count(chunk.text) <= 30 for chunk in chunks))
+        self.assertTrue(chunks[1].text.startswith(chunks[0].text.split("\n")[-1]))
+        self.assertEqual(len(chunks), 5)  # 120 tokens, 24 new tokens per chunk after the 6-token overlap
+        self.assertIn("Sentence 19", chunks[-1].text)
+
+    def test_overlong_sentences_are_cut_at_token_boundaries(self):
+        text = " ".join(f"word{i}" for i in range(70))
+
+        chunks = chunk_elements([(text, None)], self.counter, chunk_tokens=32, overlap_tokens=4)
+
+        self.assertEqual([self.counter.count(chunk.text) for chunk in chunks], [28, 32, 18])
+        self.assertTrue(chunks[1].text.startswith("word24 word25 word26 word27\nword28"))
+        self.assertEqual(chunks[0].pages, [])
+
+    def test_metadata_and_citation(self):
+        single, spanning = Chunk("a", pages=[3]).metadata("guide.pdf", 0), Chunk("b", pages=[3, 4]).metadata("guide.pdf", 1)
+
+        self.assertEqual(single, {"source": "guide.pdf", "chunk": 0, "page": 3})
+        self.assertEqual(local_source_title(spanning), "guide.pdf, p. 3-4")
+        self.assertEqual(local_source_title(Chunk("c").metadata("notes.txt", 0)), "notes.txt")
+
+    def test_estimate_without_tokenizer(self):
+        chunks = chunk_elements([("x" * 4000, None)], TokenCounter(), chunk_tokens=256, overlap_tokens=0)
+
+        self.assertEqual([len(chunk.text) for chunk in chunks], [1024, 1024, 1024, 928])
+
+if __name__ == '__main__':
+    unittest.main()
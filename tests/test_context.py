@@ -0,0 +1,57 @@
+import json
+import unittest
+
+from src.medical_assistant.context import (
+    ContextRecord, assemble_context, is_near_duplicate, parse_serper_results
+)
+
+SERPER_PAYLOAD = json.dumps({
+    "knowledgeGraph": {"title": "Burn", "description": "A burn is an injury to skin caused by heat.",
+                       "descriptionLink": "https://en.wikipedia.org/wiki/Burn"},
+    "organic": [
+        {"title": "Burns - NHS", "link": "https://www.nhs.uk/burns",
+         "snippet": "Cool the burn with cool running water for 20 minutes."},
+        {"title": "Burns - NHS (duplicate link)", "link": "https://www.nhs.uk/burns", "snippet": "Other text."},
+        {"title": "Burn first aid", "link": "https://example.org/burn",
+         "snippet": "Cool the burn with cool running water for 20 minutes!"},
+    ],
+    "peopleAlsoAsk": [{"question": "Should you put ice on a burn?", "link": "https://example.org/ice",
+                       "snippet": "No, ice can damage the skin further."}],
+    "relatedSearches": [{"query": "burn cream"}],
+})
+
+class TestContext(unittest.TestCase):
+    """Tests for compact context extraction."""
+
+    def test_parse_serper_results_keeps_citable_records(self):
+        records = parse_serper_results(SERPER_PAYLOAD)
+
+        self.assertEqual([r.url for r in records], [
+            "https://en.wikipedia.org/wiki/Burn",
+            "https://www.nhs.uk/burns",
+            "https://example.org/burn",
+            "https://example.org/ice",
+        ])
+        self.assertEqual(records[3].title, "Should you put ice on a burn?")
+
+    def test_parse_serper_results_ignores_non_json(self):
+        self.assertEqual(parse_serper_results("There was no Search Context due to an error."), [])
+
+    def test_assemble_context_drops_near_duplicates_and_respects_budget(self):
+        local = [ContextRecord("Local Knowledge Base", "", "Cool the burn with cool running water for 20 minutes.")]
+        search = parse_serper_results(SERPER_PAYLOAD)
+
+        local_selected, search_selected = assemble_context(local, search, token_budget=1000)
+        self.assertEqual(local_selected, local)
+        self.assertEqual([r.url for r in search_selected],
+                         ["https://en.wikipedia.org/wiki/Burn", "https://example.org/ice"])
+
+        _, search_selected = assemble_context([], search, token_budget=25)
+        self.assertEqual([r.url for r in search_selected], ["https://en.wikipedia.org/wiki/Burn"])
+
+    def test_is_near_duplicate(self):
+        self.assertTrue(is_near_duplicate("Apply firm pressure to the wound.", "apply firm pressure to the wound"))
+        self.assertFalse(is_near_duplicate("Apply firm pressure to the wound.", "Call emergency services now."))
+
+if __name__ == '__main__':
+    unittest.main()
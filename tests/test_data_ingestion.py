@@ -6,8 +6,9 @@ from unittest.mock import patch, MagicMock, ANY
 
 import pandas as pd
 
-from src.medical_assistant import data_ingestion
+from src.medical_assistant import data_ingestion, registry
 from src.medical_assistant.config import DATA_PATH, PERSIST_DIR, EMBEDDING_MODEL_NAME
+from src.medical_assistant.indexing import content_id
 
 class TestDataIngestion(unittest.TestCase):
     """Tests for the data_ingestion.ingest_main function."""
@@ -25,46 +26,101 @@ class TestDataIngestion(unittest.TestCase):
 
         self.mock_chroma = MagicMock()
         self.mock_hf = MagicMock()
-        self.p_chroma = patch('src.medical_assistant.data_ingestion.Chroma', self.mock_chroma)
-        self.p_hf = patch('src.medical_assistant.data_ingestion.HuggingFaceEmbeddings', self.mock_hf)
+        self.p_chroma = patch('langchain_chroma.Chroma', self.mock_chroma)
+        self.p_hf = patch('langchain_huggingface.HuggingFaceEmbeddings', self.mock_hf)
         self.p_chroma.start()
         self.p_hf.start()
+        registry.reset()
 
     def tearDown(self):
         shutil.rmtree(self.temp_dir)
         patch.stopall()
+        registry.reset()
 
     def test_ingest_creates_new_db(self):
         with patch('os.path.exists', return_value=False):
             mock_store = MagicMock()
-            self.mock_chroma.from_documents.return_value = mock_store
+            mock_store.get.return_value = {'ids': []}
+            self.mock_chroma.return_value = mock_store
 
             data_ingestion.ingest_main()
 
             self.mock_hf.assert_called_once_with(model_name=EMBEDDING_MODEL_NAME)
-            self.mock_chroma.from_documents.assert_called_once()
-            docs = self.mock_chroma.from_documents.call_args[1]['documents']
-            self.assertEqual(len(docs), 3)
-            self.assertTrue(all(hasattr(d, 'page_content') for d in docs))
+            self.mock_chroma.from_documents.assert_not_called()
+            mock_store.add_texts.assert_called_once()
+            kwargs = mock_store.add_texts.call_args[1]
+            self.assertEqual(kwargs['texts'], ['foo', 'bar'])
+            self.assertEqual(kwargs['ids'], [content_id('foo'), content_id('bar')])
 
     def test_ingest_adds_new_documents_to_existing_db(self):
         with patch('os.path.exists', return_value=True), patch('os.listdir', return_value=['chroma-xyz']):
             fake_db = MagicMock()
-            fake_db.similarity_search.side_effect = [
-                [MagicMock(page_content='foo')],
-                [],
-                [MagicMock(page_content='foo')]
-            ]
+            fake_db.get.return_value = {'ids': [content_id('foo')]}
             self.mock_chroma.return_value = fake_db
 
             data_ingestion.ingest_main()
 
             self.mock_chroma.assert_called_with(persist_directory=ANY, embedding_function=ANY)
-            self.assertEqual(fake_db.similarity_search.call_count, 3)
-            fake_db.add_documents.assert_called_once()
-            added = fake_db.add_documents.call_args[1]['documents']
-            self.assertEqual(len(added), 1)
-            self.assertEqual(added[0].page_content, 'bar')
+            fake_db.get.assert_called_once()
+            fake_db.similarity_search.assert_not_called()
+            fake_db.add_texts.assert_called_once()
+            kwargs = fake_db.add_texts.call_args[1]
+            self.assertEqual(kwargs['texts'], ['bar'])
+            self.assertEqual(kwargs['ids'], [content_id('bar')])
+
+    def test_ingest_writes_in_batches_and_resumes(self):
+        mock_store = MagicMock()
+        mock_store.get.return_value = {'ids': []}
+        mock_store.add_texts.side_effect = [None, RuntimeError("interrupted")]
+        self.mock_chroma.return_value = mock_store
+
+        with patch.object(data_ingestion, 'INGEST_BATCH_SIZE', 2):
+            df = pd.DataFrame({"Sentence": ["a", "b", "c", "d"]})
+            df.to_excel(self.excel_path, index=False)
+
+            data_ingestion.ingest_main()
+            self.assertEqual(mock_store.add_texts.call_count, 2)
+
+            mock_store.add_texts.reset_mock(side_effect=True)
+            data_ingestion.ingest_main()
+
+        mock_store.add_texts.assert_called_once()
+        self.assertEqual(mock_store.add_texts.call_args[1]['texts'], ['c', 'd'])
+
+    def test_ingest_reads_every_sheet_with_metadata(self):
+        mock_store = MagicMock()
+        mock_store.get.return_value = {'ids': []}
+        self.mock_chroma.return_value = mock_store
+        with pd.ExcelWriter(self.excel_path) as writer:
+            pd.DataFrame({"Topic": ["burns", None], "Sentence": ["Cool it.", "Cover it."]}).to_excel(
+                writer, sheet_name="Burns", index=False)
+            pd.DataFrame({"Note": ["no text column"]}).to_excel(writer, sheet_name="Notes", index=False)
+            pd.DataFrame({"Sentence": ["Apply pressure."], "Severity": [2]}).to_excel(
+                writer, sheet_name="Bleeding", index=False)
+
+        data_ingestion.ingest_main()
+
+        kwargs = mock_store.add_texts.call_args[1]
+        self.assertEqual(kwargs['texts'], ['Cool it.', 'Cover it.', 'Apply pressure.'])
+        self.assertEqual(kwargs['metadatas'], [
+            {"sheet": "Burns", "row": 2, "Topic": "burns"},
+            {"sheet": "Burns", "row": 3},
+            {"sheet": "Bleeding", "row": 2, "Severity": 2},
+        ])
+
+    def test_iter_rows_uses_configured_sheets_and_columns(self):
+        with pd.ExcelWriter(self.excel_path) as writer:
+            pd.DataFrame({"Question": ["Burn?"], "Answer": ["Cool it."], "Topic": ["burns"], "Owner": ["x"]}).to_excel(
+                writer, sheet_name="FAQ", index=False)
+            pd.DataFrame({"Question": ["Skipped?"]}).to_excel(writer, sheet_name="Drafts", index=False)
+
+        rows = list(data_ingestion.iter_rows(self.excel_path, sheets=("FAQ",), text_columns=("Question", "Answer"),
+                                             metadata_columns=("Topic",)))
+
+        metadata = {"sheet": "FAQ", "row": 2, "Topic": "burns"}
+        self.assertEqual(rows, [("FAQ!Question 2", "Burn?", metadata), ("FAQ!Answer 2", "Cool it.", metadata)])
+        with self.assertRaises(ValueError):
+            list(data_ingestion.iter_rows(self.excel_path, text_columns=("Sentence",)))
 
     def test_ingest_raises_file_not_found(self):
         with patch.object(data_ingestion, 'DATA_PATH', os.path.join(self.temp_dir, 'missing.xlsx')):
@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from src.medical_assistant.embedding_cache import QueryEmbeddingCache
+
+class TestQueryEmbeddingCache(unittest.TestCase):
+    """Tests for the query embedding LRU cache."""
+
+    def setUp(self):
+        self.model = MagicMock(model_name="med-embed")
+        self.model.embed_query.side_effect = lambda query: [float(len(query))]
+
+    def test_evicts_least_recently_used_query(self):
+        cache = QueryEmbeddingCache(max_size=2)
+        cache.embed_query("burn", self.model)
+        cache.embed_query("sprain", self.model)
+        cache.embed_query("burn", self.model)
+        cache.embed_query("choking", self.model)
+        cache.embed_query("sprain", self.model)
+
+        self.assertEqual(self.model.embed_query.call_count, 4)
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 4, "hit_rate": 0.2, "size": 2})
+
+    def test_vectors_are_scoped_to_the_model(self):
+        cache = QueryEmbeddingCache(max_size=10)
+        other_model = MagicMock(model_name="other")
+        other_model.embed_query.return_value = [9.0]
+
+        self.assertEqual(cache.embed_query("burn", self.model), [4.0])
+        self.assertEqual(cache.embed_query("burn", other_model), [9.0])
+
+    def test_persists_to_disk(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = os.path.join(temp_dir, "cache", "query_embeddings.json")
+
+        cache = QueryEmbeddingCache(max_size=10, persist_path=path)
+        cache.embed_query("burn", self.model)
+        cache.save()
+
+        reloaded = QueryEmbeddingCache(max_size=10, persist_path=path)
+        self.assertEqual(reloaded.embed_query("burn", self.model), [4.0])
+        self.model.embed_query.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
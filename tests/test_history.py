@@ -0,0 +1,50 @@
+import unittest
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.medical_assistant.history import ChatHistory, estimate_tokens, summarize_turns
+
+ANSWER = (
+    "**Triage**: This can likely be managed at home with caution.\n\n"
+    "**Condition**: Minor burn - damage to the top layer of skin.\n\n"
+    "**First-Aid Steps**:\n- Step 1: Cool the burn under running water for 20 minutes.\n"
+)
+
+class TestChatHistory(unittest.TestCase):
+    """Tests for the token-budgeted chat history."""
+
+    def test_messages_hold_real_queries_and_answers(self):
+        history = ChatHistory(token_budget=1000, summary_token_budget=100)
+        history.add_turn("How do I treat a burn?", ANSWER)
+
+        messages = history.messages()
+        self.assertEqual([type(m) for m in messages], [HumanMessage, AIMessage])
+        self.assertEqual(messages[0].content, "How do I treat a burn?")
+        self.assertEqual(messages[1].content, ANSWER)
+
+    def test_old_turns_are_compacted_into_summary(self):
+        history = ChatHistory(token_budget=150, summary_token_budget=1000)
+        for i in range(5):
+            history.add_turn(f"Question {i} about burns", ANSWER)
+
+        self.assertLessEqual(sum(estimate_tokens(q) + estimate_tokens(a) for q, a in history.turns), 150)
+        self.assertEqual(len(history.turns) + len(history.summary_lines), 5)
+        self.assertIn("Question 0 about burns", history.summary)
+        self.assertIn("Condition: Minor burn", history.summary)
+        self.assertTrue(history.messages()[0].content.startswith("Summary of our earlier conversation:"))
+
+    def test_prompt_size_stays_bounded(self):
+        history = ChatHistory(token_budget=200, summary_token_budget=60)
+        sizes = []
+        for i in range(50):
+            history.add_turn(f"Question {i}", ANSWER)
+            sizes.append(history.token_count())
+
+        self.assertLess(max(sizes[10:]), 200 + 60 + 10)
+
+    def test_summarize_turns_falls_back_to_answer_text(self):
+        lines = summarize_turns([("hi", "Hello, how can I help?")])
+        self.assertEqual(lines, ["- User asked: hi -> Hello, how can I help?"])
+
+if __name__ == '__main__':
+    unittest.main()
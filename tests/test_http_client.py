@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import requests
+
+from src.medical_assistant.http_client import AsyncSerperClient, SerperClient
+
+class StubSerperHandler(BaseHTTPRequestHandler):
+    """Local stand-in for google.serper.dev that fails the first N requests."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.requests.append((self.client_address[1], self.headers["X-API-KEY"], body))
+            failing = len(server.requests) <= server.failures
+        status, payload = (server.failure_status, b"busy") if failing else (200, b'{"organic": []}')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+class TestHttpClient(unittest.TestCase):
+    """Tests the pooled, retrying Serper clients against a local stub server."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubSerperHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.failures = 0
+        self.server.failure_status = 503
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/search"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retries_server_errors_and_reuses_connection(self):
+        self.server.failures = 2
+        client = SerperClient(url=self.url, max_retries=3, backoff_factor=0.01)
+
+        self.assertEqual(client.search("burn", "key"), '{"organic": []}')
+        self.assertEqual(client.search("sprain", "key"), '{"organic": []}')
+
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(len({port for port, _, _ in self.server.requests}), 1)
+        self.assertEqual(self.server.requests[0][1:], ("key", b'{"q": "burn"}'))
+        stats = client.latency.snapshot()
+        self.assertEqual((stats["requests"], stats["errors"]), (2, 0))
+        client.close()
+
+    def test_gives_up_after_max_retries(self):
+        self.server.failures = 10
+        self.server.failure_status = 429
+        client = SerperClient(url=self.url, max_retries=2, backoff_factor=0.01)
+
+        with self.assertRaises(requests.exceptions.RequestException):
+            client.search("burn", "key")
+
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(client.latency.snapshot()["errors"], 1)
+        client.close()
+
+    def test_async_client_retries_and_runs_concurrently(self):
+        self.server.failures = 1
+
+        async def run():
+            client = AsyncSerperClient(url=self.url, max_retries=2, backoff_factor=0.01)
+            try:
+                return await asyncio.gather(*(client.search(q, "key") for q in ["burn", "sprain", "choking"]))
+            finally:
+                await client.aclose()
+
+        self.assertEqual(asyncio.run(run()), ['{"organic": []}'] * 3)
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_async_client_raises_after_retries(self):
+        self.server.failures = 10
+
+        async def run():
+            client = AsyncSerperClient(url=self.url, max_retries=1, backoff_factor=0.01)
+            try:
+                await client.search("burn", "key")
+            finally:
+                await client.aclose()
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            asyncio.run(run())
+        self.assertEqual(len(self.server.requests), 2)
+
+if __name__ == '__main__':
+    unittest.main()
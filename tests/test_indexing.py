@@ -0,0 +1,49 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.medical_assistant.indexing import (
+    content_id,
+    filter_new_texts,
+    normalize_text,
+    read_ahead,
+    unique_by_content,
+)
+
+class TestIndexing(unittest.TestCase):
+    """Tests for the content-hash index helpers."""
+
+    def test_content_id_ignores_whitespace_differences(self):
+        self.assertEqual(normalize_text("  Apply   pressure\n to the wound "), "Apply pressure to the wound")
+        self.assertEqual(content_id("Apply pressure"), content_id("Apply  pressure\n"))
+        self.assertNotEqual(content_id("Apply pressure"), content_id("Apply ice"))
+
+    def test_unique_by_content_keeps_first_occurrence(self):
+        texts, ids = unique_by_content(["foo", "bar", "foo "])
+        self.assertEqual(texts, ["foo", "bar"])
+        self.assertEqual(ids, [content_id("foo"), content_id("bar")])
+
+    def test_filter_new_texts_uses_single_id_lookup(self):
+        mock_vectorstore = MagicMock()
+        mock_vectorstore.get.return_value = {"ids": [content_id("foo")]}
+
+        texts, ids = filter_new_texts(mock_vectorstore, ["foo", "bar", "bar"])
+
+        self.assertEqual(texts, ["bar"])
+        self.assertEqual(ids, [content_id("bar")])
+        mock_vectorstore.get.assert_called_once_with(ids=[content_id("foo"), content_id("bar")], include=[])
+        mock_vectorstore.similarity_search.assert_not_called()
+
+    def test_read_ahead_keeps_order_and_reraises_reader_errors(self):
+        def rows():
+            yield from range(10)
+            raise ValueError("bad workbook")
+
+        results = []
+        with self.assertRaises(ValueError):
+            for row in read_ahead(rows(), buffer_size=3):
+                results.append(row)
+        self.assertEqual(results, list(range(10)))
+        self.assertEqual(list(read_ahead(iter([]), buffer_size=1)), [])
+
+if __name__ == '__main__':
+    unittest.main()
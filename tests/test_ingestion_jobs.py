@@ -0,0 +1,154 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+from src.medical_assistant.chunking import Chunk
+from src.medical_assistant.ingestion_jobs import (
+    CANCELLED, DONE, RUNNING, IngestionJobQueue, IngestionJobStore, QueryPriorityGate
+)
+from src.medical_assistant.manifest import IngestionManifest
+
+
+def wait_for(queue: IngestionJobQueue, timeout: float = 5.0) -> list:
+    """Waits until no job is queued or running and returns the jobs."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        jobs = queue.jobs()
+        if all(job.status not in ("queued", "running") for job in jobs):
+            return jobs
+        time.sleep(0.01)
+    raise AssertionError(f"jobs did not finish: {queue.jobs()}")
+
+
+class TestIngestionJobs(unittest.TestCase):
+    """Tests for the persistent ingestion job queue."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.paths = []
+        for name in ("burns.txt", "bleeding.txt"):
+            path = os.path.join(self.temp_dir.name, name)
+            with open(path, "w") as f:
+                f.write(name)
+            self.paths.append(path)
+        self.store = MagicMock()
+        self.store.get.return_value = {"ids": []}
+        self.kb_version_path = os.path.join(self.temp_dir.name, "kb_version")
+        self.mocks = {}
+        for target, kwargs in [("partition_files", {"side_effect": lambda paths, workers: iter(
+                                   (path, [Chunk(f"{os.path.basename(path)} {i}") for i in range(5)], None)
+                                   for path in paths)}),
+                               ("bump_kb_version", {})]:
+            patcher = patch(f"src.medical_assistant.partitioning.{target}", **kwargs)
+            self.mocks[target] = patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def make_queue(self, job_store, **kwargs) -> IngestionJobQueue:
+        queue = IngestionJobQueue(self.store, job_store, kb_version_path=self.kb_version_path,
+                                  manifest=IngestionManifest(":memory:"), **kwargs)
+        self.addCleanup(queue.shutdown)
+        return queue
+
+    def test_jobs_run_concurrently_and_report_progress(self):
+        job_store = IngestionJobStore(":memory:")
+        updates = []
+        queue = self.make_queue(job_store, max_concurrent=2, on_update=updates.append)
+
+        submitted = queue.submit(self.paths)
+        jobs = wait_for(queue)
+
+        self.assertEqual([job.status for job in jobs], [DONE, DONE])
+        self.assertEqual([(job.files_done, job.partitioned, job.embedded, job.written) for job in jobs],
+                         [(1, 5, 5, 5), (1, 5, 5, 5)])
+        self.assertIn(RUNNING, [update.status for update in updates])
+        self.assertEqual([job.status for job in job_store.jobs()], [DONE, DONE])
+        self.assertEqual(len(submitted), 2)
+        self.assertEqual(queue.submit(self.paths[:1])[0].id, 3)  # finished paths can be queued again
+
+    def test_cancel_stops_a_running_job_before_it_writes(self):
+        queue = None
+
+        def cancel_once_partitioned(job):
+            if job.status == RUNNING and job.partitioned:
+                queue.cancel(job.id)
+
+        queue = self.make_queue(IngestionJobStore(":memory:"), on_update=cancel_once_partitioned)
+        queue.submit(self.paths[0])
+        jobs = wait_for(queue)
+
+        self.assertEqual(jobs[0].status, CANCELLED)
+        self.store.add_texts.assert_not_called()
+
+    def test_a_cancelled_queued_job_never_starts(self):
+        updates = []
+        gate = QueryPriorityGate(max_wait=5.0)
+        queue = self.make_queue(IngestionJobStore(":memory:"), max_concurrent=1, on_update=updates.append,
+                                gate=gate)
+        with gate.query():  # holds the first job between batches
+            first, second = queue.submit(self.paths)
+            self.assertTrue(queue.cancel(second.id))
+        jobs = wait_for(queue)
+
+        self.assertEqual([job.status for job in jobs], [DONE, CANCELLED])
+        self.assertNotIn((second.id, RUNNING), [(update.id, update.status) for update in updates])
+        self.assertFalse(queue.cancel(second.id))
+
+    def test_jobs_over_the_same_files_run_one_after_another(self):
+        partition = self.mocks["partition_files"].side_effect
+
+        def slow_partition(paths, workers):
+            time.sleep(0.05)
+            return partition(paths, workers)
+
+        self.mocks["partition_files"].side_effect = slow_partition
+        running, overlapped = set(), []
+
+        def track(job):
+            (running.add if job.status == RUNNING else running.discard)(job.id)
+            overlapped.append(len(running) > 1)
+
+        queue = self.make_queue(IngestionJobStore(":memory:"), max_concurrent=2, on_update=track)
+        queue.submit([self.temp_dir.name, self.paths[0]])
+        jobs = wait_for(queue)
+
+        self.assertEqual([job.status for job in jobs], [DONE, DONE])
+        self.assertFalse(any(overlapped))
+
+    def test_interrupted_jobs_resume_after_restart(self):
+        path = os.path.join(self.temp_dir.name, "db", "jobs.sqlite3")
+        job_store = IngestionJobStore(path)
+        interrupted = job_store.add(self.paths[0])
+        interrupted.status = RUNNING
+        job_store.save(interrupted)
+        job_store.close()
+
+        queue = self.make_queue(IngestionJobStore(path))
+        resumed = queue.resume()
+        jobs = wait_for(queue)
+
+        self.assertEqual(resumed[0].message, "interrupted, resuming")
+        self.assertEqual([(job.id, job.status) for job in jobs], [(interrupted.id, DONE)])
+        self.store.add_texts.assert_called_once()
+
+    def test_ingestion_waits_for_queries_in_flight(self):
+        gate = QueryPriorityGate(max_wait=5.0)
+        waited = []
+        with gate.query():
+            waiter = threading.Thread(target=lambda: waited.append(gate.wait_for_queries()))
+            waiter.start()
+            time.sleep(0.05)
+            self.assertEqual(waited, [])
+        waiter.join(timeout=1)
+
+        self.assertGreater(waited[0], 0)
+        self.assertEqual(gate.wait_for_queries(), 0.0)
+        impatient = QueryPriorityGate(max_wait=0.05)
+        with impatient.query():
+            self.assertLess(impatient.wait_for_queries(), 1.0)  # a long query does not stall ingestion
+
+if __name__ == '__main__':
+    unittest.main()
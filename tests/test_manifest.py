@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from src.medical_assistant import data_ingestion, partitioning
+from src.medical_assistant.chunking import Chunk
+from src.medical_assistant.indexing import content_id
+from src.medical_assistant.manifest import IngestionManifest
+
+
+class FakeVectorStore:
+    """Keeps texts by id and records what was embedded and deleted."""
+
+    def __init__(self):
+        self.texts = {}
+        self.embedded = []
+        self.deleted = []
+
+    def get(self, ids, include):
+        return {"ids": [text_id for text_id in ids if text_id in self.texts]}
+
+    def add_texts(self, texts, metadatas=None, ids=None):
+        self.embedded.extend(texts)
+        self.texts.update(zip(ids, texts))
+
+    def delete(self, ids):
+        self.deleted.extend(self.texts.pop(text_id) for text_id in ids)
+
+
+class TestIngestionManifest(unittest.TestCase):
+    """Tests for incremental ingestion with the manifest."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.excel_path = os.path.join(self.temp_dir, "kb.xlsx")
+        self.persist_dir = os.path.join(self.temp_dir, "db")
+        self.store = FakeVectorStore()
+        for target, value in [("get_embedding_model", None), ("get_vectorstore", self.store)]:
+            patcher = patch.object(data_ingestion, target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_rows(self, sentences):
+        pd.DataFrame({"Sentence": sentences}).to_excel(self.excel_path, index=False)
+        # Make sure the edit is visible even on filesystems with coarse mtimes.
+        os.utime(self.excel_path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+
+    def test_rerun_only_embeds_changes_and_deletes_stale_rows(self):
+        self.write_rows(["Cool the burn.", "Apply pressure.", "Call 911."])
+        data_ingestion.ingest_main(self.excel_path, self.persist_dir)
+        self.assertEqual(self.store.embedded, ["Cool the burn.", "Apply pressure.", "Call 911."])
+
+        self.store.embedded.clear()
+        data_ingestion.ingest_main(self.excel_path, self.persist_dir)
+        self.assertEqual(self.store.embedded, [])
+        self.assertEqual(data_ingestion.get_embedding_model.call_count, 1)  # unchanged file: model never loaded
+
+        self.write_rows(["Cool the burn.", "Apply firm pressure.", "Elevate the leg."])
+        data_ingestion.ingest_main(self.excel_path, self.persist_dir)
+        self.assertEqual(self.store.embedded, ["Apply firm pressure.", "Elevate the leg."])
+        self.assertEqual(sorted(self.store.deleted), ["Apply pressure.", "Call 911."])
+        self.assertEqual(sorted(self.store.texts.values()), ["Apply firm pressure.", "Cool the burn.", "Elevate the leg."])
+
+    def test_shared_vectors_are_kept_while_another_source_uses_them(self):
+        manifest = IngestionManifest(":memory:")
+        other = os.path.join(self.temp_dir, "other.txt")
+        for path in (self.excel_path, other):
+            with open(path, "w") as f:
+                f.write(path)
+        self.store.texts[content_id("Call 911.")] = "Call 911."
+        for source in (self.excel_path, other):
+            manifest.stage(source, [("row 2", content_id("Call 911."))])
+            manifest.commit_source(self.store, source)
+
+        manifest.stage(self.excel_path, [("row 2", content_id("Cool the burn."))])
+        self.assertEqual(manifest.commit_source(self.store, self.excel_path), 0)
+        self.assertEqual(manifest.remove_source(self.store, other), 1)
+        self.assertEqual(self.store.deleted, ["Call 911."])
+
+    @patch('src.medical_assistant.partitioning.bump_kb_version')
+    @patch('src.medical_assistant.partitioning.partition_files')
+    def test_uploads_skip_unchanged_files_and_forget_deleted_ones(self, mock_partition_files, mock_bump):
+        folder = os.path.join(self.temp_dir, "docs")
+        os.makedirs(folder)
+        burns, bleeding = os.path.join(folder, "burns.txt"), os.path.join(folder, "bleeding.txt")
+        for path in (burns, bleeding):
+            with open(path, "w") as f:
+                f.write(path)
+        manifest = IngestionManifest(":memory:")
+        mock_partition_files.side_effect = lambda paths, workers: iter(
+            (path, [Chunk(f"Guide: {os.path.basename(path)}")], None) for path in paths
+        )
+        partitioning.ingest_paths(self.store, [folder], "kb_version", max_workers=1, manifest=manifest)
+
+        os.remove(bleeding)
+        success, message = partitioning.ingest_paths(self.store, [folder], "kb_version", max_workers=1,
+                                                     manifest=manifest)
+
+        self.assertTrue(success)
+        self.assertEqual(mock_partition_files.call_args[0][0], [])
+        self.assertEqual(self.store.deleted, ["Guide: bleeding.txt"])
+        self.assertEqual(manifest.sources(folder), [burns])
+        self.assertIn("1 unchanged file(s) skipped", message)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from src.medical_assistant import registry
+from src.medical_assistant.embedding_benchmark import parity
+from src.medical_assistant.onnx_embeddings import OnnxEmbeddings, _sentence_transformers_config
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "burn": 2, "cool": 3, "water": 4, "cut": 5}
+
+
+def make_tokenizer():
+    tokenizer = Tokenizer(WordLevel(VOCAB, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+    return tokenizer
+
+
+class FakeSession:
+    """Stands in for an ONNX Runtime session: the hidden state of each token is [token_id, 1]."""
+
+    def __init__(self):
+        self.batches = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, output_names, feed):
+        self.last_feed = feed
+        self.batches.append(feed["input_ids"].shape[0])
+        ids = feed["input_ids"].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]
+
+
+class TestOnnxEmbeddings(unittest.TestCase):
+    """Tests for the ONNX Runtime embedding backend."""
+
+    def test_mean_pooling_ignores_padding_and_keeps_input_order(self):
+        session = FakeSession()
+        embeddings = OnnxEmbeddings(session, make_tokenizer(), "medembed@onnx", pooling="mean", batch_size=2)
+
+        vectors = embeddings.embed_documents(["cool water burn", "cut", "burn"])
+
+        self.assertEqual(vectors, [[3.0, 1.0], [5.0, 1.0], [2.0, 1.0]])
+        self.assertEqual(session.batches, [2, 1])
+        self.assertNotIn("token_type_ids", session.last_feed)
+
+    def test_cls_pooling_with_normalization(self):
+        embeddings = OnnxEmbeddings(FakeSession(), make_tokenizer(), "medembed@onnx", pooling="cls", normalize=True)
+
+        vector = embeddings.embed_query("water burn")
+
+        np.testing.assert_allclose(vector, np.array([4.0, 1.0]) / np.sqrt(17), rtol=1e-6)
+
+    def test_reads_sentence_transformers_pooling_config(self):
+        with tempfile.TemporaryDirectory() as model_path:
+            os.makedirs(os.path.join(model_path, "1_Pooling"))
+            with open(os.path.join(model_path, "modules.json"), "w") as f:
+                json.dump([{"path": "", "type": "sentence_transformers.models.Transformer"},
+                           {"path": "1_Pooling", "type": "sentence_transformers.models.Pooling"},
+                           {"path": "2_Normalize", "type": "sentence_transformers.models.Normalize"}], f)
+            with open(os.path.join(model_path, "1_Pooling", "config.json"), "w") as f:
+                json.dump({"pooling_mode_cls_token": True, "pooling_mode_mean_tokens": False}, f)
+            with open(os.path.join(model_path, "sentence_bert_config.json"), "w") as f:
+                json.dump({"max_seq_length": 256}, f)
+
+            config = _sentence_transformers_config(model_path)
+
+        self.assertEqual(config, {"pooling": "cls", "normalize": True, "max_length": 256})
+
+    def test_parity_of_identical_vectors_is_perfect(self):
+        rng = np.random.default_rng(0)
+        run = {"document_vectors": rng.normal(size=(20, 8)), "query_vectors": rng.normal(size=(4, 8))}
+        noisy = {key: value + rng.normal(scale=1e-4, size=value.shape) for key, value in run.items()}
+
+        result = parity(run, noisy, k=5)
+
+        self.assertGreater(result["min_cosine"], 0.999)
+        self.assertEqual(result["top5_agreement"], 1.0)
+
+
+class TestEmbeddingBackendSelection(unittest.TestCase):
+    """Tests for choosing the embedding backend in the registry."""
+
+    def test_onnx_backends_load_the_exported_model(self):
+        with patch('src.medical_assistant.onnx_embeddings.load_onnx_embeddings') as mock_load:
+            model = registry.create_embedding_model("onnx-int8")
+
+        self.assertIs(model, mock_load.return_value)
+        self.assertTrue(mock_load.call_args.kwargs["quantized"])
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            registry.create_embedding_model("tensorflow")
+
+if __name__ == '__main__':
+    unittest.main()
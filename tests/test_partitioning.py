@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+from src.medical_assistant import partitioning
+from src.medical_assistant.chunking import Chunk
+from src.medical_assistant.manifest import IngestionManifest
+
+class TestPartitioning(unittest.TestCase):
+    """Tests for multi-file document partitioning."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.temp_dir, "nested"))
+        for name in ["a.pdf", "b.TXT", "nested/c.md", "notes.xlsx"]:
+            with open(os.path.join(self.temp_dir, name), "w") as f:
+                f.write("content")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_collect_document_paths_expands_folders(self):
+        explicit = os.path.join(self.temp_dir, "notes.xlsx")
+        paths = partitioning.collect_document_paths([self.temp_dir, explicit])
+
+        expected = sorted([
+            os.path.join(self.temp_dir, "a.pdf"),
+            os.path.join(self.temp_dir, "b.TXT"),
+            os.path.join(self.temp_dir, "nested", "c.md"),
+            explicit,
+        ])
+        self.assertEqual(paths, expected)
+
+    @patch('src.medical_assistant.partitioning.partition_file')
+    def test_partition_files_reports_failures_per_file(self, mock_partition_file):
+        mock_partition_file.side_effect = [["text"], ValueError("bad file")]
+
+        results = list(partitioning.partition_files(["ok.txt", "bad.pdf"], max_workers=1))
+
+        self.assertEqual(results, [("ok.txt", ["text"], None), ("bad.pdf", [], "bad file")])
+
+    @patch('src.medical_assistant.partitioning.bump_kb_version')
+    @patch('src.medical_assistant.partitioning.partition_files')
+    def test_ingest_paths_writes_every_file_and_reports_failures(self, mock_partition_files, mock_bump):
+        a_pdf, b_pdf = os.path.join(self.temp_dir, "a.pdf"), os.path.join(self.temp_dir, "b.TXT")
+        mock_partition_files.return_value = iter([
+            (b_pdf, [Chunk("Cool the burn.", pages=[2])], None),
+            (a_pdf, [], "corrupt file"),
+        ])
+        mock_store = MagicMock()
+        mock_store.get.return_value = {"ids": []}
+        progress, failures = [], []
+
+        success, message = partitioning.ingest_paths(
+            mock_store, [a_pdf, b_pdf], os.path.join(self.temp_dir, "kb_version"),
+            progress_callback=lambda *args: progress.append(args),
+            failure_callback=lambda *args: failures.append(args),
+            manifest=IngestionManifest(":memory:"),
+        )
+
+        mock_store.add_texts.assert_called_once()
+        self.assertEqual(mock_store.add_texts.call_args[1]["texts"], ["Cool the burn."])
+        self.assertEqual(mock_store.add_texts.call_args[1]["metadatas"], [{"source": b_pdf, "chunk": 0, "page": 2}])
+        self.assertEqual(progress, [(b_pdf, 1, 2), (a_pdf, 2, 2)])
+        self.assertEqual(failures, [(a_pdf, "corrupt file")])
+        self.assertTrue(success)
+        self.assertIn("1 of 2 files failed", message)
+        mock_bump.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.medical_assistant.pipeline_benchmark import HashEmbeddings, compare, synthetic_queries
+from src.medical_assistant.startup_benchmark import PROJECT_ROOT
+
+class TestPipelineBenchmark(unittest.TestCase):
+    """Tests for the offline pipeline benchmark."""
+
+    def test_hash_embeddings_are_deterministic_and_similarity_preserving(self):
+        embeddings = HashEmbeddings(dimensions=64)
+        burn, burn_again, sting = (np.array(v) for v in embeddings.embed_documents(
+            ["cool the burn with water", "cool the burn with water", "remove the bee sting"]
+        ))
+
+        np.testing.assert_array_equal(burn, burn_again)
+        self.assertAlmostEqual(float(np.linalg.norm(burn)), 1.0, places=5)
+        self.assertGreater(burn @ np.array(embeddings.embed_query("how to cool a burn")), burn @ sting)
+
+    def test_compare_reports_relative_change(self):
+        lines = compare({"query": {"p50_ms": 90.0, "p95_ms": 120.0, "throughput": 11.0}},
+                        {"query": {"p50_ms": 100.0, "p95_ms": 100.0, "throughput": 10.0}, "old": {}})
+
+        self.assertEqual(len(lines), 1)
+        self.assertIn("p50_ms -10.0%", lines[0])
+        self.assertIn("throughput +10.0%", lines[0])
+
+    def test_retrieval_and_query_stages_run_offline(self):
+        with tempfile.TemporaryDirectory() as folder:
+            output = os.path.join(folder, "bench.json")
+            # A fresh interpreter, since other tests replace PySide6 with stand-ins.
+            subprocess.run([
+                sys.executable, "-m", "src.medical_assistant.pipeline_benchmark",
+                "--stages", "retrieval", "query", "--corpus-sizes", "50", "--k", "3", "--queries", "3",
+                "--llm-latency-ms", "0", "--search-latency-ms", "0", "--output", output,
+            ], cwd=PROJECT_ROOT, capture_output=True, check=True)
+            with open(output) as f:
+                report = json.load(f)
+
+        self.assertEqual(set(report["stages"]), {"retrieval[n=50,k=3]", "query"})
+        self.assertEqual(report["stages"]["query"]["samples"], 3)
+        self.assertGreater(report["stages"]["query"]["throughput"], 0)
+
+    def test_synthetic_queries_are_distinct(self):
+        self.assertEqual(len(set(synthetic_queries(100))), 100)
+
+if __name__ == '__main__':
+    unittest.main()
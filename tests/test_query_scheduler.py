@@ -0,0 +1,172 @@
+import asyncio
+import gc
+import threading
+import time
+import unittest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from langchain_core.messages import AIMessage
+from langgraph.prebuilt import create_react_agent
+
+from src.medical_assistant import agent
+
+from src.medical_assistant.answer_cache import SemanticAnswerCache
+from src.medical_assistant.embedding_cache import QueryEmbeddingCache
+from src.medical_assistant.history import ChatHistory
+from src.medical_assistant.query_scheduler import CANCELLED, DONE, TIMED_OUT, QueryScheduler
+from src.medical_assistant.service import MedicalAssistantService
+from tests.test_search_session import ToolCallingFakeChatModel, search_call, searching_agent
+
+
+class SlowAgent:
+    """Answers every question after a delay, recording the calls it started and finished."""
+
+    def __init__(self, delay: float = 0.1):
+        self.delay = delay
+        self.started = []
+        self.finished = []
+
+    async def ainvoke(self, state, config=None):
+        query = state["messages"][-1].content.split("\n")[0]
+        self.started.append((query, len(state["messages"]) - 1))
+        await asyncio.sleep(self.delay)
+        self.finished.append(query)
+        return {"messages": [AIMessage(content=f"answer {len(self.finished)}")]}
+
+
+class TestQueryScheduler(unittest.TestCase):
+    """Tests for the desktop client's query scheduler."""
+
+    def setUp(self):
+        for target, value in [('get_answer_cache', SemanticAnswerCache(0.95, 60, 10, "missing/kb_version")),
+                              ('get_query_embedding_cache', QueryEmbeddingCache(max_size=10))]:
+            patcher = patch(f'src.medical_assistant.service.{target}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch('src.medical_assistant.agent.gather_context_async', AsyncMock(return_value=("local", "web")))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('src.medical_assistant.agent.build_augmented_prompt', lambda query, local, web: query)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.vectorstore = MagicMock()
+        self.vectorstore.embeddings.embed_query.side_effect = (
+            lambda query: [1.0 if i == sum(map(ord, query)) % 16 else 0.0 for i in range(16)]
+        )
+        self.agent = SlowAgent()
+        self.finished = []
+        self.all_finished = threading.Event()
+
+    def make_scheduler(self, expected: int, serper_client=None, stream=False, **kwargs) -> QueryScheduler:
+        def on_finished(task):
+            self.finished.append(task)
+            if len(self.finished) == expected:
+                self.all_finished.set()
+
+        service = MedicalAssistantService(self.agent, self.vectorstore, "key", max_concurrent_queries=2,
+                                          serper_client=serper_client or MagicMock(aclose=AsyncMock()))
+        scheduler = QueryScheduler(None, None, "key", service=service, stream=stream, on_finished=on_finished,
+                                   **kwargs)
+        self.addCleanup(scheduler.shutdown)
+        return scheduler
+
+    def test_answers_are_delivered_in_order_with_history(self):
+        scheduler = self.make_scheduler(expected=3)
+        history = ChatHistory()
+
+        tasks = [scheduler.submit(query, history) for query in ("burn", "blister", "bee sting")]
+
+        self.assertTrue(self.all_finished.wait(5))
+        self.assertEqual([task.id for task in self.finished], [task.id for task in tasks])
+        self.assertEqual([task.answer for task in self.finished], ["answer 1", "answer 2", "answer 3"])
+        self.assertEqual(self.agent.started, [("burn", 0), ("blister", 2), ("bee sting", 4)])
+        self.assertEqual(len(history.turns), 3)
+
+    def test_conversations_run_concurrently_and_pending_queries_are_capped(self):
+        scheduler = self.make_scheduler(expected=2, max_pending=1)
+        gc.collect()  # so that collecting earlier tests' garbage does not land in the timed section
+
+        started = time.perf_counter()
+        first = scheduler.submit("burn", ChatHistory(), conversation_id="a")
+        refused = scheduler.submit("blister", ChatHistory(), conversation_id="a")
+        other = scheduler.submit("bee sting", ChatHistory(), conversation_id="b")
+
+        self.assertTrue(self.all_finished.wait(5))
+        self.assertIsNone(refused)
+        self.assertEqual({task.id for task in self.finished}, {first.id, other.id})
+        self.assertLess(time.perf_counter() - started, 0.18)  # two 0.1 s answers in parallel
+
+    def test_stop_aborts_the_call_in_flight(self):
+        self.agent.delay = 10
+        scheduler = self.make_scheduler(expected=2)
+        history = ChatHistory()
+        scheduler.submit("burn", history)
+        scheduler.submit("blister", history)
+        while not self.agent.started:
+            time.sleep(0.01)
+
+        self.assertEqual(scheduler.cancel(), 2)
+
+        self.assertTrue(self.all_finished.wait(1))
+        self.assertEqual([task.status for task in self.finished], [CANCELLED, CANCELLED])
+        time.sleep(0.05)
+        self.assertEqual(self.agent.finished, [])
+        self.assertEqual(len(self.agent.started), 1)
+        self.assertEqual(history.turns, [])
+        self.assertEqual(scheduler.pending(), 0)
+
+    def test_stop_aborts_a_tool_search_in_flight(self):
+        searching, search_cancelled = threading.Event(), threading.Event()
+
+        async def slow_search(query, api_key):
+            searching.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                search_cancelled.set()
+                raise
+
+        llm = ToolCallingFakeChatModel(messages=iter([search_call("bee sting swelling", "call-1"),
+                                                      AIMessage(content="Remove the sting.")]))
+        self.agent = create_react_agent(model=llm, tools=[agent.create_search_tool()])
+        client = MagicMock(aclose=AsyncMock(), search=slow_search)
+        scheduler = self.make_scheduler(expected=1, serper_client=client)
+
+        with patch('src.medical_assistant.agent.get_search_cache', return_value=MagicMock(get=lambda query: None)):
+            scheduler.submit("bee sting", ChatHistory())
+            self.assertTrue(searching.wait(5))
+            scheduler.cancel()
+
+            self.assertTrue(self.all_finished.wait(1))
+        self.assertEqual(self.finished[0].status, CANCELLED)
+        self.assertTrue(search_cancelled.wait(1))
+
+    def test_streamed_agent_out_of_steps_still_answers(self):
+        self.agent = searching_agent("Remove the sting.")
+        texts = []
+        client = MagicMock(aclose=AsyncMock(), search=AsyncMock(return_value="{}"))
+        scheduler = self.make_scheduler(expected=1, serper_client=client, stream=True,
+                                        on_text=lambda task, text: texts.append(text))
+        history = ChatHistory()
+
+        with patch('src.medical_assistant.agent.get_search_cache', return_value=MagicMock(get=lambda query: None)):
+            scheduler.submit("bee sting", history)
+            self.assertTrue(self.all_finished.wait(5))
+
+        self.assertEqual((self.finished[0].status, self.finished[0].answer), (DONE, "Remove the sting."))
+        self.assertEqual(texts[-1], "Remove the sting.")
+        self.assertEqual(len(history.turns), 1)
+
+    def test_slow_answers_time_out(self):
+        self.agent.delay = 10
+        scheduler = self.make_scheduler(expected=1, timeout=0.05)
+
+        scheduler.submit("burn", ChatHistory())
+
+        self.assertTrue(self.all_finished.wait(2))
+        self.assertEqual(self.finished[0].status, TIMED_OUT)
+        self.assertIn("within 0.05 seconds", self.finished[0].error)
+
+if __name__ == '__main__':
+    unittest.main()
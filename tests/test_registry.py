@@ -0,0 +1,50 @@
+import unittest
+from unittest.mock import patch
+
+from src.medical_assistant import registry
+
+class TestRegistry(unittest.TestCase):
+    """Tests for the process-wide model and vector store registry."""
+
+    def setUp(self):
+        registry.reset()
+        self.mock_hf = patch('langchain_huggingface.HuggingFaceEmbeddings').start()
+        self.mock_chroma = patch('langchain_chroma.Chroma').start()
+
+    def tearDown(self):
+        patch.stopall()
+        registry.reset()
+
+    def test_components_are_loaded_once_and_shared(self):
+        first = registry.get_vectorstore("db")
+        second = registry.get_vectorstore("db")
+
+        self.assertIs(first, second)
+        self.mock_hf.assert_called_once()
+        self.mock_chroma.assert_called_once_with(persist_directory="db", embedding_function=self.mock_hf.return_value)
+        self.assertEqual(set(registry.report()["components"]), {"embedding model", "vector store"})
+
+    def test_warm_up_embeds_a_query_and_reports(self):
+        report = registry.warm_up("db")
+
+        self.mock_chroma.return_value.embeddings.embed_query.assert_called_once()
+        self.assertIn("warm-up query", report["components"])
+        self.assertGreater(report["rss_mb"], 0)
+
+    def test_warm_up_reports_only_what_it_loaded(self):
+        registry.warm_up("db")
+        report = registry.warm_up("db")
+
+        self.assertEqual(set(report["components"]), {"warm-up query"})
+        self.assertEqual(set(registry.report()["components"]), {"embedding model", "vector store", "warm-up query"})
+
+    def test_discard_vectorstore_reopens_on_next_use(self):
+        registry.get_vectorstore("db")
+        registry.discard_vectorstore("db")
+        registry.get_vectorstore("db")
+
+        self.assertEqual(self.mock_chroma.call_count, 2)
+        self.mock_hf.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
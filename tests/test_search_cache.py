@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.medical_assistant.search_cache import SearchCache, normalize_query
+
+class TestSearchCache(unittest.TestCase):
+    """Tests for the persistent Serper result cache."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "cache", "serper.sqlite3")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_normalize_query_collapses_rephrasings(self):
+        self.assertEqual(normalize_query("How to treat a burn?"), normalize_query("how do I treat  a BURN"))
+        self.assertNotEqual(normalize_query("treat a burn"), normalize_query("treat a bee sting"))
+
+    def test_entries_persist_and_count_hits(self):
+        cache = SearchCache(self.path, ttl_seconds=60, max_entries=10)
+        self.assertIsNone(cache.get("burn first aid"))
+        cache.put("burn first aid", '{"organic": []}')
+
+        reopened = SearchCache(self.path, ttl_seconds=60, max_entries=10)
+        self.assertEqual(reopened.get("Burn first aid!"), '{"organic": []}')
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(reopened.stats()["hits"], 1)
+
+    def test_expired_entries_are_dropped(self):
+        cache = SearchCache(self.path, ttl_seconds=60, max_entries=10)
+        with patch('src.medical_assistant.search_cache.time.time', return_value=1000.0):
+            cache.put("nosebleed", "result")
+        with patch('src.medical_assistant.search_cache.time.time', return_value=1061.0):
+            self.assertIsNone(cache.get("nosebleed"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = SearchCache(self.path, ttl_seconds=float("inf"), max_entries=2)
+        with patch('src.medical_assistant.search_cache.time.time', side_effect=[1.0, 2.0, 3.0, 4.0]):
+            cache.put("burn", "1")
+            cache.put("sprain", "2")
+            cache.get("burn")
+            cache.put("choking", "3")
+
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertIsNone(cache.get("sprain"))
+        self.assertEqual(cache.get("burn"), "1")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import itertools
+import json
+import unittest
+from unittest.mock import patch, MagicMock
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from langgraph.prebuilt import create_react_agent
+
+from src.medical_assistant import agent
+from src.medical_assistant.answer_cache import SemanticAnswerCache
+from src.medical_assistant.embedding_cache import QueryEmbeddingCache
+from src.medical_assistant.search_session import SearchSession, current_search_session, search_session
+
+SERPER_PAYLOAD = json.dumps({"organic": [
+    {"title": "Burns - NHS", "link": "https://www.nhs.uk/burns", "snippet": "Cool the burn for 20 minutes."},
+]})
+
+
+class ToolCallingFakeChatModel(GenericFakeChatModel):
+    """Replays scripted messages, including tool calls, to a ReAct agent, streamed or not."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = next(self.messages)
+        if not message.tool_calls:
+            self.messages = itertools.chain([message], self.messages)
+            yield from super()._stream(messages, stop, run_manager, **kwargs)
+            return
+        chunk = ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+            {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+            for index, call in enumerate(message.tool_calls)
+        ]))
+        if run_manager:
+            run_manager.on_llm_new_token("", chunk=chunk)
+        yield chunk
+
+
+def search_call(query: str, call_id: str) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"name": "google-serper", "args": {"__arg1": query}, "id": call_id}])
+
+
+def searching_agent(answer: str = None):
+    """An agent that asks for a search on every step it is given, then answers with answer, if any."""
+    steps = agent.agent_config()["recursion_limit"] // 2
+    script = [search_call(f"burn question {i}", f"call-{i}") for i in range(steps)]
+    llm = ToolCallingFakeChatModel(messages=iter(script + [AIMessage(content=answer)] if answer else script * 2))
+    return create_react_agent(model=llm, tools=[agent.create_search_tool()])
+
+
+class TestSearchSession(unittest.TestCase):
+    """Tests for request-scoped search deduplication."""
+
+    def test_near_duplicate_searches_are_found(self):
+        session = SearchSession(max_tool_searches=2, similarity=0.75)
+        session.add("How do I treat a minor burn?")
+
+        self.assertEqual(session.find("first aid for minor burns"), "How do I treat a minor burn?")
+        self.assertEqual(session.find("Minor burn treatment steps"), "How do I treat a minor burn?")
+        self.assertIsNone(session.find("minor burn blister"))
+        self.assertIsNone(session.find("chemical burn in the eye"))
+
+    def test_tool_searches_are_capped(self):
+        session = SearchSession(max_tool_searches=1, similarity=0.75)
+
+        self.assertEqual(session.start_tool_search("bee sting"), ("search", None))
+        session.add("bee sting")
+        self.assertEqual(session.start_tool_search("bee sting first aid"), ("deduplicated", "bee sting"))
+        self.assertEqual(session.start_tool_search("anaphylaxis signs"), ("capped", None))
+        self.assertEqual((session.tool_searches, session.deduplicated, session.capped), (1, 1, 1))
+
+    def test_session_is_scoped_to_the_block(self):
+        with search_session() as session:
+            self.assertIs(current_search_session(), session)
+        self.assertIsNone(current_search_session())
+
+    @patch('src.medical_assistant.agent.retrieve_local_records', return_value=[])
+    @patch('src.medical_assistant.agent.serper_search', return_value=SERPER_PAYLOAD)
+    def test_agent_does_not_repeat_the_prefetch_search(self, mock_serper, mock_retrieve):
+        llm = ToolCallingFakeChatModel(messages=iter([
+            search_call("minor burn first aid", "call-1"),
+            search_call("minor burn blister", "call-2"),
+            AIMessage(content="Cool the burn under running water."),
+        ]))
+        agent_executor = create_react_agent(model=llm, tools=[agent.create_search_tool()])
+
+        result = agent.answer_query(agent_executor, MagicMock(), "key", "How do I treat a minor burn?")
+
+        self.assertEqual(result.answer, "Cool the burn under running water.")
+        self.assertEqual([call.args[0] for call in mock_serper.call_args_list],
+                         ["How do I treat a minor burn?", "minor burn blister"])
+
+    @patch('src.medical_assistant.agent.retrieve_local_records', return_value=[])
+    @patch('src.medical_assistant.agent.serper_search', return_value=SERPER_PAYLOAD)
+    def test_deduplicated_and_refused_searches_fit_the_step_budget(self, mock_serper, mock_retrieve):
+        llm = ToolCallingFakeChatModel(messages=iter([
+            search_call("minor burn first aid", "call-1"),
+            search_call("minor burn blister", "call-2"),
+            search_call("burn infection signs", "call-3"),
+            search_call("when to see a doctor for a burn", "call-4"),
+            AIMessage(content="Cool the burn under running water."),
+        ]))
+        agent_executor = create_react_agent(model=llm, tools=[agent.create_search_tool()])
+
+        result = agent.answer_query(agent_executor, MagicMock(), "key", "How do I treat a minor burn?")
+
+        self.assertEqual(result.answer, "Cool the burn under running water.")
+        self.assertEqual(mock_serper.call_count, 3)  # the prefetch and two tool searches
+
+    def answer_cache(self):
+        vectorstore = MagicMock()
+        vectorstore.embeddings.embed_query.return_value = [1.0, 0.0]
+        return vectorstore, SemanticAnswerCache(0.95, 60, 10, kb_version_path="missing/kb_version")
+
+    @patch('src.medical_assistant.agent.retrieve_local_records', return_value=[])
+    @patch('src.medical_assistant.agent.serper_search', return_value=SERPER_PAYLOAD)
+    def test_agent_out_of_steps_answers_without_searching(self, mock_serper, mock_retrieve):
+        vectorstore, answer_cache = self.answer_cache()
+
+        result = agent.answer_query(searching_agent("Cool the burn under running water."), vectorstore, "key",
+                                    "How do I treat a minor burn?", answer_cache=answer_cache,
+                                    embedding_cache=QueryEmbeddingCache(max_size=10))
+
+        self.assertEqual(result.answer, "Cool the burn under running water.")
+        self.assertEqual(mock_serper.call_count, 3)
+        self.assertEqual(answer_cache.lookup([1.0, 0.0]),
+                         ("How do I treat a minor burn?", "Cool the burn under running water."))
+
+    @patch('src.medical_assistant.agent.retrieve_local_records', return_value=[])
+    @patch('src.medical_assistant.agent.serper_search', return_value=SERPER_PAYLOAD)
+    def test_agent_out_of_steps_streams_its_answer(self, mock_serper, mock_retrieve):
+        partials = []
+
+        result = agent.answer_query(searching_agent("Cool the burn."), MagicMock(), "key",
+                                    "How do I treat a minor burn?", on_text=partials.append)
+
+        self.assertEqual(result.answer, "Cool the burn.")
+        self.assertEqual(partials[-1], "Cool the burn.")
+
+    @patch('src.medical_assistant.agent.retrieve_local_records', return_value=[])
+    @patch('src.medical_assistant.agent.serper_search', return_value=SERPER_PAYLOAD)
+    def test_agent_that_never_answers_fails_and_caches_nothing(self, mock_serper, mock_retrieve):
+        vectorstore, answer_cache = self.answer_cache()
+
+        for on_text in (None, MagicMock()):
+            with self.assertRaises(agent.AgentStepsExhausted):
+                agent.answer_query(searching_agent(), vectorstore, "key", "How do I treat a minor burn?",
+                                   answer_cache=answer_cache, embedding_cache=QueryEmbeddingCache(max_size=10),
+                                   on_text=on_text)
+
+        self.assertIsNone(answer_cache.lookup([1.0, 0.0]))
+
+    @patch('src.medical_assistant.agent.serper_search', return_value=SERPER_PAYLOAD)
+    def test_tool_refuses_searches_beyond_the_cap(self, mock_serper):
+        with search_session(max_tool_searches=1):
+            first = agent.search_tool_results("bee sting")
+            second = agent.search_tool_results("anaphylaxis signs")
+
+        self.assertIn("Burns - NHS", first)
+        self.assertEqual(second, agent.SEARCH_LIMIT_REACHED)
+        self.assertEqual(mock_serper.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
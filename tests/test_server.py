@@ -0,0 +1,170 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from aiohttp.test_utils import AioHTTPTestCase
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.prebuilt import create_react_agent
+
+from src.medical_assistant.answer_cache import SemanticAnswerCache
+from src.medical_assistant.embedding_cache import QueryEmbeddingCache
+from src.medical_assistant.server import create_app
+from src.medical_assistant.service import MedicalAssistantService, SessionStore
+
+class FakeAgent:
+    """Answers with a fixed text and records the messages it was sent."""
+
+    def __init__(self, answer="Cool the burn under running water."):
+        self.answer = answer
+        self.calls = []
+
+    async def ainvoke(self, state, config=None):
+        self.calls.append(state["messages"])
+        return {"messages": [AIMessage(content=self.answer)]}
+
+
+async def slow_search(query, api_key, client):
+    await asyncio.sleep(0.3)
+    return json.dumps({"organic": [{"title": "Burns", "link": "https://example.org", "snippet": "Cool it."}]})
+
+
+class TestServer(AioHTTPTestCase):
+    """Tests for the headless HTTP server."""
+
+    async def get_application(self):
+        self.answer_cache = SemanticAnswerCache(0.95, 60, 10, kb_version_path="missing/kb_version")
+        self.embedding_cache = QueryEmbeddingCache(max_size=10)
+        for target, value in [('get_answer_cache', self.answer_cache),
+                              ('get_query_embedding_cache', self.embedding_cache)]:
+            patcher = patch(f'src.medical_assistant.service.{target}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for target, value in [('retrieve_local_records', MagicMock(return_value=[])),
+                              ('serper_search_async', slow_search)]:
+            patcher = patch(f'src.medical_assistant.agent.{target}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.vectorstore = MagicMock()
+        self.vectorstore.embeddings.embed_query.side_effect = (
+            lambda query: [1.0 if i == sum(map(ord, query)) % 16 else 0.0 for i in range(16)]
+        )
+        self.agent = FakeAgent()
+        self.ingest_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.ingest_root.cleanup)
+        self.service = MedicalAssistantService(self.agent, self.vectorstore, "key", max_concurrent_queries=4,
+                                               serper_client=MagicMock(aclose=AsyncMock()),
+                                               ingest_root=self.ingest_root.name)
+        return create_app(self.service)
+
+    async def test_query_keeps_history_per_session(self):
+        first = await (await self.client.post("/query", json={"query": "How do I treat a burn?"})).json()
+        second = await (await self.client.post(
+            "/query", json={"query": "And a blister?", "session_id": first["session_id"]}
+        )).json()
+
+        self.assertEqual(first["answer"], "Cool the burn under running water.")
+        self.assertFalse(first["cached"])
+        self.assertIn("educational purposes only", first["disclaimer"])
+        self.assertEqual(second["session_id"], first["session_id"])
+        history = [message.content for message in self.agent.calls[1][:-1]]
+        self.assertEqual(history, ["How do I treat a burn?", "Cool the burn under running water."])
+        self.assertIn("URL: https://example.org", self.agent.calls[1][-1].content)
+
+    async def test_follow_ups_are_not_answered_from_the_cache(self):
+        first = await (await self.client.post("/query", json={"query": "What about for children?"})).json()
+        other = await (await self.client.post("/query", json={"query": "How do I treat a bee sting?"})).json()
+        follow_up = await (await self.client.post(
+            "/query", json={"query": "What about for children?", "session_id": other["session_id"]}
+        )).json()
+        repeat = await (await self.client.post("/query", json={"query": "What about for children?"})).json()
+
+        self.assertFalse(first["cached"])
+        self.assertFalse(follow_up["cached"])
+        self.assertTrue(repeat["cached"])
+        self.assertEqual(len(self.agent.calls), 3)
+
+    async def test_concurrent_queries_overlap_their_io(self):
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[
+            self.client.post("/query", json={"query": f"question number {i}"}) for i in range(4)
+        ])
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual([response.status for response in responses], [200] * 4)
+        self.assertLess(elapsed, 0.9)  # four 0.3 s searches would take 1.2 s one after another
+
+    async def test_streaming_query_sends_tokens_then_done(self):
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="Cool the burn")]))
+        self.service.agent_executor = create_react_agent(model=llm, tools=[])
+
+        response = await self.client.post("/query", json={"query": "burn", "stream": True})
+        body = await response.text()
+
+        events = [(block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+                  for block in body.strip().split("\n\n")]
+        self.assertEqual(response.headers["Content-Type"], "text/event-stream")
+        self.assertEqual("".join(data["text"] for event, data in events if event == "token"), "Cool the burn")
+        self.assertEqual(events[-1][0], "done")
+        self.assertEqual(events[-1][1]["answer"], "Cool the burn")
+
+    async def test_invalid_query_is_rejected(self):
+        response = await self.client.post("/query", json={"query": "  "})
+        self.assertEqual(response.status, 400)
+
+    async def test_ingest_and_health(self):
+        with patch('src.medical_assistant.service.ingest_paths', return_value=(True, "Added 3 new sections.")) as mock_ingest, \
+                patch('src.medical_assistant.service.get_manifest'):
+            response = await self.client.post("/ingest", json={"paths": ["docs"]})
+            result = await response.json()
+
+        self.assertEqual(result, {"success": True, "message": "Added 3 new sections.", "failed": []})
+        self.assertIs(mock_ingest.call_args[0][0], self.vectorstore)
+        self.assertEqual(mock_ingest.call_args[0][1], [os.path.join(os.path.realpath(self.ingest_root.name), "docs")])
+        self.service.serper_client.latency.snapshot.return_value = {"requests": 0}
+        health = await (await self.client.get("/health")).json()
+        self.assertEqual(health["status"], "ok")
+        self.assertEqual(health["in_flight"], 0)
+
+    async def test_ingest_rejects_paths_outside_the_ingest_root(self):
+        outside = os.path.dirname(os.path.realpath(self.ingest_root.name))
+        with patch('src.medical_assistant.service.ingest_paths') as mock_ingest:
+            responses = [await self.client.post("/ingest", json={"paths": paths})
+                         for paths in (["/etc/passwd"], ["../secrets"], ["docs", outside])]
+
+        self.assertEqual([response.status for response in responses], [403, 403, 403])
+        self.assertEqual((await responses[2].json())["rejected"], [outside])
+        mock_ingest.assert_not_called()
+
+    async def test_metrics_are_exported_in_prometheus_format(self):
+        await self.client.post("/query", json={"query": "How to treat a burn?"})
+        response = await self.client.get("/metrics")
+        text = await response.text()
+
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        self.assertIn('medical_assistant_span_duration_seconds_count{span="llm"}', text)
+        self.assertIn('medical_assistant_cache_lookups_total{cache="answer",result="miss"}', text)
+
+
+class TestSessionStore(unittest.TestCase):
+    """Tests for chat session bookkeeping."""
+
+    def test_least_recently_used_sessions_are_dropped(self):
+        sessions = SessionStore(max_sessions=2, ttl_seconds=60)
+        first_id, _ = sessions.get()
+        second_id, _ = sessions.get()
+        sessions.get(first_id)
+        sessions.get()
+
+        self.assertEqual(len(sessions), 2)
+        self.assertIn(first_id, sessions._sessions)
+        self.assertNotIn(second_id, sessions._sessions)
+
+if __name__ == '__main__':
+    unittest.main()
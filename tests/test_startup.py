@@ -0,0 +1,22 @@
+import unittest
+
+from src.medical_assistant.startup_benchmark import measure_import, parse_importtime
+
+class TestStartup(unittest.TestCase):
+    """Guards against heavy packages creeping back into the GUI's import path."""
+
+    def test_gui_import_does_not_load_heavy_packages(self):
+        result = measure_import("src.medical_assistant.ui", runs=1)
+        self.assertEqual(result["heavy_loaded"], [])
+
+    def test_parse_importtime_groups_by_top_level_package(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |   numpy.core\n"
+            "import time:        50 |        150 | numpy\n"
+            "import time:        30 |        30 | src.medical_assistant.ui\n"
+        )
+        self.assertEqual(parse_importtime(stderr), {"numpy": 150, "src": 30})
+
+if __name__ == '__main__':
+    unittest.main()
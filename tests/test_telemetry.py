@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+from langchain_core.messages import AIMessage
+
+from src.medical_assistant import agent
+from src.medical_assistant.telemetry import Telemetry
+
+class TestTelemetry(unittest.TestCase):
+    """Tests for the tracing spans and metrics."""
+
+    def test_nested_spans_share_a_trace(self):
+        telemetry = Telemetry()
+        with telemetry.span("query") as root:
+            with telemetry.span("retrieval", k=5) as child:
+                child.count("results", 3)
+
+        spans = {span["name"]: span for span in telemetry.recent_spans()}
+        self.assertEqual(spans["retrieval"]["trace_id"], root.trace_id)
+        self.assertEqual(spans["retrieval"]["parent_id"], root.span_id)
+        self.assertIsNone(spans["query"]["parent_id"])
+        self.assertEqual(spans["retrieval"]["attributes"], {"k": 5})
+        self.assertEqual(telemetry.summary()["counters"], {'results{span="retrieval"}': 3})
+
+    def test_exceptions_are_recorded_and_reraised(self):
+        telemetry = Telemetry()
+        with self.assertRaises(ValueError):
+            with telemetry.span("llm"):
+                raise ValueError("quota exceeded")
+
+        self.assertEqual(telemetry.summary()["spans"]["llm"]["errors"], 1)
+        self.assertEqual(telemetry.recent_spans()[0]["error"], "ValueError: quota exceeded")
+
+    def test_prometheus_text_and_json_log(self):
+        with tempfile.TemporaryDirectory() as folder:
+            log_path = os.path.join(folder, "logs", "spans.jsonl")
+            telemetry = Telemetry(log_path=log_path)
+            with telemetry.span("search.serper"):
+                pass
+            telemetry.increment("cache_lookups", cache="search", result="hit")
+            text = telemetry.prometheus_text()
+            with open(log_path) as f:
+                logged = [json.loads(line) for line in f]
+
+        self.assertIn('medical_assistant_span_duration_seconds_bucket{le="+Inf",span="search.serper"} 1', text)
+        self.assertIn('medical_assistant_span_duration_seconds_count{span="search.serper"} 1', text)
+        self.assertIn('medical_assistant_cache_lookups_total{cache="search",result="hit"} 1', text)
+        self.assertEqual([span["name"] for span in logged], ["search.serper"])
+
+    @patch('src.medical_assistant.agent.serper_search', return_value='{"organic": []}')
+    @patch('src.medical_assistant.agent.retrieve_local_records', return_value=[])
+    def test_answer_query_traces_each_stage(self, mock_retrieve, mock_serper):
+        telemetry = Telemetry()
+        agent_executor = MagicMock()
+        agent_executor.invoke.side_effect = lambda state, config: {"messages": [*state["messages"], AIMessage(
+            content="Cool the burn.", usage_metadata={"input_tokens": 120, "output_tokens": 8, "total_tokens": 128}
+        )]}
+
+        with patch('src.medical_assistant.telemetry._telemetry', telemetry):
+            agent.answer_query(agent_executor, MagicMock(), "key", "How to treat a burn?")
+
+        spans = telemetry.recent_spans()
+        root = next(span for span in spans if span["name"] == "query")
+        self.assertEqual({span["name"] for span in spans}, {"query", "retrieval", "llm"})
+        self.assertTrue(all(span["trace_id"] == root["trace_id"] for span in spans))
+        self.assertEqual(next(span for span in spans if span["name"] == "llm")["counts"],
+                         {"input_tokens": 120, "output_tokens": 8})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication, QStyleOptionViewItem
+
+from src.medical_assistant.transcript import ChatTranscriptModel, ChatTranscriptView
+
+app = QApplication.instance() or QApplication([])
+
+LONG_ANSWER = "**Triage**: Non-urgent.\n\n" + "Cool the burn under cool running water for 20 minutes. " * 20
+
+
+class TestTranscript(unittest.TestCase):
+    """Tests for the model/view chat transcript."""
+
+    def setUp(self):
+        self.view = ChatTranscriptView()
+        self.view.resize(800, 600)
+        self.view.show()
+        app.processEvents()
+        self.addCleanup(self.view.deleteLater)
+
+    def row_height(self, row: int) -> int:
+        return self.view.delegate.sizeHint(QStyleOptionViewItem(), self.view.transcript.index(row)).height()
+
+    def test_messages_are_added_and_updated_in_place(self):
+        first = self.view.add_message("You", "How do I treat a burn?")
+        answer = self.view.add_message("Assistant", "Cool", is_ai=True)
+        short_height = self.row_height(answer)
+
+        self.view.update_message(answer, LONG_ANSWER)
+
+        model = self.view.transcript
+        self.assertEqual((first, answer, model.rowCount()), (0, 1, 2))
+        self.assertEqual(model.index(answer).data(), LONG_ANSWER)
+        self.assertGreater(self.row_height(answer), short_height)
+
+    def test_bubbles_reflow_on_resize(self):
+        row = self.view.add_message("Assistant", LONG_ANSWER, is_ai=True)
+        wide = self.row_height(row)
+
+        self.view.resize(400, 600)
+        app.processEvents()
+
+        self.assertGreater(self.row_height(row), wide)
+
+    def test_layout_cache_stays_bounded(self):
+        self.view.delegate.cache_size = 20
+        for i in range(500):
+            self.view.add_message("Assistant" if i % 2 else "You", f"{LONG_ANSWER} {i}", is_ai=bool(i % 2))
+        app.processEvents()
+        self.view.scrollToBottom()
+        self.view.grab()
+
+        self.assertEqual(self.view.transcript.rowCount(), 500)
+        self.assertLessEqual(len(self.view.delegate._documents), 20)
+
+    def test_clear_empties_the_model(self):
+        model = ChatTranscriptModel()
+        model.append("You", "burn")
+        model.clear()
+        self.assertEqual(model.rowCount(), 0)
+
+if __name__ == '__main__':
+    unittest.main()